@@ -2,8 +2,9 @@
 
 import argparse
 import os
-import xml.dom.minidom as minidom
 from PIL import Image
+from gedi_zones import read_gedi_zones, get_line_plan, iter_line_images
+from gedi_zones import validate_gedi_file, write_validation_report
 import matplotlib.pyplot as plt
 import matplotlib.patches as patches
 
@@ -18,85 +19,28 @@ parser.add_argument('--char_width_buffer', type=int, default=10,
                     help='white space between two characters')
 parser.add_argument('--char_height_buffer', type=int, default=20,
                     help='starting location from the top of the line')
+parser.add_argument('--validation_report', type=str, default=None,
+                    help='where to write the per file validation report, '
+                         'by default gedi_validation.txt in database_path')
 args = parser.parse_args()
 
 
-def merge_characters_into_line_image(region_list, offset_list):
-    # get image width and height
-    image_width = 0
-    image_height = -1
-    for x in region_list:
-        (width, height) = x.size
-        image_width += width + char_width_buffer
-        image_height = max(image_height, height)
-    image_height += char_height_buffer*2
-
-    stitched_image = Image.new('RGB', (image_width, image_height), "white")
-    width_offset = 0
-    for i, x in enumerate(region_list):
-        height_offset = offset_list[i] + int(char_height_buffer)
-        stitched_image.paste(im=x, box=(width_offset, height_offset))
-        (width, height) = x.size
-        width_offset = width_offset + width + char_width_buffer
-
-    return stitched_image
-
-
 def get_line_images_from_page_image(image_file_name, gedi_file_path):
     im = Image.open(image_file_name)
-    doc = minidom.parse(gedi_file_path)
-
-    height_offset_list = list()
-    region_list = list()
-    first_image_top_loc = -1
-    previous_line_id = "-1"
-    start = "true"
-    DL_ZONE = doc.getElementsByTagName('DL_ZONE')
-    for node in DL_ZONE:
-        line_id = node.getAttribute('lineID')
-        if line_id == "":
-            continue
-        col = int(node.getAttribute('col'))
-        row = int(node.getAttribute('row'))
-        if start == "true":
-            first_image_top_loc = row
-            previous_line_id = line_id
-            region_list = list()
-            height_offset_list = list()
-
-        if previous_line_id != line_id:
-            ax.imshow(im)
-            plt.show()
-            image = merge_characters_into_line_image(region_list, height_offset_list)
-            set_line_image_data(image, previous_line_id, image_file_name)
-
-            first_image_top_loc = row
-            previous_line_id = line_id
-            region_list = list()
-            height_offset_list = list()
-
-        height_offset = row - first_image_top_loc
-        height_offset_list.append(height_offset)
-
-        # get character dimensions
-        col -= height_buffer
-        row -= width_buffer
-        width = int(node.getAttribute('width'))
-        height = int(node.getAttribute('height'))
-        col_down = col + width + height_buffer
-        row_right = row + height + width_buffer
-        box = (col, row, col_down, row_right)
-
-        # crop characters
-        region = im.crop(box)
-        rect1 = patches.Rectangle((col, row), width, height, linewidth=1, edgecolor='w', facecolor='none')
-        ax.add_patch(rect1)
-        region_list.append(region)
-        start = "false"
-    ax.imshow(im)
-    plt.show()
-    image = merge_characters_into_line_image(region_list, height_offset_list)
-    set_line_image_data(image, previous_line_id, image_file_name)
+    zones = read_gedi_zones(gedi_file_path)
+    plan = get_line_plan(zones, width_buffer, height_buffer,
+                         char_width_buffer, char_height_buffer)
+    line_images = iter_line_images(im, plan)
+    for index, (line_id, image) in enumerate(line_images):
+        for i in range(plan.line_offsets[index], plan.line_offsets[index + 1]):
+            col, row = plan.crop_boxes[i, :2]
+            zone = plan.zone_index[i]
+            rect1 = patches.Rectangle((col, row), zones.width[zone], zones.height[zone],
+                                      linewidth=1, edgecolor='w', facecolor='none')
+            ax.add_patch(rect1)
+        ax.imshow(im)
+        plt.show()
+        set_line_image_data(image, line_id, image_file_name)
 
 
 def set_line_image_data(image, line_id, image_file_name):
@@ -106,28 +50,14 @@ def set_line_image_data(image, line_id, image_file_name):
     imgray.save(os.path.join(data_path, 'lines', line_image_file_name))
 
 
-def remove_corrupt_xml_files(gedi_file_path):
-    doc = minidom.parse(gedi_file_path)
-    line_id_list = list()
-    unique_lineid = list()
-    DL_ZONE = doc.getElementsByTagName('DL_ZONE')
-    for node in DL_ZONE:
-        line_id = node.getAttribute('lineID')
-        if line_id == "":
-            continue
-        line_id_list.append(int(line_id))
-        unique_lineid = list(set(line_id_list))
-        unique_lineid.sort()
-
-    #check if the lineID is empty
-    if len(unique_lineid) == 0:
-        return False
-
-    # check if list contain consequtive entries
-    if sorted(unique_lineid) != range(min(unique_lineid), max(unique_lineid) + 1):
-        return False
-    else:
-        return True
+def remove_corrupt_xml_files(gedi_file_path, image_file_path):
+    """ Given a gedi xml file and its page image, returns the validation
+        of the file, see gedi_zones.validate_gedi_file.
+    Returns
+    -------
+    gedi_validation: is_valid is False if the page should be skipped.
+    """
+    return validate_gedi_file(gedi_file_path, image_file_path)
 
 
 ### main ###
@@ -141,11 +71,24 @@ char_height_buffer = int(args.char_height_buffer)
 # Create figure and axes
 fig,ax = plt.subplots(1)
 
+# validate all pages before any line image is created
+page_list = list()
+validation_results = list()
 for file in os.listdir(os.path.join(data_path, 'images')):
     if file.endswith(".tif"):
         image_path = os.path.join(data_path, 'images', file)
         gedi_file_path = os.path.join(data_path, 'gedi', file)
         gedi_file_path = gedi_file_path.replace(".tif", ".gedi.xml")
 
-        if remove_corrupt_xml_files(gedi_file_path):
-            get_line_images_from_page_image(image_path, gedi_file_path)
\ No newline at end of file
+        validation = remove_corrupt_xml_files(gedi_file_path, image_path)
+        validation_results.append((gedi_file_path, validation))
+        if validation.is_valid:
+            page_list.append((image_path, gedi_file_path))
+
+validation_report = args.validation_report
+if validation_report is None:
+    validation_report = os.path.join(data_path, 'gedi_validation.txt')
+write_validation_report(validation_results, validation_report)
+
+for image_path, gedi_file_path in page_list:
+    get_line_images_from_page_image(image_path, gedi_file_path)
\ No newline at end of file
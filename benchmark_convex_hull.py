@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+
+# Copyright   2018 Ashish Arora
+# Apache 2.0
+
+""" This script compares the speed of monotone_chain_vertices and scipy
+ ConvexHull on line point sets. If madcat xml files are given, the word corner
+ points of their zones are used, otherwise lines with the given number of
+ points are generated. For each number of points it prints the time per call
+ of both hulls and at the end the smallest size from which Qhull is faster,
+ which is what monotone_chain_max_points in bounding_box_utils is based on.
+
+  Eg. ./benchmark_convex_hull.py --madcat_files data/LDC2012T15/madcat/*.madcat.xml
+"""
+
+import argparse
+import timeit
+import numpy as np
+from scipy.spatial import ConvexHull
+from bounding_box_utils import monotone_chain_vertices
+from madcat_cache import iter_cached_zones
+
+parser = argparse.ArgumentParser(description="Compares monotone chain and Qhull convex hull speed",
+                                 formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+parser.add_argument('--madcat_files', type=str, nargs='*', default=[],
+                    help='madcat xml files whose zones are used as point sets')
+parser.add_argument('--num_points', type=int, nargs='*',
+                    default=[8, 16, 24, 32, 40, 48, 64, 96, 128, 256],
+                    help='sizes of the generated point sets, if no madcat files are given')
+parser.add_argument('--num_calls', type=int, default=1000,
+                    help='number of calls timed for each point set')
+args = parser.parse_args()
+
+
+def get_zone_points(madcat_file_path):
+    """ Given a madcat xml file, returns the word corner points of each zone.
+    Returns
+    -------
+    [np.ndarray]: (n, 2) integer array for each zone.
+    """
+    zone_points = []
+    for _, minimum_bounding_box_input in iter_cached_zones(madcat_file_path):
+        if len(minimum_bounding_box_input) > 2:
+            zone_points.append(minimum_bounding_box_input.astype(np.int64))
+    return zone_points
+
+
+def get_synthetic_points(num_points, rng):
+    """ Given number of points, returns corner points of a slightly skewed
+        line of words, with page coordinates similar to a MADCAT page.
+    Returns
+    -------
+    np.ndarray: (num_points, 2) integer array.
+    """
+    angle = rng.uniform(-0.05, 0.05)
+    x = rng.integers(0, 4000, num_points)
+    y = rng.integers(0, 120, num_points)
+    points = np.column_stack((x * np.cos(angle) - y * np.sin(angle) + 300,
+                              x * np.sin(angle) + y * np.cos(angle) + 500))
+    return np.rint(points).astype(np.int64)
+
+
+def time_per_call(function, points):
+    return timeit.timeit(lambda: function(points), number=args.num_calls) / args.num_calls
+
+
+def main():
+    rng = np.random.default_rng(0)
+    point_sets = []
+    for madcat_file_path in args.madcat_files:
+        point_sets.extend(get_zone_points(madcat_file_path))
+    if not point_sets:
+        point_sets = [get_synthetic_points(num_points, rng) for num_points in args.num_points]
+
+    timings = {}
+    for points in point_sets:
+        try:
+            monotone_chain_time = time_per_call(monotone_chain_vertices, points)
+            qhull_time = time_per_call(lambda p: ConvexHull(p).vertices, points)
+        except Exception:
+            continue
+        timings.setdefault(len(points), []).append((monotone_chain_time, qhull_time))
+
+    crossover = None
+    print('num_points monotone_chain_us qhull_us')
+    for num_points in sorted(timings):
+        monotone_chain_time, qhull_time = np.mean(timings[num_points], axis=0)
+        print('{} {:.1f} {:.1f}'.format(num_points, monotone_chain_time * 1e6, qhull_time * 1e6))
+        if crossover is None and qhull_time < monotone_chain_time:
+            crossover = num_points
+    print('qhull is faster from {} points'.format(crossover))
+
+
+if __name__ == '__main__':
+      main()
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+
+# Copyright   2018 Ashish Arora
+# Apache 2.0
+
+""" This script times the geometry functions used by the line extraction and
+ mask creation scripts, without reading any image or xml file. It generates
+ synthetic pages shaped like MADCAT pages: a 5100x6600 page with a small skew,
+ a few dozen lines per page and a few words per line, each word given by the 4
+ corners of its box as in token-image/point. Every function is timed on all
+ lines of all pages and the time per call and per page is written as json,
+ so that the numbers can be compared between releases.
+
+  Eg. ./benchmark_geometry.py --num_pages 20 --report bench/geometry.json
+"""
+
+import argparse
+import json
+import platform
+import sys
+import time
+import numpy as np
+import bounding_box_utils as bbu
+
+parser = argparse.ArgumentParser(description="Times the bounding box and rotation functions "
+                                             "on synthetic MADCAT shaped pages",
+                                 formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+parser.add_argument('--num_pages', type=int, default=10,
+                    help='number of synthetic pages')
+parser.add_argument('--min_lines', type=int, default=15,
+                    help='minimum number of lines per page')
+parser.add_argument('--max_lines', type=int, default=35,
+                    help='maximum number of lines per page')
+parser.add_argument('--min_words', type=int, default=3,
+                    help='minimum number of words per line')
+parser.add_argument('--max_words', type=int, default=15,
+                    help='maximum number of words per line')
+parser.add_argument('--page_width', type=int, default=5100,
+                    help='width of the synthetic page')
+parser.add_argument('--page_height', type=int, default=6600,
+                    help='height of the synthetic page')
+parser.add_argument('--max_skew', type=float, default=0.05,
+                    help='maximum page skew in radians')
+parser.add_argument('--repeat', type=int, default=3,
+                    help='number of times each function is run, the fastest run is reported')
+parser.add_argument('--seed', type=int, default=0,
+                    help='seed of the random generator')
+parser.add_argument('--report', type=str, default='-',
+                    help='where to write the json report, "-" for stdout')
+
+
+def get_synthetic_page(rng, args):
+    """ Given random generator and arguments, returns the word corner points
+        of each line of a skewed page.
+    Returns
+    -------
+    [[(int, int)]]: list of word corner points for each line.
+    """
+    page_skew = rng.uniform(-args.max_skew, args.max_skew)
+    num_lines = rng.integers(args.min_lines, args.max_lines + 1)
+    line_height = (args.page_height - 600) / num_lines
+    center = np.array([args.page_width / 2, args.page_height / 2])
+    rotation_matrix = bbu.get_rotation_matrix(center, page_skew)
+    lines = []
+    for line_index in range(num_lines):
+        top = 300 + line_index * line_height
+        line_skew = rng.normal(0, 0.005)
+        x = rng.uniform(200, 600)
+        minimum_bounding_box_input = []
+        for word_index in range(rng.integers(args.min_words, args.max_words + 1)):
+            width = rng.uniform(80, 450)
+            height = rng.uniform(0.4, 0.8) * line_height
+            y = top + rng.uniform(0, line_height - height) + x * line_skew
+            minimum_bounding_box_input.extend([(x, y), (x + width, y),
+                                               (x + width, y + height), (x, y + height)])
+            x += width + rng.uniform(20, 80)
+            if x > args.page_width - 200:
+                break
+        points = bbu.transform_points(rotation_matrix, minimum_bounding_box_input)
+        lines.append([tuple(point) for point in np.rint(points).astype(int).tolist()])
+    return lines
+
+
+def get_mask_points(bounding_box):
+    """ Given a line bounding box, rotates the pixel grid of the rotated box
+        back to the page, same as the mask creation in extract_masks.py.
+    """
+    min_x, min_y, max_x, max_y = bounding_box.envelope
+    center = ((max_x - min_x) / 2, (max_y - min_y) / 2)
+    rel_points = bounding_box.corner_points - (min_x, min_y)
+    rotation_matrix = bbu.get_rotation_matrix(center, -bbu.get_smaller_angle(bounding_box))
+    rel_min_x, rel_min_y, rel_max_x, rel_max_y = bbu.get_envelope(
+        bbu.transform_points(rotation_matrix, rel_points))
+    list1, list2 = np.meshgrid(np.arange(rel_min_x, rel_max_x),
+                               np.arange(rel_min_y, rel_max_y), indexing='ij')
+    points = np.column_stack((list1.ravel(), list2.ravel()))
+    return bbu.transform_points(rotation_matrix, points, inverse=True)
+
+
+def time_function(function, inputs, repeat):
+    """ Given a function and list of inputs, returns the fastest time of
+        calling the function on all inputs, over repeat runs.
+    """
+    best_time = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for function_input in inputs:
+            function(function_input)
+        elapsed = time.perf_counter() - start
+        if best_time is None or elapsed < best_time:
+            best_time = elapsed
+    return best_time
+
+
+def main():
+    args = parser.parse_args()
+    rng = np.random.default_rng(args.seed)
+    pages = [get_synthetic_page(rng, args) for _ in range(args.num_pages)]
+    lines = [line for page in pages for line in page]
+    line_arrays = [np.array(line, dtype=np.int64) for line in lines]
+    ragged_pages = [bbu.get_ragged_points(page) for page in pages]
+    bounding_boxes = [bbu.minimum_bounding_box_vectorized(line) for line in line_arrays]
+    page_bounding_boxes = [bbu.minimum_bounding_boxes(*page) for page in ragged_pages]
+    page_center = (args.page_width // 2, args.page_height // 2)
+
+    def rotated_points(bounding_box):
+        rotation_matrix = bbu.get_rotation_matrix(page_center, -bbu.get_smaller_angle(bounding_box))
+        return bbu.transform_points(rotation_matrix, bounding_box.corner_points)
+
+    # (name, function, inputs), the function is called once per input
+    benchmarks = [
+        ('minimum_bounding_box', bbu.minimum_bounding_box, lines),
+        ('minimum_bounding_box_vectorized', bbu.minimum_bounding_box_vectorized, line_arrays),
+        ('minimum_bounding_box_calipers', bbu.minimum_bounding_box_calipers, line_arrays),
+        ('minimum_bounding_boxes', lambda page: bbu.minimum_bounding_boxes(*page), ragged_pages),
+        ('convex_hull_vertices', bbu.convex_hull_vertices, line_arrays),
+        ('get_smaller_angle', bbu.get_smaller_angle, bounding_boxes),
+        ('get_smaller_angles', lambda page: bbu.get_smaller_angles(page['unit_vector'],
+                                                                   page['unit_vector_angle']),
+         page_bounding_boxes),
+        ('rotated_points', rotated_points, bounding_boxes),
+        ('mask_rotation', get_mask_points, bounding_boxes),
+    ]
+
+    results = dict()
+    for name, function, inputs in benchmarks:
+        elapsed = time_function(function, inputs, args.repeat)
+        results[name] = {
+            'calls': len(inputs),
+            'total_s': elapsed,
+            'per_call_us': elapsed / len(inputs) * 1e6,
+            'per_page_ms': elapsed / len(pages) * 1e3,
+        }
+
+    report = {
+        'config': vars(args),
+        'num_pages': len(pages),
+        'num_lines': len(lines),
+        'num_points': int(sum(len(line) for line in lines)),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'results': results,
+    }
+    if args.report == '-':
+        json.dump(report, sys.stdout, indent=2, sort_keys=True)
+        sys.stdout.write('\n')
+    else:
+        with open(args.report, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+
+
+if __name__ == '__main__':
+      main()
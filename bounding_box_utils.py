@@ -0,0 +1,861 @@
+#!/usr/bin/env python3
+
+# Copyright   2018 Ashish Arora
+# Apache 2.0
+# minimum bounding box part in this script is originally from
+#https://github.com/BebeSparkelSparkel/MinimumBoundingBox
+
+""" This module contains the minimum bounding box routines shared by the line
+ extraction and mask creation scripts. Given the corner points of the word
+ bounding boxes of a line, it returns the minimum area rectangle that contains
+ all of them. minimum_bounding_box is the original, point by point implementation
+ and is kept as the reference. minimum_bounding_box_vectorized computes the
+ same rectangle by projecting the hull on all hull edges in a single numpy pass,
+ and minimum_bounding_box_calipers finds it with rotating calipers in O(h) for
+ large hulls. minimum_bounding_boxes returns the rectangles of all the lines of
+ a page (or a corpus) at once as a numpy structured array. The fast paths only
+ choose the hull edge, the rectangle on it is computed with the arithmetic of
+ the original scripts, so corners and truncated crop boxes are the same as
+ minimum_bounding_box to the last bit.
+"""
+
+from array import array
+import numpy as np
+from math import atan2, cos, sin, pi, sqrt
+from collections import namedtuple
+import itertools
+from scipy.spatial import ConvexHull
+
+"""
+bounding_box is a named tuple which contains:
+             area (float): area of the rectangle
+             length_parallel (float): length of the side that is parallel to unit_vector
+             length_orthogonal (float): length of the side that is orthogonal to unit_vector
+             rectangle_center(int, int): coordinates of the rectangle center
+             unit_vector (float, float): direction of the length_parallel side.
+             unit_vector_angle (float): angle of the unit vector to be in radians.
+             corner_points (np.ndarray): (4, 2) array that contains the corners of the
+                                         rectangle, in order around the rectangle
+             envelope (int, int, int, int): min_x, min_y, max_x, max_y of the corners,
+                                            i.e. the axis aligned crop box of the rectangle
+"""
+bounding_box_tuple = namedtuple('bounding_box_tuple', 'area '
+                                        'length_parallel '
+                                        'length_orthogonal '
+                                        'rectangle_center '
+                                        'unit_vector '
+                                        'unit_vector_angle '
+                                        'corner_points '
+                                        'envelope'
+                         )
+
+"""
+bounding_box_dtype is the numpy structured dtype of the boxes returned by
+minimum_bounding_boxes. It has the same fields as bounding_box_tuple.
+"""
+bounding_box_dtype = np.dtype([('area', np.float64),
+                               ('length_parallel', np.float64),
+                               ('length_orthogonal', np.float64),
+                               ('rectangle_center', np.float64, (2,)),
+                               ('unit_vector', np.float64, (2,)),
+                               ('unit_vector_angle', np.float64),
+                               ('corner_points', np.float64, (4, 2)),
+                               ('envelope', np.int64, (4,))])
+
+
+def unit_vector(pt0, pt1):
+    """ Given two points pt0 and pt1, return a unit vector that
+        points in the direction of pt0 to pt1.
+    Returns
+    -------
+    (float, float): unit vector
+    """
+    dis_0_to_1 = sqrt((pt0[0] - pt1[0])**2 + (pt0[1] - pt1[1])**2)
+    return (pt1[0] - pt0[0]) / dis_0_to_1, \
+           (pt1[1] - pt0[1]) / dis_0_to_1
+
+
+def orthogonal_vector(vector):
+    """ Given a vector, returns a orthogonal/perpendicular vector of equal length.
+    Returns
+    ------
+    (float, float): A vector that points in the direction orthogonal to vector.
+    """
+    return -1 * vector[1], vector[0]
+
+
+def _cross_product(o, a, b):
+    """ Given three points, returns the z component of the cross product
+        of the vectors o to a and o to b. It is positive if o, a, b turn
+        counter clockwise.
+    """
+    return (a[0] - o[0]) * (b[1] - o[1]) - (a[1] - o[1]) * (b[0] - o[0])
+
+
+def monotone_chain_vertices(points):
+    """ Given an (n, 2) integer array of points, returns the indices of the
+        convex hull vertices in counter clockwise order, same as
+        ConvexHull(points).vertices. It uses Andrew's monotone chain on python
+        integers, so cross products are exact and collinear points are dropped.
+    Returns
+    ------
+    [int]: indices of the hull vertices.
+    """
+    points = np.asarray(points)
+    pts = points.tolist()
+    order = np.lexsort((points[:, 1], points[:, 0])).tolist()
+
+    lower = []
+    for index in order:
+        while len(lower) >= 2 and _cross_product(pts[lower[-2]], pts[lower[-1]], pts[index]) <= 0:
+            lower.pop()
+        lower.append(index)
+    upper = []
+    for index in reversed(order):
+        while len(upper) >= 2 and _cross_product(pts[upper[-2]], pts[upper[-1]], pts[index]) <= 0:
+            upper.pop()
+        upper.append(index)
+
+    vertices = lower[:-1] + upper[:-1]
+    if len(vertices) < 3:
+        raise ValueError('Points are collinear, convex hull is not a polygon.')
+    return vertices
+
+
+"""
+Monotone chain is faster than Qhull for small integer point sets, e.g. the
+word corners of a MADCAT line. Above this number of points scipy ConvexHull
+is used. See benchmark_convex_hull.py for the crossover.
+"""
+monotone_chain_max_points = 40
+
+
+def convex_hull_vertices(points):
+    """ Given an (n, 2) array of points, returns the indices of the convex hull
+        vertices in counter clockwise order. Integer point sets with at most
+        monotone_chain_max_points points use monotone_chain_vertices, all
+        other point sets use scipy ConvexHull.
+    Returns
+    ------
+    [int]: indices of the hull vertices.
+    """
+    points = np.asarray(points)
+    if len(points) <= monotone_chain_max_points and np.issubdtype(points.dtype, np.integer):
+        return monotone_chain_vertices(points)
+    return ConvexHull(points).vertices
+
+
+def bounding_area(index, hull):
+    """ Given index location in an array and convex hull, it gets two points
+        hull[index] and hull[index+1]. From these two points, it returns a named
+        tuple that mainly contains area of the box that bounds the hull. This
+        bounding box orintation is same as the orientation of the lines formed
+        by the point hull[index] and hull[index+1].
+    Returns
+    -------
+    a dict that contains:
+    area: area of the rectangle
+    length_parallel: length of the side that is parallel to unit_vector
+    length_orthogonal: length of the side that is orthogonal to unit_vector
+    rectangle_center: coordinates of the rectangle center
+    unit_vector: direction of the length_parallel side.
+    (it's orthogonal vector can be found with the orthogonal_vector function)
+    """
+    unit_vector_p = unit_vector(hull[index], hull[index+1])
+    unit_vector_o = orthogonal_vector(unit_vector_p)
+
+    dis_p = tuple(np.dot(unit_vector_p, pt) for pt in hull)
+    dis_o = tuple(np.dot(unit_vector_o, pt) for pt in hull)
+
+    min_p = min(dis_p)
+    min_o = min(dis_o)
+    len_p = max(dis_p) - min_p
+    len_o = max(dis_o) - min_o
+
+    return {'area': len_p * len_o,
+            'length_parallel': len_p,
+            'length_orthogonal': len_o,
+            'rectangle_center': (min_p + len_p / 2, min_o + len_o / 2),
+            'unit_vector': unit_vector_p,
+            }
+
+
+def _get_open_hull(hull):
+    """ Given an ordered convex hull, returns it as an (h, 2) float array
+        without the repeated closing point, if the hull has one.
+    """
+    hull = np.asarray(hull, dtype=np.float64)
+    if len(hull) > 1 and np.array_equal(hull[0], hull[-1]):
+        hull = hull[:-1]
+    return hull
+
+
+def _get_edge_rectangles(hull):
+    """ Given the ordered convex hull as an (h, 2) array without the closing
+        point, it evaluates bounding_area for every hull edge at once. Edge
+        directions, projections of all hull points on every edge and its
+        orthogonal, extents and areas are computed as (h, h) matrices.
+    Returns
+    -------
+    (np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray):
+        unit vectors, min_p, min_o, len_p, len_o and area of every edge.
+    """
+    edges = np.roll(hull, -1, axis=0) - hull
+    unit_vectors_p = edges / np.hypot(edges[:, 0], edges[:, 1])[:, np.newaxis]
+    unit_vectors_o = np.column_stack((-unit_vectors_p[:, 1], unit_vectors_p[:, 0]))
+
+    # row i contains the projection of every hull point on edge i
+    dis_p = unit_vectors_p.dot(hull.T)
+    dis_o = unit_vectors_o.dot(hull.T)
+    min_p = dis_p.min(axis=1)
+    min_o = dis_o.min(axis=1)
+    len_p = dis_p.max(axis=1) - min_p
+    len_o = dis_o.max(axis=1) - min_o
+    return unit_vectors_p, min_p, min_o, len_p, len_o, len_p * len_o
+
+
+def minimum_bounding_area(hull):
+    """ Given the ordered convex hull as an (h, 2) array, it evaluates
+        bounding_area for every hull edge at once, see _get_edge_rectangles.
+        The first edge with the smallest area is chosen, same as the loop
+        over bounding_area.
+    Returns
+    -------
+    a dict with the same keys as bounding_area for the smallest rectangle.
+    """
+    unit_vectors_p, min_p, min_o, len_p, len_o, area = _get_edge_rectangles(_get_open_hull(hull))
+    index = int(np.argmin(area))
+    return {'area': float(area[index]),
+            'length_parallel': float(len_p[index]),
+            'length_orthogonal': float(len_o[index]),
+            'rectangle_center': (float(min_p[index] + len_p[index] / 2),
+                                 float(min_o[index] + len_o[index] / 2)),
+            'unit_vector': (float(unit_vectors_p[index, 0]), float(unit_vectors_p[index, 1])),
+            }
+
+
+def minimum_bounding_area_calipers(hull):
+    """ Given the ordered convex hull as an (h, 2) array, it returns the smallest
+        rectangle of bounding_area with rotating calipers. For every hull edge,
+        the points with the largest parallel projection, the largest orthogonal
+        projection and the smallest parallel projection are tracked with three
+        pointers which only move forward around the hull, so all edges are
+        evaluated in O(h) instead of O(h^2).
+    Returns
+    -------
+    a dict with the same keys as bounding_area for the smallest rectangle.
+    """
+    return _calipers_scan(hull)[2]
+
+
+def _calipers_scan(hull):
+    """ Given the ordered convex hull as an (h, 2) array, returns the hull in
+        counter clockwise order without the closing point, the area of the
+        rectangle on each of its edges and the smallest rectangle, see
+        minimum_bounding_area_calipers.
+    Returns
+    -------
+    (np.ndarray, np.ndarray, dict): hull, area of every edge and smallest rectangle.
+    """
+    hull = _get_open_hull(hull)
+    x = hull[:, 0]
+    y = hull[:, 1]
+    # pointers below walk in counter clockwise order, i.e. with the hull on
+    # the left side (positive orthogonal projection) of every edge
+    if np.dot(x, np.roll(y, -1)) - np.dot(np.roll(x, -1), y) < 0:
+        hull = hull[::-1]
+    edges = np.roll(hull, -1, axis=0) - hull
+    unit_vectors_p = edges / np.hypot(edges[:, 0], edges[:, 1])[:, np.newaxis]
+    points = hull.tolist()
+    unit_vectors = unit_vectors_p.tolist()
+    num_points = len(points)
+
+    def dis_p(index, u):
+        pt = points[index % num_points]
+        return u[0] * pt[0] + u[1] * pt[1]
+
+    def dis_o(index, u):
+        pt = points[index % num_points]
+        return u[0] * pt[1] - u[1] * pt[0]
+
+    min_rectangle = None
+    areas = []
+    # pointers are not wrapped, so that j >= i + 1, k >= j and l >= k can be kept
+    j = k = l = 1
+    for i in range(num_points):
+        u = unit_vectors[i]
+        j = max(j, i + 1)
+        while j < i + num_points and dis_p(j + 1, u) > dis_p(j, u):
+            j += 1
+        k = max(k, j)
+        while k < i + num_points and dis_o(k + 1, u) > dis_o(k, u):
+            k += 1
+        l = max(l, k)
+        while l < i + num_points and dis_p(l + 1, u) < dis_p(l, u):
+            l += 1
+
+        min_p = dis_p(l, u)
+        min_o = dis_o(i, u)
+        len_p = dis_p(j, u) - min_p
+        len_o = dis_o(k, u) - min_o
+        areas.append(len_p * len_o)
+        if min_rectangle is None or len_p * len_o < min_rectangle['area']:
+            min_rectangle = {'area': len_p * len_o,
+                             'length_parallel': len_p,
+                             'length_orthogonal': len_o,
+                             'rectangle_center': (min_p + len_p / 2, min_o + len_o / 2),
+                             'unit_vector': (u[0], u[1]),
+                             }
+
+    return hull, np.array(areas), min_rectangle
+
+
+def to_xy_coordinates(unit_vector_angle, point):
+    """ Given angle from horizontal axis and a point from origin,
+        returns converted unit vector coordinates in x, y coordinates.
+        angle of unit vector should be in radians.
+    Returns
+    ------
+    (float, float): converted x,y coordinate of the unit vector.
+    """
+    angle_orthogonal = unit_vector_angle + pi / 2
+    return point[0] * cos(unit_vector_angle) + point[1] * cos(angle_orthogonal), \
+           point[0] * sin(unit_vector_angle) + point[1] * sin(angle_orthogonal)
+
+
+def get_rotation_matrix(center_of_rotation, angle):
+    """ Given center of rotation and angle in radians, returns the 2x3 affine
+        matrix that rotates points around the center by angle, i.e.
+        x' = (x - cx) * cos(angle) - (y - cy) * sin(angle) + cx
+        y' = (y - cy) * cos(angle) + (x - cx) * sin(angle) + cy
+    Returns
+    ------
+    np.ndarray: (2, 3) affine matrix.
+    """
+    cos_angle = cos(angle)
+    sin_angle = sin(angle)
+    center_x, center_y = center_of_rotation
+    return np.array([[cos_angle, -sin_angle, center_x - cos_angle * center_x + sin_angle * center_y],
+                     [sin_angle, cos_angle, center_y - sin_angle * center_x - cos_angle * center_y]])
+
+
+def transform_points(matrix, points, inverse=False):
+    """ Given a 2x3 affine matrix and an (n, 2) array of points, returns the
+        transformed points, computed in a single numpy operation. If inverse
+        is True, the inverse of the affine transform is applied instead.
+    Returns
+    ------
+    np.ndarray: (n, 2) float array of transformed points.
+    """
+    matrix = np.asarray(matrix, dtype=np.float64)
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    linear = matrix[:, :2]
+    translation = matrix[:, 2]
+    if inverse:
+        return (points - translation).dot(np.linalg.inv(linear).T)
+    return points.dot(linear.T) + translation
+
+
+def rotate_points(center_of_rotation, angle, points):
+    """ Rotates a point cloud around the center_of_rotation point by angle
+    input
+    -----
+    center_of_rotation (float, float): angle of unit vector to be in radians.
+    angle (float): angle of rotation to be in radians.
+    points [(float, float)]: Points to be a list or tuple of points. Points to be rotated.
+    Returns
+    ------
+    np.ndarray: (n, 2) array of rotated points around center of rotation by angle
+    """
+    return transform_points(get_rotation_matrix(center_of_rotation, angle), points)
+
+
+def rectangle_corners(rectangle):
+    """ Given rectangle center and its inclination, returns the corner
+        locations of the rectangle.
+    Returns
+    ------
+    [(float, float)]: 4 corner points of rectangle.
+    """
+    corner_points = []
+    for i1 in (.5, -.5):
+        for i2 in (i1, -1 * i1):
+            corner_points.append((rectangle['rectangle_center'][0] + i1 * rectangle['length_parallel'],
+                            rectangle['rectangle_center'][1] + i2 * rectangle['length_orthogonal']))
+
+    # polar form of the original script, not rotate_points: the crop boxes
+    # truncate the corners, so they have to be the same to the last bit
+    center_x, center_y = rectangle['rectangle_center']
+    rotated_corner_points = []
+    for x, y in corner_points:
+        diff_x, diff_y = x - center_x, y - center_y
+        diff_angle = atan2(diff_y, diff_x) + rectangle['unit_vector_angle']
+        diff_length = sqrt(diff_x ** 2 + diff_y ** 2)
+        rotated_corner_points.append((center_x + diff_length * cos(diff_angle),
+                                      center_y + diff_length * sin(diff_angle)))
+    return rotated_corner_points
+
+
+def get_horizontal_angle(unit_vector_angle):
+    """ Given an angle in radians, returns angle of the unit vector in
+        first or fourth quadrant.
+    Returns
+    ------
+    (float): updated angle of the unit vector to be in radians.
+             It is only in first or fourth quadrant.
+    """
+    if unit_vector_angle > pi / 2 and unit_vector_angle <= pi:
+        unit_vector_angle = unit_vector_angle - pi
+    elif unit_vector_angle > -pi and unit_vector_angle < -pi / 2:
+        unit_vector_angle = unit_vector_angle + pi
+
+    return unit_vector_angle
+
+
+def get_smaller_angle(bounding_box):
+    """ Given a rectangle, returns its smallest absolute angle from horizontal axis.
+    Returns
+    ------
+    (float): smallest angle of the rectangle to be in radians.
+    """
+    unit_vector = bounding_box.unit_vector
+    unit_vector_angle = bounding_box.unit_vector_angle
+    ortho_vector = orthogonal_vector(unit_vector)
+    ortho_vector_angle = atan2(ortho_vector[1], ortho_vector[0])
+
+    unit_vector_angle_updated = get_horizontal_angle(unit_vector_angle)
+    ortho_vector_angle_updated = get_horizontal_angle(ortho_vector_angle)
+
+    if abs(unit_vector_angle_updated) < abs(ortho_vector_angle_updated):
+        return unit_vector_angle_updated
+    else:
+        return ortho_vector_angle_updated
+
+
+def get_horizontal_angles(unit_vector_angles):
+    """ Given an array of angles in radians, returns the angles moved to the
+        first or fourth quadrant, same as get_horizontal_angle on each angle.
+    Returns
+    ------
+    np.ndarray: updated angles to be in radians.
+    """
+    unit_vector_angles = np.asarray(unit_vector_angles, dtype=np.float64)
+    unit_vector_angles = np.where((unit_vector_angles > pi / 2) & (unit_vector_angles <= pi),
+                                  unit_vector_angles - pi, unit_vector_angles)
+    unit_vector_angles = np.where((unit_vector_angles > -pi) & (unit_vector_angles < -pi / 2),
+                                  unit_vector_angles + pi, unit_vector_angles)
+    return unit_vector_angles
+
+
+def get_smaller_angles(unit_vectors, unit_vector_angles=None):
+    """ Given an (n, 2) array of unit vectors of rectangles, returns the smallest
+        absolute angle from horizontal axis of every rectangle, same as
+        get_smaller_angle on each rectangle. For an array of bounding_box_dtype,
+        pass its 'unit_vector' and 'unit_vector_angle' fields. If
+        unit_vector_angles is not given, it is computed from unit_vectors.
+    Returns
+    ------
+    np.ndarray: smallest angle of each rectangle to be in radians.
+    """
+    unit_vectors = np.asarray(unit_vectors, dtype=np.float64).reshape(-1, 2).tolist()
+    # math.atan2 as in get_smaller_angle, np.arctan2 can differ in the last
+    # bit, which moves angles next to the folding boundaries +-pi/2 and +-pi
+    if unit_vector_angles is None:
+        unit_vector_angles = [atan2(y, x) for x, y in unit_vectors]
+    ortho_vector_angles = np.array([atan2(x, -1 * y) for x, y in unit_vectors], dtype=np.float64)
+
+    unit_vector_angles_updated = get_horizontal_angles(unit_vector_angles)
+    ortho_vector_angles_updated = get_horizontal_angles(ortho_vector_angles)
+    return np.where(np.abs(unit_vector_angles_updated) < np.abs(ortho_vector_angles_updated),
+                    unit_vector_angles_updated, ortho_vector_angles_updated)
+
+
+def _get_envelopes(corner_points):
+    """ Given a (..., 4, 2) array of rectangle corners, returns a (..., 4)
+        int array of min_x, min_y, max_x, max_y. Coordinates are truncated,
+        same as int(min(...)) and int(max(...)) in the original scripts.
+    """
+    corner_points = np.asarray(corner_points, dtype=np.float64)
+    return np.trunc(np.concatenate((corner_points.min(axis=-2),
+                                    corner_points.max(axis=-2)), axis=-1)).astype(np.int64)
+
+
+def get_envelope(corner_points):
+    """ Given the corner points of a rectangle, returns the axis aligned box
+        that contains them. Coordinates are truncated to int, same as the crop
+        boxes computed by the line extraction scripts.
+    Returns
+    ------
+    (int, int, int, int): min_x, min_y, max_x, max_y
+    """
+    return tuple(_get_envelopes(corner_points).tolist())
+
+
+def to_bounding_box_tuple(bounding_box):
+    """ Given a record of bounding_box_dtype, e.g. one line of the array
+        returned by minimum_bounding_boxes, returns it as a bounding_box_tuple.
+    """
+    return bounding_box_tuple(
+        area=float(bounding_box['area']),
+        length_parallel=float(bounding_box['length_parallel']),
+        length_orthogonal=float(bounding_box['length_orthogonal']),
+        rectangle_center=tuple(bounding_box['rectangle_center'].tolist()),
+        unit_vector=tuple(bounding_box['unit_vector'].tolist()),
+        unit_vector_angle=float(bounding_box['unit_vector_angle']),
+        corner_points=np.array(bounding_box['corner_points']),
+        envelope=tuple(bounding_box['envelope'].tolist())
+    )
+
+
+def get_bounding_box_array(bounding_boxes):
+    """ Given a list of bounding_box_tuple or BoundingBoxRecord, returns them
+        as one contiguous array of bounding_box_dtype, e.g. to store the boxes
+        of a corpus or send them to worker processes.
+    Returns
+    ------
+    np.ndarray: array of bounding_box_dtype with one record per box.
+    """
+    values = np.array([_get_record_values(bounding_box) for bounding_box in bounding_boxes],
+                      dtype=np.float64)
+    bounding_box_array = np.zeros(len(values), dtype=bounding_box_dtype)
+    if len(values):
+        _set_record_values(bounding_box_array, values)
+    return bounding_box_array
+
+
+def get_bounding_box_records(bounding_boxes):
+    """ Given an array of bounding_box_dtype, e.g. returned by
+        minimum_bounding_boxes, returns its records as BoundingBoxRecord.
+    Returns
+    ------
+    [BoundingBoxRecord]: one record per line of the array.
+    """
+    return [BoundingBoxRecord(values) for values in _get_array_values(bounding_boxes).tolist()]
+
+
+def _get_record_values(bounding_box):
+    """ Given a bounding_box_tuple or BoundingBoxRecord, returns its 20 values
+        in the order of bounding_box_dtype.
+    Returns
+    ------
+    [float]: area, lengths, center, unit vector, angle, corners and envelope.
+    """
+    return list(itertools.chain((bounding_box.area,
+                                 bounding_box.length_parallel,
+                                 bounding_box.length_orthogonal),
+                                bounding_box.rectangle_center,
+                                bounding_box.unit_vector,
+                                (bounding_box.unit_vector_angle,),
+                                np.asarray(bounding_box.corner_points, dtype=np.float64).ravel().tolist(),
+                                bounding_box.envelope))
+
+
+def _get_array_values(bounding_boxes):
+    """ Given an array of bounding_box_dtype, returns an (n, 20) array of its
+        values in the layout of BoundingBoxRecord.
+    """
+    return np.column_stack((bounding_boxes['area'],
+                            bounding_boxes['length_parallel'],
+                            bounding_boxes['length_orthogonal'],
+                            bounding_boxes['rectangle_center'],
+                            bounding_boxes['unit_vector'],
+                            bounding_boxes['unit_vector_angle'],
+                            bounding_boxes['corner_points'].reshape(-1, 8),
+                            bounding_boxes['envelope']))
+
+
+def _set_record_values(bounding_boxes, values):
+    """ Given an array of bounding_box_dtype and an (n, 20) array in the
+        layout of BoundingBoxRecord, copies the values into the records.
+    """
+    bounding_boxes['area'] = values[:, 0]
+    bounding_boxes['length_parallel'] = values[:, 1]
+    bounding_boxes['length_orthogonal'] = values[:, 2]
+    bounding_boxes['rectangle_center'] = values[:, 3:5]
+    bounding_boxes['unit_vector'] = values[:, 5:7]
+    bounding_boxes['unit_vector_angle'] = values[:, 7]
+    bounding_boxes['corner_points'] = values[:, 8:16].reshape(-1, 4, 2)
+    bounding_boxes['envelope'] = values[:, 16:20]
+
+
+class BoundingBoxRecord(object):
+    """
+    Compact form of bounding_box_tuple. The fields have the same names as in
+    bounding_box_tuple and are stored in slots, without the instance
+    dictionary, and a record pickles as a single buffer of 20 doubles in the
+    order of bounding_box_dtype. Conversion in both directions is lossless.
+    """
+    __slots__ = bounding_box_tuple._fields
+
+    def __init__(self, values):
+        values = np.asarray(values, dtype=np.float64).tolist()
+        self.area, self.length_parallel, self.length_orthogonal = values[0:3]
+        self.rectangle_center = (values[3], values[4])
+        self.unit_vector = (values[5], values[6])
+        self.unit_vector_angle = values[7]
+        self.corner_points = np.array(values[8:16]).reshape(4, 2)
+        self.envelope = tuple(int(value) for value in values[16:20])
+
+    @classmethod
+    def from_bounding_box_tuple(cls, bounding_box):
+        return cls(_get_record_values(bounding_box))
+
+    @classmethod
+    def from_record(cls, bounding_box):
+        return cls.from_bounding_box_tuple(to_bounding_box_tuple(bounding_box))
+
+    def to_bounding_box_tuple(self):
+        return bounding_box_tuple(
+            area=self.area,
+            length_parallel=self.length_parallel,
+            length_orthogonal=self.length_orthogonal,
+            rectangle_center=self.rectangle_center,
+            unit_vector=self.unit_vector,
+            unit_vector_angle=self.unit_vector_angle,
+            corner_points=self.corner_points.copy(),
+            envelope=self.envelope
+        )
+
+    def to_record(self):
+        bounding_box = np.zeros(1, dtype=bounding_box_dtype)
+        _set_record_values(bounding_box, np.array([_get_record_values(self)]))
+        return bounding_box[0]
+
+    def __getstate__(self):
+        return array('d', _get_record_values(self)).tobytes()
+
+    def __setstate__(self, state):
+        values = array('d')
+        values.frombytes(state)
+        self.__init__(values)
+
+    def __eq__(self, other):
+        return isinstance(other, BoundingBoxRecord) and \
+            _get_record_values(self) == _get_record_values(other)
+
+    def __repr__(self):
+        return 'BoundingBoxRecord({})'.format(self.to_bounding_box_tuple())
+
+
+def _get_bounding_box_tuple(min_rectangle):
+    """ Given the smallest rectangle found on the hull, converts its center
+        to x, y coordinates and returns it as a bounding_box_tuple.
+    """
+    min_rectangle['unit_vector_angle'] = atan2(min_rectangle['unit_vector'][1], min_rectangle['unit_vector'][0])
+    min_rectangle['rectangle_center'] = to_xy_coordinates(min_rectangle['unit_vector_angle'], min_rectangle['rectangle_center'])
+    corner_points = np.array(rectangle_corners(min_rectangle))
+
+    return bounding_box_tuple(
+        area=min_rectangle['area'],
+        length_parallel=min_rectangle['length_parallel'],
+        length_orthogonal=min_rectangle['length_orthogonal'],
+        rectangle_center=min_rectangle['rectangle_center'],
+        unit_vector=min_rectangle['unit_vector'],
+        unit_vector_angle=min_rectangle['unit_vector_angle'],
+        corner_points=corner_points,
+        envelope=get_envelope(corner_points)
+    )
+
+
+def minimum_bounding_box(points):
+    """ Given a list of 2D points, it returns the minimum area rectangle bounding all
+        the points in the point cloud. It evaluates one hull edge at a time and
+        is kept as the reference for minimum_bounding_box_vectorized.
+    Returns
+    ------
+    returns a namedtuple that contains:
+    area: area of the rectangle
+    length_parallel: length of the side that is parallel to unit_vector
+    length_orthogonal: length of the side that is orthogonal to unit_vector
+    rectangle_center: coordinates of the rectangle center
+    unit_vector: direction of the length_parallel side. RADIANS
+    unit_vector_angle: angle of the unit vector
+    corner_points: (4, 2) array that contains the corners of the rectangle
+    envelope: axis aligned box that contains the corners of the rectangle
+    """
+    if len(points) <= 2: raise ValueError('More than two points required.')
+
+    hull_ordered = [points[index] for index in ConvexHull(points).vertices]
+    hull_ordered.append(hull_ordered[0])
+    hull_ordered = tuple(hull_ordered)
+
+    min_rectangle = bounding_area(0, hull_ordered)
+    for i in range(1, len(hull_ordered)-1):
+        rectangle = bounding_area(i, hull_ordered)
+        if rectangle['area'] < min_rectangle['area']:
+            min_rectangle = rectangle
+
+    return _get_bounding_box_tuple(min_rectangle)
+
+
+def _get_ccw_hull(hull):
+    """ Given an ordered convex hull, returns it as an (h, 2) array without
+        the closing point, in counter clockwise order like ConvexHull.
+    """
+    hull = np.asarray(hull)
+    if len(hull) > 1 and np.array_equal(hull[0], hull[-1]):
+        hull = hull[:-1]
+    x = hull[:, 0].astype(np.float64)
+    y = hull[:, 1].astype(np.float64)
+    if np.dot(x, np.roll(y, -1)) - np.dot(np.roll(x, -1), y) < 0:
+        hull = hull[::-1]
+    return hull
+
+
+def _minimum_bounding_box_from_areas(points, hull, areas):
+    """ Given the points of a line, their convex hull in counter clockwise
+        order without the closing point and the area of the rectangle on each
+        hull edge, returns the smallest rectangle as a bounding_box_tuple. The
+        areas only select the edge, its rectangle is computed again with
+        bounding_area, so that the corners and the truncated envelope are the
+        same as minimum_bounding_box to the last bit. Edges with the smallest
+        area within rounding are a tie that minimum_bounding_box breaks by the
+        Qhull vertex order, so it is called for them.
+    Returns
+    ------
+    returns a bounding_box_tuple with the same fields as minimum_bounding_box.
+    """
+    areas = np.asarray(areas)
+    min_area = areas.min()
+    candidates = np.flatnonzero(areas <= min_area + 1e-9 * max(abs(min_area), 1.0))
+    if len(candidates) > 1:
+        return minimum_bounding_box([tuple(point) for point in np.asarray(points).tolist()])
+    hull_ordered = [tuple(point) for point in np.asarray(hull).tolist()]
+    hull_ordered.append(hull_ordered[0])
+    return _get_bounding_box_tuple(bounding_area(int(candidates[0]), hull_ordered))
+
+
+def minimum_bounding_box_from_hull(hull_ordered):
+    """ Given the ordered convex hull of a point cloud, e.g. one maintained
+        by line_geometry.LineGeometry, returns the minimum area rectangle
+        bounding it without computing the hull again.
+    Returns
+    ------
+    returns a bounding_box_tuple with the same fields as minimum_bounding_box.
+    """
+    hull = _get_ccw_hull(hull_ordered)
+    areas = _get_edge_rectangles(hull.astype(np.float64))[-1]
+    return _minimum_bounding_box_from_areas(hull, hull, areas)
+
+
+def minimum_bounding_box_vectorized(points):
+    """ Given a list or (n, 2) array of 2D points, it returns the minimum area
+        rectangle bounding all the points in the point cloud. Same as
+        minimum_bounding_box, but all hull edges are evaluated in one numpy pass.
+    Returns
+    ------
+    returns a bounding_box_tuple with the same fields as minimum_bounding_box.
+    """
+    if len(points) <= 2: raise ValueError('More than two points required.')
+
+    points = np.asarray(points)
+    hull = points[convex_hull_vertices(points)]
+    areas = _get_edge_rectangles(hull.astype(np.float64))[-1]
+    return _minimum_bounding_box_from_areas(points, hull, areas)
+
+
+def minimum_bounding_box_calipers(points):
+    """ Given a list or (n, 2) array of 2D points, it returns the minimum area
+        rectangle bounding all the points in the point cloud using rotating
+        calipers. It is meant for large hulls, e.g. the ones obtained from
+        mask pixels.
+    Returns
+    ------
+    returns a bounding_box_tuple with the same fields as minimum_bounding_box.
+    """
+    if len(points) <= 2: raise ValueError('More than two points required.')
+
+    points = np.asarray(points)
+    hull = _get_ccw_hull(points[convex_hull_vertices(points)])
+    # the hull is already counter clockwise, so the areas follow its edges
+    _, areas, _ = _calipers_scan(hull)
+    return _minimum_bounding_box_from_areas(points, hull, areas)
+
+
+def get_ragged_points(points_list):
+    """ Given a list of point lists, one for each line, returns them as a
+        flat (n, 2) array and offsets. Points of line i are
+        points[offsets[i]:offsets[i+1]].
+    Returns
+    ------
+    (np.ndarray, np.ndarray): (n, 2) array of points and
+                              (num_lines + 1,) int array of offsets.
+    """
+    lengths = [len(line_points) for line_points in points_list]
+    offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    # integer coordinates are kept as integers, see convex_hull_vertices
+    line_arrays = [np.asarray(line_points).reshape(-1, 2)
+                   for line_points in points_list if len(line_points)]
+    if not line_arrays:
+        return np.zeros((0, 2), dtype=np.float64), offsets
+    return np.concatenate(line_arrays), offsets
+
+
+def _get_hull_areas(hulls):
+    """ Given a list of ordered convex hulls, returns the area of the
+        rectangle on every edge of every hull. Hulls are padded to the same
+        length, so the projections of all hulls on all of their edges are
+        computed as one (num_hulls, h, h) array.
+    Returns
+    ------
+    [np.ndarray]: area of every edge, one array per hull.
+    """
+    num_hulls = len(hulls)
+    hull_lengths = np.array([len(hull) for hull in hulls])
+    max_length = int(hull_lengths.max())
+    vertex_index = np.arange(max_length)
+    is_edge = vertex_index[np.newaxis, :] < hull_lengths[:, np.newaxis]
+
+    # padded vertices repeat the last hull vertex, they do not change the
+    # extents and their edges are skipped through is_edge
+    padded_hulls = np.empty((num_hulls, max_length, 2), dtype=np.float64)
+    for index, hull in enumerate(hulls):
+        padded_hulls[index, :len(hull)] = hull
+        padded_hulls[index, len(hull):] = hull[-1]
+    next_index = np.where(vertex_index[np.newaxis, :] + 1 < hull_lengths[:, np.newaxis],
+                          vertex_index[np.newaxis, :] + 1, 0)
+    edges = padded_hulls[np.arange(num_hulls)[:, np.newaxis], next_index] - padded_hulls
+    edge_lengths = np.hypot(edges[..., 0], edges[..., 1])
+    edge_lengths[~is_edge] = 1.0
+    unit_vectors_p = edges / edge_lengths[..., np.newaxis]
+    unit_vectors_o = np.stack((-unit_vectors_p[..., 1], unit_vectors_p[..., 0]), axis=-1)
+
+    dis_p = np.einsum('nkd,njd->nkj', unit_vectors_p, padded_hulls)
+    dis_o = np.einsum('nkd,njd->nkj', unit_vectors_o, padded_hulls)
+    area = ((dis_p.max(axis=2) - dis_p.min(axis=2)) *
+            (dis_o.max(axis=2) - dis_o.min(axis=2)))
+    return [area[index, :len(hull)] for index, hull in enumerate(hulls)]
+
+
+def minimum_bounding_boxes(points, offsets, chunk_size=4096):
+    """ Given the points of many lines as a flat (n, 2) array and offsets
+        (see get_ragged_points), it returns the minimum area rectangle of
+        every line at once. It can be called with all the lines of a page
+        or of a whole corpus; lines are processed chunk_size at a time to
+        bound the memory used by the padded projections.
+    Returns
+    ------
+    np.ndarray: array of bounding_box_dtype with one record per line.
+    """
+    points = np.asarray(points)
+    offsets = np.asarray(offsets, dtype=np.int64)
+    num_lines = len(offsets) - 1
+    bounding_boxes = np.zeros(num_lines, dtype=bounding_box_dtype)
+    for start in range(0, num_lines, chunk_size):
+        end = min(start + chunk_size, num_lines)
+        lines, hulls = [], []
+        for index in range(start, end):
+            line_points = points[offsets[index]:offsets[index + 1]]
+            if len(line_points) <= 2:
+                raise ValueError('More than two points required, line {} has {}.'
+                                 .format(index, len(line_points)))
+            lines.append(line_points)
+            hulls.append(_get_ccw_hull(line_points[convex_hull_vertices(line_points)]))
+        hull_areas = _get_hull_areas([hull.astype(np.float64) for hull in hulls])
+        # the rectangle of the chosen edge is computed point by point, see
+        # _minimum_bounding_box_from_areas
+        _set_record_values(bounding_boxes[start:end], np.array(
+            [_get_record_values(_minimum_bounding_box_from_areas(line_points, hull, areas))
+             for line_points, hull, areas in zip(lines, hulls, hull_areas)]))
+    return bounding_boxes
@@ -2,7 +2,8 @@
 
 import argparse
 import os
-import xml.dom.minidom as minidom
+import madcat_xml
+from madcat_cache import load_madcat_annotation
 import unicodedata
 
 parser = argparse.ArgumentParser(description="""Creates line images from page image.""")
@@ -11,16 +12,10 @@ parser.add_argument('database_path', type=str,
 args = parser.parse_args()
 
 def get_word_line_mapping(madcat_file_path):
-    doc = minidom.parse(madcat_file_path)
-    zone = doc.getElementsByTagName('zone')
-    for node in zone:
-        line_id = node.getAttribute('id')
-        line_word_dict[line_id] = list()
-        word_image = node.getElementsByTagName('token-image')
-        for tnode in word_image:
-            word_id = tnode.getAttribute('id')
-            line_word_dict[line_id].append(word_id)
-            word_line_dict[word_id] = line_id
+    annotation = load_madcat_annotation(madcat_file_path)
+    line_word, word_line = madcat_xml.get_word_line_mapping(annotation)
+    line_word_dict.update(line_word)
+    word_line_dict.update(word_line)
 
 
 def remove_corrupt_xml_files():
@@ -28,25 +23,10 @@ def remove_corrupt_xml_files():
 
 
 def read_text(madcat_file_path):
-    text_line_word_dict = dict()
     print(madcat_file_path)
-    doc = minidom.parse(madcat_file_path)
-    segment = doc.getElementsByTagName('segment')
-    for node in segment:
-        token = node.getElementsByTagName('token')
-        for tnode in token:
-            segment_id = tnode.getAttribute('id')
-            ref_word_id = tnode.getAttribute('ref_id')
-            word = tnode.getElementsByTagName('source')[0].firstChild.nodeValue
-            ref_line_id = word_line_dict[ref_word_id]
-            if ref_line_id not in text_line_word_dict:
-                text_line_word_dict[ref_line_id] = list()
-            text_line_word_dict[ref_line_id].append(word)
-
-    for key in sorted(text_line_word_dict):
-        line = text_line_word_dict[key]
-        text = ' '.join(line)
-        text_line = key + ' ' + text
+    text_line_dict = madcat_xml.get_line_text(load_madcat_annotation(madcat_file_path))
+    for key in sorted(text_line_dict):
+        text_line = key + ' ' + text_line_dict[key]
         print(text_line)
 
 
@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+
+# Copyright   2018 Ashish Arora
+# Apache 2.0
+
+""" This module builds an index of the pages of the MADCAT releases, so that
+ the drivers resolve a page by a dictionary lookup instead of probing
+ madcat/<base_name>.madcat.xml in every release with os.path.exists. The
+ madcat/ and images/ directories of each release are listed once and the index
+ is written as a tab separated file:
+   <base_name> <madcat xml path> <page image path> <database path> <writing condition>
+ If a page is present in more than one release the first release wins, same as
+ check_file_location. The writing condition (e.g. IUC, IUL) is read from the
+ writing_conditions.tab of the release, so subsets can be selected with
+ filter_corpus_index before any xml or image file is opened. The first line of
+ the file stores the releases the index was built from and the second one the
+ mtimes of their madcat/ and images/ directories and writing_conditions.tab
+ files. The index is rebuilt if either changes, e.g. when pages are added to
+ or removed from a release.
+
+  Eg. ./corpus_index.py data/LDC2012T15 data/LDC2013T09 data/LDC2013T15 data/corpus_index.tsv
+"""
+
+import argparse
+import os
+from collections import namedtuple
+
+parser = argparse.ArgumentParser(description="Creates the page location index of the madcat releases",
+                                 formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+parser.add_argument('database_paths', type=str, nargs='+',
+                    help='Paths to the downloaded madcat data directories, in priority order')
+parser.add_argument('index_path', type=str,
+                    help='where to write the index file')
+
+"""
+corpus_location is a named tuple which contains the location of a page:
+             madcat_file_path (string): complete path of the madcat xml file
+             image_file_path (string): complete path of the page image
+             database_path (string): release directory the page belongs to
+             writing_condition (string): writing condition of the page, empty
+                                         if the release has no writing_conditions.tab
+"""
+corpus_location = namedtuple('corpus_location', 'madcat_file_path '
+                                                'image_file_path '
+                                                'database_path '
+                                                'writing_condition')
+
+_header_prefix = '#database_paths'
+_stamp_prefix = '#mtimes'
+
+
+def _list_directory(directory):
+    """ Given a directory, returns the names of the files in it, or an
+        empty list if it does not exist.
+    """
+    try:
+        return [entry.name for entry in os.scandir(directory) if not entry.is_dir()]
+    except OSError:
+        return []
+
+
+def get_source_stamps(database_paths):
+    """ Given the release directories, returns the mtime of the madcat/ and
+        images/ directories and writing_conditions.tab files of each release,
+        '-' for the missing ones. Adding or removing a page changes the mtime
+        of its directory.
+    Returns
+    -------
+    [string]: mtimes in ns, four per release.
+    """
+    stamps = []
+    for database_path in database_paths:
+        for source in (os.path.join(database_path, 'madcat'),
+                       os.path.join(database_path, 'images'),
+                       os.path.join(database_path, 'writing_conditions.tab'),
+                       os.path.join(database_path, 'docs', 'writing_conditions.tab')):
+            try:
+                stamps.append(str(os.stat(source).st_mtime_ns))
+            except OSError:
+                stamps.append('-')
+    return stamps
+
+
+def read_writing_conditions(database_path):
+    """ Given a release directory, reads its writing_conditions.tab, from the
+        release directory or its docs directory.
+    Returns
+    ------
+    (dict): dictionary with key as page image name and value as writing condition.
+    """
+    file_writing_cond = dict()
+    for writing_conditions in (os.path.join(database_path, 'writing_conditions.tab'),
+                               os.path.join(database_path, 'docs', 'writing_conditions.tab')):
+        if os.path.exists(writing_conditions):
+            with open(writing_conditions) as f:
+                for line in f:
+                    line_list = line.strip().split("\t")
+                    if len(line_list) > 3:
+                        file_writing_cond[line_list[0]] = line_list[3].strip()
+            break
+    return file_writing_cond
+
+
+def build_corpus_index(database_paths):
+    """ Given the release directories, lists their madcat/ and images/
+        directories once and returns the location of each page.
+    Returns
+    -------
+    (dict): dictionary with key as page base name and value as corpus_location.
+    """
+    corpus_index = dict()
+    for database_path in database_paths:
+        writing_conditions = read_writing_conditions(database_path)
+        image_names = dict()
+        for file_name in _list_directory(os.path.join(database_path, 'images')):
+            base_name, extension = os.path.splitext(file_name)
+            if base_name not in image_names or extension == '.tif':
+                image_names[base_name] = file_name
+        for file_name in _list_directory(os.path.join(database_path, 'madcat')):
+            if not file_name.endswith('.madcat.xml'):
+                continue
+            base_name = file_name[:-len('.madcat.xml')]
+            if base_name in corpus_index:
+                continue
+            image_file_name = image_names.get(base_name, base_name + '.tif')
+            corpus_index[base_name] = corpus_location(
+                madcat_file_path=os.path.join(database_path, 'madcat', file_name),
+                image_file_path=os.path.join(database_path, 'images', image_file_name),
+                database_path=database_path,
+                writing_condition=writing_conditions.get(base_name, ''))
+    return corpus_index
+
+
+def write_corpus_index(corpus_index, database_paths, index_path, source_stamps=None):
+    """ Writes the index to a temporary file and moves it to index_path, so
+        parallel jobs never read a partial index. source_stamps are the
+        get_source_stamps of the releases when the index was built.
+    """
+    if source_stamps is None:
+        source_stamps = get_source_stamps(database_paths)
+    index_dir = os.path.dirname(index_path)
+    if index_dir and not os.path.exists(index_dir):
+        os.makedirs(index_dir, exist_ok=True)
+    temp_path = '{}.{}.tmp'.format(index_path, os.getpid())
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        f.write('\t'.join([_header_prefix] + list(database_paths)) + '\n')
+        f.write('\t'.join([_stamp_prefix] + list(source_stamps)) + '\n')
+        for base_name in sorted(corpus_index):
+            f.write('\t'.join((base_name,) + tuple(corpus_index[base_name])) + '\n')
+    os.replace(temp_path, index_path)
+
+
+def read_corpus_index(index_path):
+    """ Given an index file, returns the release directories it was built
+        from, their get_source_stamps at that time and the location of each page.
+    Returns
+    -------
+    ([string], [string], dict): release directories, their stamps and
+                                dictionary with key as page base name and
+                                value as corpus_location.
+    """
+    corpus_index = dict()
+    with open(index_path, encoding='utf-8') as f:
+        header = f.readline().rstrip('\n').split('\t')
+        stamps = f.readline().rstrip('\n').split('\t')
+        if header[0] != _header_prefix or stamps[0] != _stamp_prefix:
+            raise ValueError('{} is not a corpus index file'.format(index_path))
+        for line in f:
+            line_list = line.rstrip('\n').split('\t')
+            if len(line_list) != len(corpus_location._fields) + 1:
+                raise ValueError('{} is not a corpus index file'.format(index_path))
+            corpus_index[line_list[0]] = corpus_location(*line_list[1:])
+    return header[1:], stamps[1:], corpus_index
+
+
+def get_corpus_index(database_paths, index_path=None):
+    """ Given the release directories and optionally an index file, returns
+        the location of each page. The index file is read if it was built
+        from the same releases and none of their directories changed since,
+        otherwise the index is built and written.
+    Returns
+    -------
+    (dict): dictionary with key as page base name and value as corpus_location.
+    """
+    database_paths = [path for path in database_paths if path is not None]
+    # stamps are taken before listing, so a page added while listing makes
+    # the next run rebuild the index
+    source_stamps = get_source_stamps(database_paths)
+    if index_path is not None and os.path.exists(index_path):
+        try:
+            indexed_paths, indexed_stamps, corpus_index = read_corpus_index(index_path)
+            if indexed_paths == database_paths and indexed_stamps == source_stamps:
+                return corpus_index
+        except ValueError:
+            pass
+    corpus_index = build_corpus_index(database_paths)
+    if index_path is not None:
+        write_corpus_index(corpus_index, database_paths, index_path, source_stamps)
+    return corpus_index
+
+
+def parse_writing_condition_filter(expression):
+    """ Given a comma separated list of writing conditions, e.g. 'IUC,IUL',
+        returns them as a set, or None if the expression is empty.
+    """
+    if not expression:
+        return None
+    return set(condition.strip() for condition in expression.split(',') if condition.strip())
+
+
+def filter_corpus_index(corpus_index, writing_conditions):
+    """ Given the index and a set of writing conditions, returns the index of
+        the pages written in one of them. All pages are kept if
+        writing_conditions is None.
+    Returns
+    -------
+    (dict): dictionary with key as page base name and value as corpus_location.
+    """
+    if writing_conditions is None:
+        return corpus_index
+    return {base_name: location for base_name, location in corpus_index.items()
+            if location.writing_condition in writing_conditions}
+
+
+def main():
+    args = parser.parse_args()
+    source_stamps = get_source_stamps(args.database_paths)
+    corpus_index = build_corpus_index(args.database_paths)
+    write_corpus_index(corpus_index, args.database_paths, args.index_path, source_stamps)
+    print('{} pages indexed in {}'.format(len(corpus_index), args.index_path))
+
+
+if __name__ == '__main__':
+      main()
@@ -18,12 +18,15 @@
 import sys
 import argparse
 import os
-import xml.dom.minidom as minidom
 import numpy as np
 from math import atan2, cos, sin, pi, degrees, sqrt
-from collections import namedtuple
-import itertools
-from scipy.spatial import ConvexHull
+from bounding_box_utils import get_envelope, get_rotation_matrix, get_smaller_angle, transform_points
+from image_size import ImageSizeCache
+from madcat_cache import get_cache_dir
+from page_model import Page
+from corpus_index import get_corpus_index, filter_corpus_index, parse_writing_condition_filter
+from job_planner import read_split_file
+from line_shards import load_shard_annotations
 from PIL import Image
 from scipy.misc import toimage
 import logging
@@ -54,169 +57,21 @@ parser.add_argument('--out_dir', type=str,
                     help='directory location to write output files')
 parser.add_argument('--padding', type=int, default=400,
                     help='padding across horizontal/verticle direction')
+parser.add_argument('--cache_dir', type=str, default=None,
+                    help='directory for the parsed madcat xml sidecars, '
+                         'by default madcat_cache under out_dir')
+parser.add_argument('--corpus_index', type=str, default=None,
+                    help='page location index file, see corpus_index.py. It is '
+                         'built from the database paths if missing or out of date')
+parser.add_argument('--size_cache', type=str, default=None,
+                    help='file caching the page image sizes, see image_size.py')
+parser.add_argument('--writing_condition', type=str, default=None,
+                    help='comma separated writing conditions of the pages to use, '
+                         'e.g. IUC,IUL. By default all pages are used')
+parser.add_argument('--line_shards', type=str, default=None,
+                    help='directory with the lines.<n>.npz shards of line_shards.py, the '
+                         'line geometry is read from them instead of the xml files')
 args = parser.parse_args()
-"""
-bounding_box is a named tuple which contains:
-             area (float): area of the rectangle
-             length_parallel (float): length of the side that is parallel to unit_vector
-             length_orthogonal (float): length of the side that is orthogonal to unit_vector
-             rectangle_center(int, int): coordinates of the rectangle center
-             unit_vector (float, float): direction of the length_parallel side.
-             unit_vector_angle (float): angle of the unit vector to be in radians.
-             corner_points [(float, float)]: set that contains the corners of the rectangle
-"""
-bounding_box_tuple = namedtuple('bounding_box_tuple', 'area '
-                                        'length_parallel '
-                                        'length_orthogonal '
-                                        'rectangle_center '
-                                        'unit_vector '
-                                        'unit_vector_angle '
-                                        'corner_points '
-                                        'rotated_corner_points '
-                         )
-
-def unit_vector(pt0, pt1):
-    """ Given two points pt0 and pt1, return a unit vector that
-        points in the direction of pt0 to pt1.
-    Returns
-    -------
-    (float, float): unit vector
-    """
-    dis_0_to_1 = sqrt((pt0[0] - pt1[0])**2 + (pt0[1] - pt1[1])**2)
-    return (pt1[0] - pt0[0]) / dis_0_to_1, \
-           (pt1[1] - pt0[1]) / dis_0_to_1
-
-def orthogonal_vector(vector):
-    """ Given a vector, returns a orthogonal/perpendicular vector of equal length.
-    Returns
-    ------
-    (float, float): A vector that points in the direction orthogonal to vector.
-    """
-    return -1 * vector[1], vector[0]
-
-def bounding_area(index, hull):
-    """ Given index location in an array and convex hull, it gets two points
-        hull[index] and hull[index+1]. From these two points, it returns a named
-        tuple that mainly contains area of the box that bounds the hull. This
-        bounding box orintation is same as the orientation of the lines formed
-        by the point hull[index] and hull[index+1].
-    Returns
-    -------
-    a named tuple that contains:
-    area: area of the rectangle
-    length_parallel: length of the side that is parallel to unit_vector
-    length_orthogonal: length of the side that is orthogonal to unit_vector
-    rectangle_center: coordinates of the rectangle center
-    unit_vector: direction of the length_parallel side.
-    (it's orthogonal vector can be found with the orthogonal_vector function)
-    """
-    unit_vector_p = unit_vector(hull[index], hull[index+1])
-    unit_vector_o = orthogonal_vector(unit_vector_p)
-
-    dis_p = tuple(np.dot(unit_vector_p, pt) for pt in hull)
-    dis_o = tuple(np.dot(unit_vector_o, pt) for pt in hull)
-
-    min_p = min(dis_p)
-    min_o = min(dis_o)
-    len_p = max(dis_p) - min_p
-    len_o = max(dis_o) - min_o
-
-    return {'area': len_p * len_o,
-            'length_parallel': len_p,
-            'length_orthogonal': len_o,
-            'rectangle_center': (min_p + len_p / 2, min_o + len_o / 2),
-            'unit_vector': unit_vector_p,
-            }
-
-def to_xy_coordinates(unit_vector_angle, point):
-    """ Given angle from horizontal axis and a point from origin,
-        returns converted unit vector coordinates in x, y coordinates.
-        angle of unit vector should be in radians.
-    Returns
-    ------
-    (float, float): converted x,y coordinate of the unit vector.
-    """
-    angle_orthogonal = unit_vector_angle + pi / 2
-    return point[0] * cos(unit_vector_angle) + point[1] * cos(angle_orthogonal), \
-           point[0] * sin(unit_vector_angle) + point[1] * sin(angle_orthogonal)
-
-def rotate_points(center_of_rotation, angle, points):
-    """ Rotates a point cloud around the center_of_rotation point by angle
-    input
-    -----
-    center_of_rotation (float, float): angle of unit vector to be in radians.
-    angle (float): angle of rotation to be in radians.
-    points [(float, float)]: Points to be a list or tuple of points. Points to be rotated.
-    Returns
-    ------
-    [(float, float)]: Rotated points around center of rotation by angle
-    """
-    rot_points = []
-    ang = []
-    for pt in points:
-        diff = tuple([pt[d] - center_of_rotation[d] for d in range(2)])
-        diff_angle = atan2(diff[1], diff[0]) + angle
-        ang.append(diff_angle)
-        diff_length = sqrt(sum([d**2 for d in diff]))
-        rot_points.append((center_of_rotation[0] + diff_length * cos(diff_angle),
-                           center_of_rotation[1] + diff_length * sin(diff_angle)))
-
-    return rot_points
-
-def rectangle_corners(rectangle):
-    """ Given rectangle center and its inclination, returns the corner
-        locations of the rectangle.
-    Returns
-    ------
-    [(float, float)]: 4 corner points of rectangle.
-    """
-    corner_points = []
-    for i1 in (.5, -.5):
-        for i2 in (i1, -1 * i1):
-            corner_points.append((rectangle['rectangle_center'][0] + i1 * rectangle['length_parallel'],
-                            rectangle['rectangle_center'][1] + i2 * rectangle['length_orthogonal']))
-
-    return rotate_points(rectangle['rectangle_center'], rectangle['unit_vector_angle'], corner_points)
-
-def minimum_bounding_box(points):
-    """ Given a list of 2D points, it returns the minimum area rectangle bounding all
-        the points in the point cloud.
-    Returns
-    ------
-    returns a namedtuple that contains:
-    area: area of the rectangle
-    length_parallel: length of the side that is parallel to unit_vector
-    length_orthogonal: length of the side that is orthogonal to unit_vector
-    rectangle_center: coordinates of the rectangle center
-    unit_vector: direction of the length_parallel side. RADIANS
-    unit_vector_angle: angle of the unit vector
-    corner_points: set that contains the corners of the rectangle
-    """
-    if len(points) <= 2: raise ValueError('More than two points required.')
-
-    hull_ordered = [points[index] for index in ConvexHull(points).vertices]
-    hull_ordered.append(hull_ordered[0])
-    hull_ordered = tuple(hull_ordered)
-
-    min_rectangle = bounding_area(0, hull_ordered)
-    for i in range(1, len(hull_ordered)-1):
-        rectangle = bounding_area(i, hull_ordered)
-        if rectangle['area'] < min_rectangle['area']:
-            min_rectangle = rectangle
-
-    min_rectangle['unit_vector_angle'] = atan2(min_rectangle['unit_vector'][1], min_rectangle['unit_vector'][0])
-    min_rectangle['rectangle_center'] = to_xy_coordinates(min_rectangle['unit_vector_angle'], min_rectangle['rectangle_center'])
-
-    return bounding_box_tuple(
-        area=min_rectangle['area'],
-        length_parallel=min_rectangle['length_parallel'],
-        length_orthogonal=min_rectangle['length_orthogonal'],
-        rectangle_center=min_rectangle['rectangle_center'],
-        unit_vector=min_rectangle['unit_vector'],
-        unit_vector_angle=min_rectangle['unit_vector_angle'],
-        corner_points=set(rectangle_corners(min_rectangle)),
-        rotated_corner_points=set([1,2,3])
-    )
 
 def get_center(im):
     """ Given image, returns the location of center pixel
@@ -228,36 +83,6 @@ def get_center(im):
     center_y = im.size[1] / 2
     return int(center_x), int(center_y)
 
-def pad_image(image):
-    """ Given an image, returns a padded image around the border.
-        This routine save the code from crashing if bounding boxes that are
-        slightly outside the page boundary.
-    Returns
-    -------
-    image: page image
-    """
-    offset = int(args.padding // 2)
-    padded_image = Image.new('L', (image.size[0] + int(args.padding), image.size[1] + int(args.padding)), "white")
-    padded_image.paste(im=image, box=(offset, offset))
-    return padded_image
-
-def update_minimum_bounding_box_input(bounding_box_input):
-    """ Given list of 2D points, returns list of 2D points shifted by an offset.
-    Returns
-    ------
-    points [(float, float)]: points, a list or tuple of 2D coordinates
-    """
-    updated_minimum_bounding_box_input = []
-    offset = int(args.padding // 2)
-    for point in bounding_box_input:
-        x, y = point
-        new_x = x + offset
-        new_y = y + offset
-        word_coordinate = (new_x, new_y)
-        updated_minimum_bounding_box_input.append(word_coordinate)
-
-    return updated_minimum_bounding_box_input
-
 def set_line_image_data(image, image_file_name, image_fh):
     """ Given an image, saves a flipped line image. Line image file name
             is formed by appending the line id at the end page image name.
@@ -269,40 +94,6 @@ def set_line_image_data(image, image_file_name, image_fh):
     imgray.save(image_path)
     image_fh.write(image_path + '\n')
 
-def get_horizontal_angle(unit_vector_angle):
-    """ Given an angle in radians, returns angle of the unit vector in
-        first or fourth quadrant.
-    Returns
-    ------
-    (float): updated angle of the unit vector to be in radians.
-             It is only in first or fourth quadrant.
-    """
-    if unit_vector_angle > pi / 2 and unit_vector_angle <= pi:
-        unit_vector_angle = unit_vector_angle - pi
-    elif unit_vector_angle > -pi and unit_vector_angle < -pi / 2:
-        unit_vector_angle = unit_vector_angle + pi
-
-    return unit_vector_angle
-
-def get_smaller_angle(bounding_box):
-    """ Given a rectangle, returns its smallest absolute angle from horizontal axis.
-    Returns
-    ------
-    (float): smallest angle of the rectangle to be in radians.
-    """
-    unit_vector = bounding_box.unit_vector
-    unit_vector_angle = bounding_box.unit_vector_angle
-    ortho_vector = orthogonal_vector(unit_vector)
-    ortho_vector_angle = atan2(ortho_vector[1], ortho_vector[0])
-
-    unit_vector_angle_updated = get_horizontal_angle(unit_vector_angle)
-    ortho_vector_angle_updated = get_horizontal_angle(ortho_vector_angle)
-
-    if abs(unit_vector_angle_updated) < abs(ortho_vector_angle_updated):
-        return unit_vector_angle_updated
-    else:
-        return ortho_vector_angle_updated
-
 def rotate_rectangle_corners(bounding_box, center, if_opposite_direction=False):
     """ Given the rectangle, returns corner points of rotated rectangle.
             It rotates the rectangle around the center by its smallest angle.
@@ -310,31 +101,10 @@ def rotate_rectangle_corners(bounding_box, center, if_opposite_direction=False):
             :parameter if_opposite_direction.
         Returns
         -------
-        [(int, int)]: 4 corner points of rectangle.
+        np.ndarray: (4, 2) array of corner points of rectangle.
         """
-    p1, p2, p3, p4 = bounding_box.corner_points
-    x1, y1 = p1
-    x2, y2 = p2
-    x3, y3 = p3
-    x4, y4 = p4
-    center_x, center_y = center
-
-    if if_opposite_direction:
-        rotation_angle_in_rad = get_smaller_angle(bounding_box)
-    else:
-        rotation_angle_in_rad = -get_smaller_angle(bounding_box)
-
-    x_dash_1 = (x1 - center_x) * cos(rotation_angle_in_rad) - (y1 - center_y) * sin(rotation_angle_in_rad) + center_x
-    x_dash_2 = (x2 - center_x) * cos(rotation_angle_in_rad) - (y2 - center_y) * sin(rotation_angle_in_rad) + center_x
-    x_dash_3 = (x3 - center_x) * cos(rotation_angle_in_rad) - (y3 - center_y) * sin(rotation_angle_in_rad) + center_x
-    x_dash_4 = (x4 - center_x) * cos(rotation_angle_in_rad) - (y4 - center_y) * sin(rotation_angle_in_rad) + center_x
-
-    y_dash_1 = (y1 - center_y) * cos(rotation_angle_in_rad) + (x1 - center_x) * sin(rotation_angle_in_rad) + center_y
-    y_dash_2 = (y2 - center_y) * cos(rotation_angle_in_rad) + (x2 - center_x) * sin(rotation_angle_in_rad) + center_y
-    y_dash_3 = (y3 - center_y) * cos(rotation_angle_in_rad) + (x3 - center_x) * sin(rotation_angle_in_rad) + center_y
-    y_dash_4 = (y4 - center_y) * cos(rotation_angle_in_rad) + (x4 - center_x) * sin(rotation_angle_in_rad) + center_y
-
-    return (x_dash_1, y_dash_1), (x_dash_2, y_dash_2), (x_dash_3, y_dash_3), (x_dash_4, y_dash_4)
+    return rotate_list_points(bounding_box.corner_points, bounding_box, center,
+                              if_opposite_direction)
 
 def rotate_single_point(point, bounding_box, center, if_opposite_direction=False):
     """ Given the point, returns the rotated point.
@@ -343,37 +113,21 @@ def rotate_single_point(point, bounding_box, center, if_opposite_direction=False
             :parameter if_opposite_direction.
         Returns
         -------
-        [(int, int)]: 4 corner points of rectangle.
+        (float, float): rotated point.
         """
-    x1, y1 = point
-    center_x, center_y = center
-
-    if if_opposite_direction:
-        rotation_angle_in_rad = get_smaller_angle(bounding_box)
-    else:
-        rotation_angle_in_rad = -get_smaller_angle(bounding_box)
-
-    x_dash_1 = (x1 - center_x) * cos(rotation_angle_in_rad) - (y1 - center_y) * sin(rotation_angle_in_rad) + center_x
-    y_dash_1 = (y1 - center_y) * cos(rotation_angle_in_rad) + (x1 - center_x) * sin(rotation_angle_in_rad) + center_y
-    return x_dash_1, y_dash_1
+    return tuple(rotate_list_points([point], bounding_box, center, if_opposite_direction)[0])
 
 def rotate_list_points(points, bounding_box, center, if_opposite_direction=False):
-    center_x, center_y = center
-    if if_opposite_direction:
-        rotation_angle_in_rad = get_smaller_angle(bounding_box)
-    else:
-        rotation_angle_in_rad = -get_smaller_angle(bounding_box)
-
-    rot_points = []
-    for pt in points:
-        x_dash_1 = (pt[0] - center_x) * cos(rotation_angle_in_rad) - (pt[1] - center_y) * sin(
-            rotation_angle_in_rad) + center_x
-        y_dash_1 = (pt[1] - center_y) * cos(rotation_angle_in_rad) + (pt[0] - center_x) * sin(
-            rotation_angle_in_rad) + center_y
-
-        rot_points.append((x_dash_1, y_dash_1))
-
-    return rot_points
+    """ Given an (n, 2) array of points, returns the rotated points.
+            It rotates the points around the center by the smallest angle of the
+            bounding box in one affine transform. If :parameter if_opposite_direction
+            is set, the inverse rotation is applied.
+        Returns
+        -------
+        np.ndarray: (n, 2) array of rotated points.
+        """
+    rotation_matrix = get_rotation_matrix(center, -get_smaller_angle(bounding_box))
+    return transform_points(rotation_matrix, points, inverse=if_opposite_direction)
 
 def if_previous_b_b_smaller_than_curr_b_b(b_b_p, b_b_c):
     if b_b_c.length_parallel < b_b_c.length_orthogonal:
@@ -394,30 +148,21 @@ def if_previous_b_b_smaller_than_curr_b_b(b_b_p, b_b_c):
     else:
         return False
 
-def get_mask_from_page_image(image_file_name, madcat_file_path, image_fh, my_data):
-    """ Given a page image, extracts the page image mask from it.
+def get_mask_from_page_image(page, image_fh, my_data):
+    """ Given a page, extracts the page image mask from it. Only the size
+        of the page image is used, its pixels are not decoded. The mask is
+        drawn at the page size, the pixels of the lines that fall outside
+        the page are dropped instead of being drawn on a padded page.
         Input
         -----
-        image_file_name (string): complete path and name of the page image.
-        madcat_file_path (string): complete path and name of the madcat xml file
-                                      corresponding to the page image.
+        page (Page): page image and madcat xml file, see page_model.py.
+        my_data (dict): bounding box of each line image name.
         """
-    im_wo_pad = Image.open(image_file_name)
-    im = pad_image(im_wo_pad)
-    img = Image.new('L', (im.size[0], im.size[1]), "white")
-    pixels = img.load()
+    width, height = (int(size) for size in page.image_size)
+    pixels = np.full((height, width), 255, dtype=np.uint8)
     val = 0
-    base_name = os.path.splitext(os.path.basename(image_file_name))[0]
-    doc = minidom.parse(madcat_file_path)
-    zone = doc.getElementsByTagName('zone')
-    bounding_box_list = []
-    for node in zone:
-        id = node.getAttribute('id')
-        line_id = '_' + id.zfill(4)
-        line_image_file_name = base_name + line_id + '.tif'
-        bounding_box = my_data[line_image_file_name]
-        bounding_box_list.append(bounding_box)
-
+    bounding_box_list = [my_data[line.line_image_file_name] for line in page.lines]
+    smaller_angles = page.smaller_angles
     for index in range(0, len(bounding_box_list)):
         bounding_box = bounding_box_list[index]
         if index == len(bounding_box_list)-1:
@@ -431,142 +176,61 @@ def get_mask_from_page_image(image_file_name, madcat_file_path, image_fh, my_dat
         val_old = val
         val += 10
 
-        g_b_b1, g_b_b2, g_b_b3, g_b_b4 = bounding_box.corner_points
-        g_b_bmin_x = int(min(g_b_b1[0], g_b_b2[0], g_b_b3[0], g_b_b4[0]))
-        g_b_bmin_y = int(min(g_b_b1[1], g_b_b2[1], g_b_b3[1], g_b_b4[1]))
-        g_b_bmax_x = int(max(g_b_b1[0], g_b_b2[0], g_b_b3[0], g_b_b4[0]))
-        g_b_bmax_y = int(max(g_b_b1[1], g_b_b2[1], g_b_b3[1], g_b_b4[1]))
+        g_b_bmin_x, g_b_bmin_y, g_b_bmax_x, g_b_bmax_y = bounding_box.envelope
         b_bwidth_half_x = (g_b_bmax_x - g_b_bmin_x) / 2
         b_bheight_half_y = (g_b_bmax_y - g_b_bmin_y) / 2
 
-        rel_b_b1 = (g_b_b1[0] - g_b_bmin_x, g_b_b1[1] - g_b_bmin_y)
-        rel_b_b2 = (g_b_b2[0] - g_b_bmin_x, g_b_b2[1] - g_b_bmin_y)
-        rel_b_b3 = (g_b_b3[0] - g_b_bmin_x, g_b_b3[1] - g_b_bmin_y)
-        rel_b_b4 = (g_b_b4[0] - g_b_bmin_x, g_b_b4[1] - g_b_bmin_y)
-        rel_points = [rel_b_b1, rel_b_b2, rel_b_b3, rel_b_b4]
-        cropped_bounding_box = bounding_box_tuple(bounding_box.area,
-                                                  bounding_box.length_parallel,
-                                                  bounding_box.length_orthogonal,
-                                                  bounding_box.length_orthogonal,
-                                                  bounding_box.unit_vector,
-                                                  bounding_box.unit_vector_angle,
-                                                  set(rel_points),
-                                                  bounding_box.rotated_corner_points
-                                                  )
-        (rel_rot_x1, rel_rot_y1), (rel_rot_x2, rel_rot_y2), (rel_rot_x3, rel_rot_y3),\
-        (rel_rot_x4, rel_rot_y4) = \
-            rotate_rectangle_corners(cropped_bounding_box, (b_bwidth_half_x, b_bheight_half_y))
-
-        rel_rot_b_bmin_x = int(min(rel_rot_x1, rel_rot_x2, rel_rot_x3, rel_rot_x4))
-        rel_rot_b_bmin_y = int(min(rel_rot_y1, rel_rot_y2, rel_rot_y3, rel_rot_y4))
-        rel_rot_b_bmax_x = int(max(rel_rot_x1, rel_rot_x2, rel_rot_x3, rel_rot_x4))
-        rel_rot_b_bmax_y = int(max(rel_rot_y1, rel_rot_y2, rel_rot_y3, rel_rot_y4))
-
-        list1 = range(rel_rot_b_bmin_x, rel_rot_b_bmax_x)
-        list2 = range(rel_rot_b_bmin_y, rel_rot_b_bmax_y)
-        points = list(itertools.product(list1, list2))
-
-        rel_points_old = rotate_list_points(points, cropped_bounding_box,
-                                    (b_bwidth_half_x, b_bheight_half_y), True)
-
-        for pt in rel_points_old:
-            x , y = pt[0] + g_b_bmin_x, pt[1] + g_b_bmin_y
-            if if_previous_smaller_than_curr and pixels[int(x), int(y)] == val_old:
-                continue
-            pixels[int(x), int(y)] = val
-
-    min_x = int(args.padding // 2)
-    min_y = int(args.padding // 2)
-    width_x = int(im_wo_pad.size[0])
-    height_y = int(im_wo_pad.size[1])
-    box = (min_x, min_y, width_x + min_x, height_y + min_y)
-    img_crop = img.crop(box)
-    set_line_image_data(img_crop, image_file_name, image_fh)
-
-def get_bounding_box(image_file_name, madcat_file_path):
-    """ Given a page image, extracts the line images from it.
-    Inout
-    -----
-    image_file_name (string): complete path and name of the page image.
-    madcat_file_path (string): complete path and name of the madcat xml file
-                                  corresponding to the page image.
+        rel_points = bounding_box.corner_points - (g_b_bmin_x, g_b_bmin_y)
+        rotation_matrix = get_rotation_matrix((b_bwidth_half_x, b_bheight_half_y), -smaller_angles[index])
+        rel_rot_b_bmin_x, rel_rot_b_bmin_y, rel_rot_b_bmax_x, rel_rot_b_bmax_y = get_envelope(
+            transform_points(rotation_matrix, rel_points))
+
+        # same order as itertools.product(x range, y range)
+        list1, list2 = np.meshgrid(np.arange(rel_rot_b_bmin_x, rel_rot_b_bmax_x),
+                                   np.arange(rel_rot_b_bmin_y, rel_rot_b_bmax_y), indexing='ij')
+        points = np.column_stack((list1.ravel(), list2.ravel()))
+
+        rel_points_old = transform_points(rotation_matrix, points, inverse=True)
+
+        # boxes are in padded page coordinates, pixels are truncated there,
+        # same as the original scripts, and then moved to the page
+        x = (rel_points_old[:, 0] + g_b_bmin_x).astype(np.int64) - page.offset
+        y = (rel_points_old[:, 1] + g_b_bmin_y).astype(np.int64) - page.offset
+        is_in_page = (x >= 0) & (x < width) & (y >= 0) & (y < height)
+        x = x[is_in_page]
+        y = y[is_in_page]
+        if if_previous_smaller_than_curr:
+            is_not_previous = pixels[y, x] != val_old
+            x = x[is_not_previous]
+            y = y[is_not_previous]
+        # values above 255 are clipped, same as PIL pixel access
+        pixels[y, x] = min(val, 255)
+
+    set_line_image_data(Image.fromarray(pixels), page.image_file_path, image_fh)
+
+def get_bounding_box(page):
+    """ Given a page, returns the minimum area bounding box of each line,
+        computed in one batch for the page.
+    Returns
+    -------
+    (dict): dictionary with key as line image name and value as BoundingBoxRecord.
     """
-    mydata = {}
-    doc = minidom.parse(madcat_file_path)
-    zone = doc.getElementsByTagName('zone')
-    for node in zone:
-        id = node.getAttribute('id')
-        token_image = node.getElementsByTagName('token-image')
-        minimum_bounding_box_input = []
-        for token_node in token_image:
-            word_point = token_node.getElementsByTagName('point')
-            for word_node in word_point:
-                word_coordinate = (int(word_node.getAttribute('x')), int(word_node.getAttribute('y')))
-                minimum_bounding_box_input.append(word_coordinate)
-        updated_mbb_input = update_minimum_bounding_box_input(minimum_bounding_box_input)
-        bounding_box = minimum_bounding_box(updated_mbb_input)
-
-        base_name = os.path.splitext(os.path.basename(image_file_name))[0]
-        line_id = '_' + id.zfill(4)
-        line_image_file_name = base_name + line_id + '.tif'
-        mydata[line_image_file_name] = bounding_box
-    return mydata
+    return {line.line_image_file_name: line.bounding_box for line in page.lines}
 
-def check_file_location(base_name, wc_dict1, wc_dict2, wc_dict3):
+def check_file_location(base_name, corpus_index):
     """ Returns the complete path of the page image and corresponding
-        xml file.
+        xml file, looked up in the corpus index. Pages filtered out of the
+        index by writing condition are not found.
     Returns
     -------
     image_file_name (string): complete path and name of the page image.
     madcat_file_path (string): complete path and name of the madcat xml file
                                corresponding to the page image.
     """
-    madcat_file_path1 = os.path.join(args.database_path1, 'madcat', base_name + '.madcat.xml')
-    madcat_file_path2 = os.path.join(args.database_path2, 'madcat', base_name + '.madcat.xml')
-    madcat_file_path3 = os.path.join(args.database_path3, 'madcat', base_name + '.madcat.xml')
-
-    image_file_path1 = os.path.join(args.database_path1, 'images', base_name + '.tif')
-    image_file_path2 = os.path.join(args.database_path2, 'images', base_name + '.tif')
-    image_file_path3 = os.path.join(args.database_path3, 'images', base_name + '.tif')
-
-    if os.path.exists(madcat_file_path1):
-        return madcat_file_path1, image_file_path1, wc_dict1
-
-    if os.path.exists(madcat_file_path2):
-        return madcat_file_path2, image_file_path2, wc_dict2
-
-    if os.path.exists(madcat_file_path3):
-        return madcat_file_path3, image_file_path3, wc_dict3
-
-    return None, None, None
-
-def parse_writing_conditions(writing_conditions):
-    """ Given writing condition file path, returns a dictionary which have writing condition
-        of each page image.
-    Returns
-    ------
-    (dict): dictionary with key as page image name and value as writing condition.
-    """
-    with open(writing_conditions) as f:
-        file_writing_cond = dict()
-        for line in f:
-            line_list = line.strip().split("\t")
-            file_writing_cond[line_list[0]] = line_list[3]
-    return file_writing_cond
-
-def check_writing_condition(wc_dict, base_name):
-    """ Given writing condition dictionary, checks if a page image is writing
-        in a specifed writing condition.
-        It is used to create subset of dataset based on writing condition.
-    Returns
-    (bool): True if writing condition matches.
-    """
-    return True
-    writing_condition = wc_dict[base_name].strip()
-    if writing_condition != 'IUC':
-        return False
-
-    return True
+    location = corpus_index.get(base_name)
+    if location is None:
+        return None, None
+    return location.madcat_file_path, location.image_file_path
 
 
 def main():
@@ -576,31 +240,31 @@ def main():
     args.data_splits = "/Users/ashisharora/google_Drive/madcat_arabic/madcat.dev.raw.lineid"
     args.out_dir = "/Users/ashisharora/google_Drive/madcat_arabic/masks"
 
-    writing_conditions1 = os.path.join(args.database_path1, 'writing_conditions.tab')
-    writing_conditions2 = os.path.join(args.database_path2, 'writing_conditions.tab')
-    writing_conditions3 = os.path.join(args.database_path3, 'writing_conditions.tab')
-
-    wc_dict1 = parse_writing_conditions(writing_conditions1)
-    wc_dict2 = parse_writing_conditions(writing_conditions2)
-    wc_dict3 = parse_writing_conditions(writing_conditions3)
+    # pages of other writing conditions are dropped before any xml or image is read
+    corpus_index = get_corpus_index([args.database_path1, args.database_path2,
+                                     args.database_path3], args.corpus_index)
+    corpus_index = filter_corpus_index(corpus_index,
+                                       parse_writing_condition_filter(args.writing_condition))
 
     output_directory = args.out_dir
+    cache_dir = get_cache_dir(args.cache_dir, output_directory)
     image_file = os.path.join(output_directory, 'images.txt')
     image_fh = open(image_file, 'w', encoding='utf-8')
 
-    splits_handle = open(args.data_splits, 'r')
-    splits_data = splits_handle.read().strip().split('\n')
-    prev_base_name = ''
-    for line in splits_data:
-        base_name = os.path.splitext(os.path.splitext(line.split(' ')[0])[0])[0]
-        if prev_base_name != base_name:
-            prev_base_name = base_name
-            madcat_file_path, image_file_path, wc_dict = check_file_location(base_name, wc_dict1, wc_dict2, wc_dict3)
-            if wc_dict is None or not check_writing_condition(wc_dict, base_name):
-                continue
-            if madcat_file_path is not None:
-                my_data = get_bounding_box(image_file_path, madcat_file_path)
-                get_mask_from_page_image(image_file_path, madcat_file_path, image_fh, my_data)
+    # pages missing from the shards fall back to the xml file
+    shard_annotations = dict()
+    if args.line_shards is not None:
+        shard_annotations = load_shard_annotations(args.line_shards)
+
+    size_cache = ImageSizeCache(args.size_cache)
+    for base_name in read_split_file(args.data_splits):
+        madcat_file_path, image_file_path = check_file_location(base_name, corpus_index)
+        if madcat_file_path is not None:
+            page = Page(madcat_file_path, image_file_path, args.padding, cache_dir, size_cache,
+                        shard_annotations.get(base_name))
+            my_data = get_bounding_box(page)
+            get_mask_from_page_image(page, image_fh, my_data)
+    size_cache.save()
 
 if __name__ == '__main__':
       main()
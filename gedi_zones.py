@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+
+# Copyright   2018 Ashish Arora
+# Apache 2.0
+
+""" This module reads the DL_ZONE (character) nodes of a GEDI xml file into
+ columnar numpy arrays and plans the line images of a whole page before any
+ pixel is read. Characters are grouped into lines with a stable sort on the
+ line id, so characters keep their document order inside a line, and lines are
+ in the order of their first character. The crop box of every character, its
+ paste location in the stitched line image and the size of every line image
+ are computed in one vectorized pass, see get_line_plan.
+"""
+
+import xml.etree.ElementTree as ElementTree
+from collections import namedtuple
+import numpy as np
+from PIL import Image
+from madcat_xml import _get_local_name, _iterparse_detached
+
+"""
+gedi_zones is a named tuple which contains the DL_ZONE nodes with a lineID,
+in document order:
+             line_ids (np.ndarray): lineID of each character
+             col (np.ndarray): left of each character
+             row (np.ndarray): top of each character
+             width (np.ndarray): width of each character
+             height (np.ndarray): height of each character
+"""
+gedi_zones = namedtuple('gedi_zones', 'line_ids '
+                                      'col '
+                                      'row '
+                                      'width '
+                                      'height')
+
+"""
+gedi_line_plan is a named tuple which contains everything needed to stitch the
+line images of a page. Characters are ordered by line:
+             line_ids (np.ndarray): id of each line, in order of first character
+             line_offsets (np.ndarray): characters of line i are
+                                        [line_offsets[i]:line_offsets[i+1]]
+             zone_index (np.ndarray): index in gedi_zones of each character
+             crop_boxes (np.ndarray): (n, 4) left, upper, right, lower crop box
+                                      of each character in the page image
+             paste_points (np.ndarray): (n, 2) x, y location of each character
+                                        in its line image
+             image_sizes (np.ndarray): (num_lines, 2) width, height of each
+                                       line image
+"""
+gedi_line_plan = namedtuple('gedi_line_plan', 'line_ids '
+                                              'line_offsets '
+                                              'zone_index '
+                                              'crop_boxes '
+                                              'paste_points '
+                                              'image_sizes')
+
+
+def _read_gedi(gedi_file_path, keep_unlabeled=False):
+    """ Given a gedi xml file, reads the DL_ZONE attributes and the size of
+        the DL_PAGE, if it has width and height attributes.
+    Returns
+    -------
+    (gedi_zones, (int, int)): DL_ZONE attributes and width, height of the
+                              page or None.
+    """
+    line_ids, values = [], []
+    page_size = None
+    for _, elem in _iterparse_detached(gedi_file_path):
+        name = _get_local_name(elem.tag)
+        if name == 'DL_PAGE':
+            if elem.get('width') and elem.get('height'):
+                page_size = (int(elem.get('width')), int(elem.get('height')))
+        elif name == 'DL_ZONE':
+            line_id = elem.get('lineID', '')
+            if line_id != '' or keep_unlabeled:
+                line_ids.append(line_id)
+                values.extend((elem.get('col'), elem.get('row'),
+                               elem.get('width'), elem.get('height')))
+
+    values = np.array(values, dtype=np.str_).astype(np.int64).reshape(-1, 4)
+    zones = gedi_zones(line_ids=np.array(line_ids, dtype=np.str_),
+                       col=values[:, 0], row=values[:, 1],
+                       width=values[:, 2], height=values[:, 3])
+    return zones, page_size
+
+
+def read_gedi_zones(gedi_file_path):
+    """ Given a gedi xml file, reads the lineID, col, row, width and height
+        attributes of its DL_ZONE nodes. Nodes without lineID are skipped.
+    Returns
+    -------
+    gedi_zones: DL_ZONE attributes as columnar arrays.
+    """
+    return _read_gedi(gedi_file_path)[0]
+
+
+def get_line_plan(zones, width_buffer=0, height_buffer=0,
+                  char_width_buffer=10, char_height_buffer=20):
+    """ Given the zones of a page and the buffers of the line extraction
+        scripts, groups characters into lines and computes crop boxes,
+        paste locations and line image sizes. Same as the previous_line_id
+        loop and merge_characters_into_line_image, with the top offset of a
+        character taken from the first character of its line.
+    Returns
+    -------
+    gedi_line_plan: line image plan of the page.
+    """
+    if len(zones.line_ids) == 0:
+        empty = np.zeros(0, dtype=np.int64)
+        return gedi_line_plan(line_ids=zones.line_ids, line_offsets=np.zeros(1, dtype=np.int64),
+                              zone_index=empty, crop_boxes=empty.reshape(0, 4),
+                              paste_points=empty.reshape(0, 2), image_sizes=empty.reshape(0, 2))
+    _, first_index, line_codes = np.unique(zones.line_ids, return_index=True,
+                                           return_inverse=True)
+    # renumber lines in order of their first character
+    line_rank = np.empty_like(first_index)
+    line_rank[np.argsort(first_index, kind='stable')] = np.arange(len(first_index))
+    line_codes = line_rank[line_codes.reshape(-1)]
+    zone_index = np.argsort(line_codes, kind='stable')
+    line_codes = line_codes[zone_index]
+    line_offsets = np.concatenate(([0], np.flatnonzero(np.diff(line_codes)) + 1,
+                                   [len(zone_index)])).astype(np.int64)
+    line_ids = zones.line_ids[zone_index[line_offsets[:-1]]]
+
+    col = zones.col[zone_index] - height_buffer
+    row = zones.row[zone_index] - width_buffer
+    crop_width = zones.width[zone_index] + height_buffer
+    crop_height = zones.height[zone_index] + width_buffer
+    crop_boxes = np.column_stack((col, row, col + crop_width, row + crop_height))
+
+    first_row = zones.row[zone_index][line_offsets[:-1]]
+    height_offsets = zones.row[zone_index] - first_row[line_codes]
+    step = crop_width + char_width_buffer
+    step_end = np.cumsum(step)
+    step_start = step_end - step
+    paste_x = step_start - step_start[line_offsets[:-1]][line_codes]
+    paste_points = np.column_stack((paste_x, height_offsets + char_height_buffer))
+
+    image_sizes = np.column_stack((np.add.reduceat(step, line_offsets[:-1]),
+                                   np.maximum.reduceat(crop_height, line_offsets[:-1])
+                                   + char_height_buffer * 2))
+    return gedi_line_plan(line_ids=line_ids, line_offsets=line_offsets,
+                          zone_index=zone_index, crop_boxes=crop_boxes,
+                          paste_points=paste_points, image_sizes=image_sizes)
+
+
+def iter_line_images(im, plan):
+    """ Given the page image and its line plan, yields the stitched image of
+        each line.
+    Returns
+    -------
+    (string, Image): line id and stitched line image.
+    """
+    crop_boxes = plan.crop_boxes.tolist()
+    paste_points = plan.paste_points.tolist()
+    for index, line_id in enumerate(plan.line_ids.tolist()):
+        stitched_image = Image.new('RGB', tuple(plan.image_sizes[index].tolist()), "white")
+        for i in range(plan.line_offsets[index], plan.line_offsets[index + 1]):
+            stitched_image.paste(im=im.crop(tuple(crop_boxes[i])), box=tuple(paste_points[i]))
+        yield line_id, stitched_image
+
+
+"""
+gedi_validation is a named tuple which contains the result of validate_gedi_zones:
+             is_valid (bool): True if the page can be used for line extraction
+             num_zones (int): number of DL_ZONE nodes
+             num_lines (int): number of distinct line ids
+             issues ([string]): description of each problem found, problems
+                                that do not make the page invalid are
+                                prefixed by 'warning:'
+"""
+gedi_validation = namedtuple('gedi_validation', 'is_valid '
+                                                'num_zones '
+                                                'num_lines '
+                                                'issues')
+
+
+def validate_gedi_zones(zones, page_size=None):
+    """ Given the zones of a page, read with unlabeled zones kept, and
+        optionally the page width and height, checks that line ids are
+        integers forming a contiguous range, that the characters of a line
+        are contiguous in the document, and that no zone has zero size or
+        lies outside the page. Zones without lineID are reported as a
+        warning, the line extraction skips them.
+    Returns
+    -------
+    gedi_validation: result of the checks.
+    """
+    issues = []
+    labeled = zones.line_ids != ''
+    num_unlabeled = int(np.count_nonzero(~labeled))
+    if num_unlabeled:
+        issues.append('warning: {} zones without lineID'.format(num_unlabeled))
+
+    line_ids = zones.line_ids[labeled]
+    num_lines = 0
+    if len(line_ids) == 0:
+        issues.append('no zone with lineID')
+    else:
+        try:
+            line_numbers = line_ids.astype(np.int64)
+        except ValueError:
+            line_numbers = None
+            issues.append('non integer lineID')
+        if line_numbers is not None:
+            unique_numbers = np.unique(line_numbers)
+            num_lines = len(unique_numbers)
+            if unique_numbers[-1] - unique_numbers[0] + 1 != num_lines:
+                issues.append('lineID not contiguous, {} ids in range {}-{}'.format(
+                    num_lines, unique_numbers[0], unique_numbers[-1]))
+            num_runs = 1 + int(np.count_nonzero(np.diff(line_numbers)))
+            if num_runs != num_lines:
+                issues.append('characters of a line are not contiguous, {} runs for {} lines'.format(
+                    num_runs, num_lines))
+
+    zero_size = (zones.width <= 0) | (zones.height <= 0)
+    if zero_size.any():
+        issues.append('{} zones with zero size'.format(int(np.count_nonzero(zero_size))))
+
+    if page_size is not None:
+        page_width, page_height = page_size
+        outside = ((zones.col < 0) | (zones.row < 0) |
+                   (zones.col + zones.width > page_width) |
+                   (zones.row + zones.height > page_height))
+        if outside.any():
+            issues.append('{} zones outside the {}x{} page'.format(
+                int(np.count_nonzero(outside)), page_width, page_height))
+
+    is_valid = all(issue.startswith('warning:') for issue in issues)
+    return gedi_validation(is_valid=is_valid, num_zones=len(zones.line_ids),
+                           num_lines=num_lines, issues=issues)
+
+
+def validate_gedi_file(gedi_file_path, image_file_path=None):
+    """ Given a gedi xml file and optionally its page image, reads the file
+        once and validates its zones. The page size is taken from DL_PAGE,
+        or from the header of the page image if DL_PAGE has no size.
+    Returns
+    -------
+    gedi_validation: result of the checks.
+    """
+    try:
+        zones, page_size = _read_gedi(gedi_file_path, keep_unlabeled=True)
+    except (ElementTree.ParseError, ValueError, TypeError) as e:
+        return gedi_validation(is_valid=False, num_zones=0, num_lines=0,
+                               issues=['unreadable: {}'.format(e)])
+    if page_size is None and image_file_path is not None:
+        with Image.open(image_file_path) as im:
+            page_size = im.size
+    return validate_gedi_zones(zones, page_size)
+
+
+def write_validation_report(results, report_file):
+    """ Given a list of (gedi file path, gedi_validation), writes one line
+        per file: path, ok or corrupt, number of zones and lines, and the
+        issues separated by ';'.
+    """
+    with open(report_file, 'w', encoding='utf-8') as f:
+        for gedi_file_path, result in results:
+            f.write('\t'.join((gedi_file_path,
+                               'ok' if result.is_valid else 'corrupt',
+                               str(result.num_zones),
+                               str(result.num_lines),
+                               '; '.join(result.issues))) + '\n')
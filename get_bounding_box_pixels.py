@@ -1,6 +1,5 @@
 import argparse
 import os
-import xml.dom.minidom as minidom
 import numpy as np
 
 import matplotlib
@@ -13,6 +12,8 @@ from matplotlib.patches import Arrow, Circle
 from scipy.spatial import ConvexHull
 from math import atan2, cos, sin, pi, degrees, sqrt
 from collections import namedtuple
+from madcat_cache import iter_cached_zones
+from bounding_box_utils import get_rotation_matrix, transform_points
 from skimage.io import imshow, show, imread, imsave
 from skimage.transform import rotate
 from skimage import img_as_uint, img_as_float
@@ -149,55 +150,12 @@ def get_smaller_angle(bounding_box):
 
 
 def rotated_points(bounding_box, center, if_opposite_direction=False):
-    p1, p2, p3, p4 = bounding_box.corner_points
-    x1, y1 = p1
-    x2, y2 = p2
-    x3, y3 = p3
-    x4, y4 = p4
-    center_x, center_y = center
-
     if if_opposite_direction:
         rotation_angle_in_rad = get_smaller_angle(bounding_box)
     else:
         rotation_angle_in_rad = -get_smaller_angle(bounding_box)
-
-    x_dash_1 = (x1 - center_x) * cos(rotation_angle_in_rad) - (y1 - center_y) * sin(rotation_angle_in_rad) + center_x
-    x_dash_2 = (x2 - center_x) * cos(rotation_angle_in_rad) - (y2 - center_y) * sin(rotation_angle_in_rad) + center_x
-    x_dash_3 = (x3 - center_x) * cos(rotation_angle_in_rad) - (y3 - center_y) * sin(rotation_angle_in_rad) + center_x
-    x_dash_4 = (x4 - center_x) * cos(rotation_angle_in_rad) - (y4 - center_y) * sin(rotation_angle_in_rad) + center_x
-
-    y_dash_1 = (y1 - center_y) * cos(rotation_angle_in_rad) + (x1 - center_x) * sin(rotation_angle_in_rad) + center_y
-    y_dash_2 = (y2 - center_y) * cos(rotation_angle_in_rad) + (x2 - center_x) * sin(rotation_angle_in_rad) + center_y
-    y_dash_3 = (y3 - center_y) * cos(rotation_angle_in_rad) + (x3 - center_x) * sin(rotation_angle_in_rad) + center_y
-    y_dash_4 = (y4 - center_y) * cos(rotation_angle_in_rad) + (x4 - center_x) * sin(rotation_angle_in_rad) + center_y
-
-    return x_dash_1, y_dash_1, x_dash_2, y_dash_2, x_dash_3, y_dash_3, x_dash_4, y_dash_4
-
-
-def pad_image(image):
-    width_padding = 200
-    height_padding = 200
-    stitched_image = Image.new('RGB', (image.size[0] + 2*width_padding, image.size[1] + 2*height_padding), "white")
-    width_offset = 200
-    height_offset = 200
-    stitched_image.paste(im=image, box=(width_offset, height_offset))
-    # ax.imshow(stitched_image)
-    # plt.show()
-    return stitched_image
-
-
-def update_minimum_bounding_box_input(bounding_box_input):
-    width_padding = 200
-    height_padding = 200
-    updated_minimum_bounding_box_input = []
-    for point in bounding_box_input:
-        x, y = point
-        new_x = x + width_padding
-        new_y = y + height_padding
-        word_coordinate = (new_x, new_y)
-        updated_minimum_bounding_box_input.append(word_coordinate)
-
-    return updated_minimum_bounding_box_input
+    rotation_matrix = get_rotation_matrix(center, rotation_angle_in_rad)
+    return tuple(transform_points(rotation_matrix, list(bounding_box.corner_points)).ravel().tolist())
 
 
 def set_line_image_data(image, line_id, image_file_name):
@@ -209,23 +167,12 @@ def set_line_image_data(image, line_id, image_file_name):
 
 
 def get_line_images_from_page_image(image_file_name, madcat_file_path):
-    doc = minidom.parse(madcat_file_path)
-    zone = doc.getElementsByTagName('zone')
-    for node in zone:
-        id = node.getAttribute('id')
+    for id, minimum_bounding_box_input in iter_cached_zones(madcat_file_path, madcat_cache_dir):
         print(id)
         if id != 'z1':
             continue
-        token_image = node.getElementsByTagName('token-image')
-        minimum_bounding_box_input = []
-        for token_node in token_image:
-            word_point = token_node.getElementsByTagName('point')
-            for word_node in word_point:
-                word_coordinate = (int(word_node.getAttribute('x')), int(word_node.getAttribute('y')))
-                minimum_bounding_box_input.append(word_coordinate)
 
-        updated_mbb_input = update_minimum_bounding_box_input(minimum_bounding_box_input)
-        bounding_box = minimum_bounding_box(updated_mbb_input)
+        bounding_box = minimum_bounding_box(minimum_bounding_box_input)
 
         p1, p2, p3, p4 = bounding_box.corner_points
         print(p1, p2, p3, p4)
@@ -295,6 +242,8 @@ def get_line_images_from_page_image(image_file_name, madcat_file_path):
 ### main ###
 fig,ax = plt.subplots(1)
 line_images_path = '/Users/ashisharora/madcat_ar'
+# parsed madcat xml sidecars, kept out of the corpus directories
+madcat_cache_dir = os.path.join(line_images_path, 'madcat_cache')
 data_path = '/Users/ashisharora/madcat_ar'
 for file in os.listdir(os.path.join(data_path, 'images')):
     if file.endswith(".tif"):
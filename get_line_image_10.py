@@ -31,14 +31,17 @@
 
 import argparse
 import os
-import xml.dom.minidom as minidom
 from PIL import Image
 import numpy as np
 from scipy.misc import toimage
 
 from scipy.spatial import ConvexHull
-from math import atan2, cos, sin, pi, degrees, sqrt
+from math import atan2, cos, sin, pi, degrees, radians, sqrt
 from collections import namedtuple
+from madcat_cache import iter_cached_zones
+from bounding_box_utils import get_rotation_matrix, transform_points
+from line_warp import get_rotated_crop
+from rotated_page_cache import RotatedPageCache
 
 # parser = argparse.ArgumentParser(description="Creates line images from page image",
 #                                  epilog="E.g. local/create_line_image_from_page_image.py data/LDC2012T15"
@@ -296,7 +299,7 @@ def get_smaller_angle(bounding_box):
         return ortho_vector_angle_updated
 
 
-def rotated_points(bounding_box, center):
+def rotated_points(bounding_box, center, angle=None):
     """ Rotates the corners of a  bounding box rectangle around the center by smallest angle
         of the rectangle. It first finds the smallest angle of the rectangle
         then rotates it around the given center point.
@@ -304,27 +307,16 @@ def rotated_points(bounding_box, center):
         rectangle (bounding_box): bounding box rectangle
         center (int, int): center point around which the corners of rectangle are rotated.
         Eg. (2550, 3300).
+        angle (float): angle the page is rotated by, in radians. By default the
+        smallest angle of the rectangle.
     Returns: 4 corner points of rectangle.
         Eg. ((1.0, -1.0), (2.0, -3.0), (3.0, 4.0), (5.0, 6.0))
     """
 
-    p1, p2, p3, p4 = bounding_box.corner_points
-    x1, y1 = p1
-    x2, y2 = p2
-    x3, y3 = p3
-    x4, y4 = p4
-    center_x, center_y = center
-    rotation_angle_in_rad = -get_smaller_angle(bounding_box)
-    x_dash_1 = (x1 - center_x) * cos(rotation_angle_in_rad) - (y1 - center_y) * sin(rotation_angle_in_rad) + center_x
-    x_dash_2 = (x2 - center_x) * cos(rotation_angle_in_rad) - (y2 - center_y) * sin(rotation_angle_in_rad) + center_x
-    x_dash_3 = (x3 - center_x) * cos(rotation_angle_in_rad) - (y3 - center_y) * sin(rotation_angle_in_rad) + center_x
-    x_dash_4 = (x4 - center_x) * cos(rotation_angle_in_rad) - (y4 - center_y) * sin(rotation_angle_in_rad) + center_x
-
-    y_dash_1 = (y1 - center_y) * cos(rotation_angle_in_rad) + (x1 - center_x) * sin(rotation_angle_in_rad) + center_y
-    y_dash_2 = (y2 - center_y) * cos(rotation_angle_in_rad) + (x2 - center_x) * sin(rotation_angle_in_rad) + center_y
-    y_dash_3 = (y3 - center_y) * cos(rotation_angle_in_rad) + (x3 - center_x) * sin(rotation_angle_in_rad) + center_y
-    y_dash_4 = (y4 - center_y) * cos(rotation_angle_in_rad) + (x4 - center_x) * sin(rotation_angle_in_rad) + center_y
-    return x_dash_1, y_dash_1, x_dash_2, y_dash_2, x_dash_3, y_dash_3, x_dash_4, y_dash_4
+    if angle is None:
+        angle = get_smaller_angle(bounding_box)
+    rotation_matrix = get_rotation_matrix(center, -angle)
+    return tuple(transform_points(rotation_matrix, list(bounding_box.corner_points)).ravel().tolist())
 
 
 def set_line_image_data(image, line_id, image_file_name):
@@ -358,27 +350,16 @@ def get_line_images_from_page_image(image_file_name, madcat_file_path):
     """
 
     im = Image.open(image_file_name)
-    doc = minidom.parse(madcat_file_path)
-    zone = doc.getElementsByTagName('zone')
-    for node in zone:
-        id = node.getAttribute('id')
+    for id, minimum_bounding_box_input in iter_cached_zones(madcat_file_path, madcat_cache_dir):
         if id == 'z14':
-            token_image = node.getElementsByTagName('token-image')
-            minimum_bounding_box_input = []
-            for token_node in token_image:
-                word_point = token_node.getElementsByTagName('point')
-                col_word, row_word = [], []
-                for word_node in word_point:
-                    col_word.append(int(word_node.getAttribute('x')))
-                    row_word.append(int(word_node.getAttribute('y')))
-                    word_coordinate = (int(word_node.getAttribute('x')), int(word_node.getAttribute('y')))
-                    minimum_bounding_box_input.append(word_coordinate)
             bounding_box = minimum_bounding_box(minimum_bounding_box_input)
             rotation_angle_in_rad = get_smaller_angle(bounding_box)
+            if not roi_warp:
+                # lines with nearly the same angle share one rotation of the page
+                rotation_angle_in_rad = page_cache.quantize_angle(rotation_angle_in_rad)
 
-            img2 = im.rotate(degrees(rotation_angle_in_rad), resample=Image.BICUBIC)
             x_dash_1, y_dash_1, x_dash_2, y_dash_2, x_dash_3, y_dash_3, x_dash_4, y_dash_4 = rotated_points(
-                bounding_box, get_center(im))
+                bounding_box, get_center(im), rotation_angle_in_rad)
 
             min_x = min(x_dash_1, x_dash_2, x_dash_3, x_dash_4)
             min_y = min(y_dash_1, y_dash_2, y_dash_3, y_dash_4)
@@ -387,7 +368,19 @@ def get_line_images_from_page_image(image_file_name, madcat_file_path):
             max_y = max(y_dash_1, y_dash_2, y_dash_3, y_dash_4)
             box = (min_x, min_y, max_x, max_y)
 
-            region = img2.crop(box)
+            if roi_warp:
+                # same as cropping the rotated page, only the line pixels are interpolated
+                # PIL rotates bilevel images with nearest neighbour
+                box = tuple(int(round(value)) for value in box)
+                order = 0 if im.mode == '1' else 3
+                region = get_rotated_crop(np.asarray(im.convert('L') if im.mode == '1' else im),
+                                          rotation_angle_in_rad, box, order=order,
+                                          clip_box=False, pil=True)
+                region = Image.fromarray(np.clip(region, 0, 255).astype(np.uint8))
+            else:
+                img2 = page_cache.get(image_file_name, rotation_angle_in_rad,
+                                      lambda angle: im.rotate(degrees(angle), resample=Image.BICUBIC))
+                region = img2.crop(box)
             region.show()
             input("Press the <ENTER> key to continue...")
             # set_line_image_data(region, id, image_file_name)
@@ -490,7 +483,16 @@ def check_writing_condition(wc_dict):
 #             if madcat_file_path != None:
 #                 get_line_images_from_page_image(image_file_path, madcat_file_path)
 
+# if True, each line is interpolated from the page directly instead of
+# rotating the whole page for every zone
+roi_warp = True
+# rotated pages kept for the roi_warp = False path, angles are rounded to
+# rotation_angle_step degrees so that lines of a page reuse the rotation
+rotation_angle_step = 0.05
+page_cache = RotatedPageCache(max_bytes=512 * 2**20, angle_step=radians(rotation_angle_step))
 line_images_path = '/Users/ashisharora/madcat_ar'
+# parsed madcat xml sidecars, kept out of the corpus directories
+madcat_cache_dir = os.path.join(line_images_path, 'madcat_cache')
 data_path = '/Users/ashisharora/madcat_ar'
 for file in os.listdir(os.path.join(data_path, 'images')):
     if file.endswith(".tif"):
@@ -498,3 +500,5 @@ for file in os.listdir(os.path.join(data_path, 'images')):
         gedi_file_path = os.path.join(data_path, 'madcat', file)
         gedi_file_path = gedi_file_path.replace(".tif", ".madcat.xml")
         get_line_images_from_page_image(image_path, gedi_file_path)
+if not roi_warp:
+    print(page_cache)
@@ -31,7 +31,6 @@
 
 import argparse
 import os
-import xml.dom.minidom as minidom
 import numpy as np
 from scipy.misc import toimage
 import matplotlib
@@ -40,9 +39,11 @@ matplotlib.use('TkAgg')
 import matplotlib.pyplot as plt
 import matplotlib.patches as patches
 
-from scipy.spatial import ConvexHull
-from math import atan2, cos, sin, pi, degrees, sqrt
-from collections import namedtuple
+from madcat_cache import iter_cached_zones
+from bounding_box_utils import get_rotation_matrix, minimum_bounding_box_vectorized, transform_points
+from line_warp import clip_to_image_range, get_deskewed_lines, get_rotated_crop
+from rotated_page_cache import RotatedPageCache
+from math import atan2, cos, sin, pi, degrees, radians, sqrt
 from skimage.io import imshow, show, imread, imsave
 from skimage.transform import rotate
 from skimage import img_as_uint
@@ -61,41 +62,6 @@ from skimage import img_as_uint
 #                     help='Path to file that contains the train/test/dev split information')
 # args = parser.parse_args()
 
-"""
-bounding_box is a named tuple which contains:
-             area (float): area of the rectangle
-             length_parallel (float): length of the side that is parallel to unit_vector
-             length_orthogonal (float): length of the side that is orthogonal to unit_vector
-             rectangle_center(int, int): coordinates of the rectangle center
-             (use rectangle_corners to get the corner points of the rectangle)
-             unit_vector (float, float): direction of the length_parallel side.
-             (it's orthogonal vector can be found with the orthogonal_vector function
-             unit_vector_angle (float): angle of the unit vector to be in radians.
-             corner_points [(float, float)]: set that contains the corners of the rectangle
-"""
-bounding_box = namedtuple('bounding_box', ('area',
-                                           'length_parallel',
-                                           'length_orthogonal',
-                                           'rectangle_center',
-                                           'unit_vector',
-                                           'unit_vector_angle',
-                                           'corner_points'))
-
-
-def unit_vector(pt0, pt1):
-    """ Returns an unit vector that points in the direction of pt0 to pt1.
-    Args:
-        pt0 (float, float): Point 0. Eg. (1.0, 2.0).
-        pt1 (float, float): Point 1. Eg. (3.0, 8.0).
-    Returns:
-        (float, float): unit vector that points in the direction of pt0 to pt1.
-        Eg.  0.31622776601683794, 0.9486832980505138
-    """
-    dis_0_to_1 = sqrt((pt0[0] - pt1[0]) ** 2 + (pt0[1] - pt1[1]) ** 2)
-    return (pt1[0] - pt0[0]) / dis_0_to_1, \
-           (pt1[1] - pt0[1]) / dis_0_to_1
-
-
 def orthogonal_vector(vector):
     """ From vector returns a orthogonal/perpendicular vector of equal length.
     Args:
@@ -107,147 +73,6 @@ def orthogonal_vector(vector):
     return -1 * vector[1], vector[0]
 
 
-def bounding_area(index, hull):
-    """ Returns a named tuple that mainly contains area of the box that bounds
-        the hull. This bounding box orintation is same as the orientation of the
-        lines formed by the point hull[index] and hull[index+1].
-    Args:
-        index (int): Eg. 1.
-        hull [(float, float)]: list or tuple of point cloud
-        Eg. ((1.0, -1.0), (2.0, -3.0), (3.0, 4.0), (5.0, 6.0)).
-    Returns: a named tuple that contains:
-             area: area of the rectangle
-             length_parallel: length of the side that is parallel to unit_vector
-             length_orthogonal: length of the side that is orthogonal to unit_vector
-             rectangle_center: coordinates of the rectangle center
-             (use rectangle_corners to get the corner points of the rectangle)
-             unit_vector: direction of the length_parallel side.
-             (it's orthogonal vector can be found with the orthogonal_vector function
-    """
-    unit_vector_p = unit_vector(hull[index], hull[index + 1])
-    unit_vector_o = orthogonal_vector(unit_vector_p)
-
-    dis_p = tuple(np.dot(unit_vector_p, pt) for pt in hull)
-    dis_o = tuple(np.dot(unit_vector_o, pt) for pt in hull)
-
-    min_p = min(dis_p)
-    min_o = min(dis_o)
-    len_p = max(dis_p) - min_p
-    len_o = max(dis_o) - min_o
-
-    return {'area': len_p * len_o,
-            'length_parallel': len_p,
-            'length_orthogonal': len_o,
-            'rectangle_center': (min_p + len_p / 2, min_o + len_o / 2),
-            'unit_vector': unit_vector_p,
-            }
-
-
-def to_xy_coordinates(unit_vector_angle, point):
-    """ Returns converted unit vector coordinates in x, y coordinates.
-    Args:
-        unit_vector_angle (float): angle of unit vector to be in radians.
-        Eg. 0.1543 .
-        point (float, float): Point from origin. Eg. (1.0, 2.0).
-    Returns:
-        (float, float): converted x,y coordinate of the unit vector.
-        Eg. 0.680742447866183, 2.1299271629971663
-    """
-    angle_orthogonal = unit_vector_angle + pi / 2
-    return point[0] * cos(unit_vector_angle) + point[1] * cos(angle_orthogonal), \
-           point[0] * sin(unit_vector_angle) + point[1] * sin(angle_orthogonal)
-
-
-def rotate_points(center_of_rotation, angle, points):
-    """ Rotates a point cloud around the center_of_rotation point by angle
-    Args:
-        center_of_rotation (float, float): angle of unit vector to be in radians.
-        Eg. (1.56, -23.4).
-        angle (float): angle of rotation to be in radians. Eg. 0.1543 .
-        points [(float, float)]: Points to be a list or tuple of points. Points to be rotated.
-        Eg. ((1.56, -23.4), (1.56, -23.4))
-    Returns:
-        [(float, float)]: Rotated points around center of rotation by angle
-        Eg. ((1.16, -12.4), (2.34, -34.4))
-    """
-
-    rot_points = []
-    ang = []
-    for pt in points:
-        diff = tuple([pt[d] - center_of_rotation[d] for d in range(2)])
-        diff_angle = atan2(diff[1], diff[0]) + angle
-        ang.append(diff_angle)
-        diff_length = sqrt(sum([d ** 2 for d in diff]))
-        rot_points.append((center_of_rotation[0] + diff_length * cos(diff_angle),
-                           center_of_rotation[1] + diff_length * sin(diff_angle)))
-
-    return rot_points
-
-
-def rectangle_corners(rectangle):
-    """ Given rectangle center and its inclination. It returns the corner
-        locations of the rectangle.
-    Args:
-        rectangle (bounding_box): the output of minimum bounding box rectangle
-    Returns:
-    [(float, float)]: 4 corner points of rectangle.
-        Eg. ((1.0, -1.0), (2.0, -3.0), (3.0, 4.0), (5.0, 6.0))
-    """
-    corner_points = []
-    for i1 in (.5, -.5):
-        for i2 in (i1, -1 * i1):
-            corner_points.append((rectangle['rectangle_center'][0] + i1 * rectangle['length_parallel'],
-                                  rectangle['rectangle_center'][1] + i2 * rectangle['length_orthogonal']))
-
-    return rotate_points(rectangle['rectangle_center'], rectangle['unit_vector_angle'], corner_points)
-
-
-# use this function to find the listed properties of the minimum bounding box of a point cloud
-def minimum_bounding_box(points):
-    """ Given a point cloud, it returns the minimum area rectangle bounding all
-        the points in the point cloud.
-    Args:
-        points [(float, float)]: points to be a list or tuple of 2D points
-                                 needs to be more than 2 points
-    Returns: returns a namedtuple that contains:
-             area: area of the rectangle
-             length_parallel: length of the side that is parallel to unit_vector
-             length_orthogonal: length of the side that is orthogonal to unit_vector
-             rectangle_center: coordinates of the rectangle center
-             (use rectangle_corners to get the corner points of the rectangle)
-             unit_vector: direction of the length_parallel side. RADIANS
-             (it's orthogonal vector can be found with the orthogonal_vector function
-             unit_vector_angle: angle of the unit vector
-             corner_points: set that contains the corners of the rectangle
-    """
-
-    if len(points) <= 2: raise ValueError('More than two points required.')
-
-    hull_ordered = [points[index] for index in ConvexHull(points).vertices]
-    hull_ordered.append(hull_ordered[0])
-    hull_ordered = tuple(hull_ordered)
-
-    min_rectangle = bounding_area(0, hull_ordered)
-    for i in range(1, len(hull_ordered) - 1):
-        rectangle = bounding_area(i, hull_ordered)
-        if rectangle['area'] < min_rectangle['area']:
-            min_rectangle = rectangle
-
-    min_rectangle['unit_vector_angle'] = atan2(min_rectangle['unit_vector'][1], min_rectangle['unit_vector'][0])
-    min_rectangle['rectangle_center'] = to_xy_coordinates(min_rectangle['unit_vector_angle'],
-                                                          min_rectangle['rectangle_center'])
-
-    return bounding_box(
-        area=min_rectangle['area'],
-        length_parallel=min_rectangle['length_parallel'],
-        length_orthogonal=min_rectangle['length_orthogonal'],
-        rectangle_center=min_rectangle['rectangle_center'],
-        unit_vector=min_rectangle['unit_vector'],
-        unit_vector_angle=min_rectangle['unit_vector_angle'],
-        corner_points=set(rectangle_corners(min_rectangle))
-    )
-
-
 def get_center(im):
     """ Returns the center pixel location of an image
     Args:
@@ -304,7 +129,7 @@ def get_smaller_angle(bounding_box):
         return ortho_vector_angle_updated
 
 
-def rotated_points(bounding_box, center):
+def rotated_points(bounding_box, center, angle=None):
     """ Rotates the corners of a  bounding box rectangle around the center by smallest angle
         of the rectangle. It first finds the smallest angle of the rectangle
         then rotates it around the given center point.
@@ -312,27 +137,17 @@ def rotated_points(bounding_box, center):
         rectangle (bounding_box): bounding box rectangle
         center (int, int): center point around which the corners of rectangle are rotated.
         Eg. (2550, 3300).
+        angle (float): angle the page is rotated by, in radians. By default the
+        smallest angle of the rectangle.
     Returns: 4 corner points of rectangle.
         Eg. ((1.0, -1.0), (2.0, -3.0), (3.0, 4.0), (5.0, 6.0))
     """
 
-    p1, p2, p3, p4 = bounding_box.corner_points
-    x1, y1 = p1
-    x2, y2 = p2
-    x3, y3 = p3
-    x4, y4 = p4
-    center_x, center_y = center
-    rotation_angle_in_rad = -get_smaller_angle(bounding_box)
-    x_dash_1 = (x1 - center_x) * cos(rotation_angle_in_rad) - (y1 - center_y) * sin(rotation_angle_in_rad) + center_x
-    x_dash_2 = (x2 - center_x) * cos(rotation_angle_in_rad) - (y2 - center_y) * sin(rotation_angle_in_rad) + center_x
-    x_dash_3 = (x3 - center_x) * cos(rotation_angle_in_rad) - (y3 - center_y) * sin(rotation_angle_in_rad) + center_x
-    x_dash_4 = (x4 - center_x) * cos(rotation_angle_in_rad) - (y4 - center_y) * sin(rotation_angle_in_rad) + center_x
-
-    y_dash_1 = (y1 - center_y) * cos(rotation_angle_in_rad) + (x1 - center_x) * sin(rotation_angle_in_rad) + center_y
-    y_dash_2 = (y2 - center_y) * cos(rotation_angle_in_rad) + (x2 - center_x) * sin(rotation_angle_in_rad) + center_y
-    y_dash_3 = (y3 - center_y) * cos(rotation_angle_in_rad) + (x3 - center_x) * sin(rotation_angle_in_rad) + center_y
-    y_dash_4 = (y4 - center_y) * cos(rotation_angle_in_rad) + (x4 - center_x) * sin(rotation_angle_in_rad) + center_y
-    return x_dash_1, y_dash_1, x_dash_2, y_dash_2, x_dash_3, y_dash_3, x_dash_4, y_dash_4
+    if angle is None:
+        angle = get_smaller_angle(bounding_box)
+    rotation_angle_in_rad = -angle
+    rotation_matrix = get_rotation_matrix(center, rotation_angle_in_rad)
+    return tuple(transform_points(rotation_matrix, bounding_box.corner_points).ravel().tolist())
 
 
 def set_line_image_data(image, line_id, image_file_name):
@@ -366,40 +181,68 @@ def get_line_images_from_page_image(image_file_name, madcat_file_path):
     """
 
     im = imread(image_file_name)
-    doc = minidom.parse(madcat_file_path)
-    zone = doc.getElementsByTagName('zone')
-    for node in zone:
-        id = node.getAttribute('id')
+    for id, minimum_bounding_box_input in iter_cached_zones(madcat_file_path, madcat_cache_dir):
         if id == 'z14':
-            token_image = node.getElementsByTagName('token-image')
-            minimum_bounding_box_input = []
-            for token_node in token_image:
-                word_point = token_node.getElementsByTagName('point')
-                col_word, row_word = [], []
-                for word_node in word_point:
-                    col_word.append(int(word_node.getAttribute('x')))
-                    row_word.append(int(word_node.getAttribute('y')))
-                    word_coordinate = (int(word_node.getAttribute('x')), int(word_node.getAttribute('y')))
-                    minimum_bounding_box_input.append(word_coordinate)
-            bounding_box = minimum_bounding_box(minimum_bounding_box_input)
+            bounding_box = minimum_bounding_box_vectorized(minimum_bounding_box_input)
             rotation_angle_in_rad = get_smaller_angle(bounding_box)
+            if not roi_warp:
+                # lines with nearly the same angle share one rotation of the page
+                rotation_angle_in_rad = page_cache.quantize_angle(rotation_angle_in_rad)
 
-            img2 = rotate(im, degrees(rotation_angle_in_rad), order=3)
             x_dash_1, y_dash_1, x_dash_2, y_dash_2, x_dash_3, y_dash_3, x_dash_4, y_dash_4 = rotated_points(
-                bounding_box, get_center(im))
+                bounding_box, get_center(im), rotation_angle_in_rad)
 
             min_x = int(min(x_dash_1, x_dash_2, x_dash_3, x_dash_4))
             min_y = int(min(y_dash_1, y_dash_2, y_dash_3, y_dash_4))
             max_x = int(max(x_dash_1, x_dash_2, x_dash_3, x_dash_4))
             max_y = int(max(y_dash_1, y_dash_2, y_dash_3, y_dash_4))
 
-            region = img2[min_y:max_y, min_x:max_x]
+            if roi_warp:
+                # same as slicing the rotated page, only the line pixels are interpolated
+                region = get_rotated_crop(im, rotation_angle_in_rad, (min_x, min_y, max_x, max_y))
+                region = clip_to_image_range(region, im)
+                if np.issubdtype(im.dtype, np.integer):
+                    region = region / np.iinfo(im.dtype).max
+            else:
+                img2 = page_cache.get(image_file_name, rotation_angle_in_rad,
+                                      lambda angle: rotate(im, degrees(angle), order=3))
+                region = img2[min_y:max_y, min_x:max_x]
             # imshow(region)
             # show()
             # input("Press the <ENTER> key to continue...")
             set_line_image_data(region, id, image_file_name)
 
 
+def get_deskewed_line_images_from_page_image(image_file_name, madcat_file_path):
+    """ Extracts all line images from page image with one rotation of the page
+        by its skew, see get_deskewed_lines. Lines whose angle is more than
+        deskew_tolerance degrees away from the page skew are rotated on their own.
+    Args:
+        image_file_name (string): complete path and name of the page image.
+        madcat_file_path (string): complete path and name of the madcat xml file
+                                  corresponding to the page image.
+    Returns:
+        (int, int): number of lines and number of lines cut from the page rotation.
+    """
+
+    im = imread(image_file_name)
+    ids, bounding_boxes = [], []
+    for id, minimum_bounding_box_input in iter_cached_zones(madcat_file_path, madcat_cache_dir):
+        ids.append(id)
+        bounding_boxes.append(minimum_bounding_box_vectorized(minimum_bounding_box_input))
+    angles = [get_smaller_angle(bounding_box) for bounding_box in bounding_boxes]
+    regions, is_fast = get_deskewed_lines(
+        im, bounding_boxes, angles, radians(deskew_tolerance),
+        lambda angle: rotate(im, degrees(angle), order=3, preserve_range=True, clip=False),
+        center=get_center(im))
+    for id, region in zip(ids, regions):
+        region = clip_to_image_range(region, im)
+        if np.issubdtype(im.dtype, np.integer):
+            region = region / np.iinfo(im.dtype).max
+        set_line_image_data(region, id, image_file_name)
+    return len(ids), int(is_fast.sum())
+
+
 # def check_file_location():
 #     """ Returns the complete path of the page image and corresponding
 #         xml file.
@@ -497,11 +340,35 @@ def check_writing_condition(wc_dict):
 #             if madcat_file_path != None:
 #                 get_line_images_from_page_image(image_file_path, madcat_file_path)
 
+# if True, each line is interpolated from the page directly instead of
+# rotating the whole page for every zone
+roi_warp = True
+# if True, each page is rotated once by the median angle of its lines and
+# only lines more than deskew_tolerance degrees away from it are rotated on their own
+page_deskew = False
+deskew_tolerance = 0.2
+# rotated pages kept for the roi_warp = False path, angles are rounded to
+# rotation_angle_step degrees so that lines of a page reuse the rotation
+rotation_angle_step = 0.05
+page_cache = RotatedPageCache(max_bytes=512 * 2**20, angle_step=radians(rotation_angle_step))
+num_lines, num_fast_lines = 0, 0
 line_images_path = '/Users/ashisharora/madcat_ar'
+# parsed madcat xml sidecars, kept out of the corpus directories
+madcat_cache_dir = os.path.join(line_images_path, 'madcat_cache')
 data_path = '/Users/ashisharora/madcat_ar'
 for file in os.listdir(os.path.join(data_path, 'images')):
     if file.endswith(".tif"):
         image_path = os.path.join(data_path, 'images', file)
         gedi_file_path = os.path.join(data_path, 'madcat', file)
         gedi_file_path = gedi_file_path.replace(".tif", ".madcat.xml")
-        get_line_images_from_page_image(image_path, gedi_file_path)
+        if page_deskew:
+            page_lines, page_fast_lines = get_deskewed_line_images_from_page_image(image_path, gedi_file_path)
+            num_lines += page_lines
+            num_fast_lines += page_fast_lines
+        else:
+            get_line_images_from_page_image(image_path, gedi_file_path)
+if page_deskew and num_lines:
+    print('{} of {} lines ({:.1%}) cut from the page rotation'.format(
+        num_fast_lines, num_lines, num_fast_lines / num_lines))
+if not page_deskew and not roi_warp:
+    print(page_cache)
@@ -1,6 +1,5 @@
 import argparse
 import os
-import xml.dom.minidom as minidom
 from PIL import Image
 import numpy as np
 from scipy.misc import toimage
@@ -9,6 +8,9 @@ from scipy.spatial import ConvexHull
 from math import sqrt
 from math import atan2, cos, sin, pi, degrees
 from collections import namedtuple
+from madcat_cache import iter_cached_zones
+from bounding_box_utils import get_rotation_matrix, transform_points
+from corpus_index import get_corpus_index
 
 parser = argparse.ArgumentParser(description="""Creates line images from page image.""")
 parser.add_argument('database_path1', type=str,
@@ -19,6 +21,9 @@ parser.add_argument('database_path3', type=str,
                     help='Path to the downloaded (and extracted) mdacat data file 3')
 parser.add_argument('data_splits', type=str,
                     help='Path to file that contains the train/test/dev split information')
+parser.add_argument('--corpus_index', type=str, default=None,
+                    help='page location index file, see corpus_index.py. By default '
+                         'corpus_index.tsv under the line images directory')
 args = parser.parse_args()
 
 bounding_box = namedtuple('bounding_box', ('area',
@@ -148,23 +153,9 @@ def get_smaller_angle(bounding_box):
 
 
 def rotated_points(bounding_box, center):
-    p1, p2, p3, p4 = bounding_box.corner_points
-    x1, y1 = p1
-    x2, y2 = p2
-    x3, y3 = p3
-    x4, y4 = p4
-    center_x, center_y = center
     rotation_angle_in_rad = -get_smaller_angle(bounding_box)
-    x_dash_1 = (x1 - center_x) * cos(rotation_angle_in_rad) - (y1 - center_y) * sin(rotation_angle_in_rad) + center_x
-    x_dash_2 = (x2 - center_x) * cos(rotation_angle_in_rad) - (y2 - center_y) * sin(rotation_angle_in_rad) + center_x
-    x_dash_3 = (x3 - center_x) * cos(rotation_angle_in_rad) - (y3 - center_y) * sin(rotation_angle_in_rad) + center_x
-    x_dash_4 = (x4 - center_x) * cos(rotation_angle_in_rad) - (y4 - center_y) * sin(rotation_angle_in_rad) + center_x
-
-    y_dash_1 = (y1 - center_y) * cos(rotation_angle_in_rad) + (x1 - center_x) * sin(rotation_angle_in_rad) + center_y
-    y_dash_2 = (y2 - center_y) * cos(rotation_angle_in_rad) + (x2 - center_x) * sin(rotation_angle_in_rad) + center_y
-    y_dash_3 = (y3 - center_y) * cos(rotation_angle_in_rad) + (x3 - center_x) * sin(rotation_angle_in_rad) + center_y
-    y_dash_4 = (y4 - center_y) * cos(rotation_angle_in_rad) + (x4 - center_x) * sin(rotation_angle_in_rad) + center_y
-    return x_dash_1, y_dash_1, x_dash_2, y_dash_2, x_dash_3, y_dash_3, x_dash_4, y_dash_4
+    rotation_matrix = get_rotation_matrix(center, rotation_angle_in_rad)
+    return tuple(transform_points(rotation_matrix, list(bounding_box.corner_points)).ravel().tolist())
 
 
 def set_line_image_data(image, line_id, image_file_name):
@@ -178,20 +169,7 @@ def set_line_image_data(image, line_id, image_file_name):
 
 def get_line_images_from_page_image(image_file_name, madcat_file_path):
     im = Image.open(image_file_name)
-    doc = minidom.parse(madcat_file_path)
-    zone = doc.getElementsByTagName('zone')
-    for node in zone:
-        id = node.getAttribute('id')
-        token_image = node.getElementsByTagName('token-image')
-        minimum_bounding_box_input = []
-        for token_node in token_image:
-            word_point = token_node.getElementsByTagName('point')
-            col_word, row_word = [], []
-            for word_node in word_point:
-                col_word.append(int(word_node.getAttribute('x')))
-                row_word.append(int(word_node.getAttribute('y')))
-                word_coordinate = (int(word_node.getAttribute('x')), int(word_node.getAttribute('y')))
-                minimum_bounding_box_input.append(word_coordinate)
+    for id, minimum_bounding_box_input in iter_cached_zones(madcat_file_path, madcat_cache_dir):
         bounding_box = minimum_bounding_box(minimum_bounding_box_input)
         rotation_angle_in_rad = get_smaller_angle(bounding_box)
 
@@ -211,26 +189,11 @@ def get_line_images_from_page_image(image_file_name, madcat_file_path):
 
 
 def check_file_location():
-
-    madcat_file_path1 = os.path.join(args.database_path1, 'madcat', base_name + '.madcat.xml')
-    madcat_file_path2 = os.path.join(args.database_path2, 'madcat', base_name + '.madcat.xml')
-    madcat_file_path3 = os.path.join(args.database_path3, 'madcat', base_name + '.madcat.xml')
-
-    image_file_path1 = os.path.join(args.database_path1, 'images', base_name + '.tif')
-    image_file_path2 = os.path.join(args.database_path2, 'images', base_name + '.tif')
-    image_file_path3 = os.path.join(args.database_path3, 'images', base_name + '.tif')
-
-    if os.path.exists(madcat_file_path1):
-        return madcat_file_path1, image_file_path1, wc_dict1
-
-    if os.path.exists(madcat_file_path2):
-        return madcat_file_path2, image_file_path2, wc_dict2
-
-    if os.path.exists(madcat_file_path3):
-        return madcat_file_path3, image_file_path3, wc_dict3
-
-    print("ERROR: path does not exist")
-    return None, None, None
+    location = corpus_index.get(base_name)
+    if location is None:
+        print("ERROR: path does not exist")
+        return None, None, None
+    return location.madcat_file_path, location.image_file_path, wc_dicts[location.database_path]
 
 def parse_writing_conditions(writing_conditions):
     with open(writing_conditions) as f:
@@ -255,6 +218,8 @@ char_width_buffer = int(args.char_width_buffer)
 char_height_buffer = int(args.char_height_buffer)
 line_images_path_list = args.database_path1.split('/')
 line_images_path = ('/').join(line_images_path_list[:3])
+# parsed madcat xml sidecars, kept out of the corpus directories
+madcat_cache_dir = os.path.join(line_images_path, 'madcat_cache')
 
 writing_condiiton_folder_list = args.database_path1.split('/')
 writing_condiiton_folder1 = ('/').join(writing_condiiton_folder_list[:4])
@@ -273,6 +238,11 @@ writing_conditions3 = os.path.join(writing_condiiton_folder3, 'docs', 'writing_c
 wc_dict1 = parse_writing_conditions(writing_conditions1)
 wc_dict2 = parse_writing_conditions(writing_conditions2)
 wc_dict3 = parse_writing_conditions(writing_conditions3)
+wc_dicts = {data_path1: wc_dict1, data_path2: wc_dict2, data_path3: wc_dict3}
+corpus_index_path = args.corpus_index
+if corpus_index_path is None:
+    corpus_index_path = os.path.join(line_images_path, 'corpus_index.tsv')
+corpus_index = get_corpus_index([data_path1, data_path2, data_path3], corpus_index_path)
 
 
 with open(args.data_splits) as f:
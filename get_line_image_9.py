@@ -31,7 +31,6 @@
 
 import argparse
 import os
-import xml.dom.minidom as minidom
 from PIL import Image
 import numpy as np
 from scipy.misc import toimage
@@ -43,9 +42,12 @@ import matplotlib.patches as patches
 from scipy.spatial import ConvexHull
 from math import atan2, cos, sin, pi, degrees, sqrt
 from collections import namedtuple
+from madcat_cache import iter_cached_zones
+from bounding_box_utils import get_rotation_matrix, transform_points
 
 from skimage.io import imshow, show, imread
 from skimage.transform import rotate
+from line_warp import clip_to_image_range, get_rotated_crop
 
 # parser = argparse.ArgumentParser(description="Creates line images from page image",
 #                                  epilog="E.g. local/create_line_image_from_page_image.py data/LDC2012T15"
@@ -315,23 +317,9 @@ def rotated_points(bounding_box, center):
         Eg. ((1.0, -1.0), (2.0, -3.0), (3.0, 4.0), (5.0, 6.0))
     """
 
-    p1, p2, p3, p4 = bounding_box.corner_points
-    x1, y1 = p1
-    x2, y2 = p2
-    x3, y3 = p3
-    x4, y4 = p4
-    center_x, center_y = center
     rotation_angle_in_rad = -get_smaller_angle(bounding_box)
-    x_dash_1 = (x1 - center_x) * cos(rotation_angle_in_rad) - (y1 - center_y) * sin(rotation_angle_in_rad) + center_x
-    x_dash_2 = (x2 - center_x) * cos(rotation_angle_in_rad) - (y2 - center_y) * sin(rotation_angle_in_rad) + center_x
-    x_dash_3 = (x3 - center_x) * cos(rotation_angle_in_rad) - (y3 - center_y) * sin(rotation_angle_in_rad) + center_x
-    x_dash_4 = (x4 - center_x) * cos(rotation_angle_in_rad) - (y4 - center_y) * sin(rotation_angle_in_rad) + center_x
-
-    y_dash_1 = (y1 - center_y) * cos(rotation_angle_in_rad) + (x1 - center_x) * sin(rotation_angle_in_rad) + center_y
-    y_dash_2 = (y2 - center_y) * cos(rotation_angle_in_rad) + (x2 - center_x) * sin(rotation_angle_in_rad) + center_y
-    y_dash_3 = (y3 - center_y) * cos(rotation_angle_in_rad) + (x3 - center_x) * sin(rotation_angle_in_rad) + center_y
-    y_dash_4 = (y4 - center_y) * cos(rotation_angle_in_rad) + (x4 - center_x) * sin(rotation_angle_in_rad) + center_y
-    return x_dash_1, y_dash_1, x_dash_2, y_dash_2, x_dash_3, y_dash_3, x_dash_4, y_dash_4
+    rotation_matrix = get_rotation_matrix(center, rotation_angle_in_rad)
+    return tuple(transform_points(rotation_matrix, list(bounding_box.corner_points)).ravel().tolist())
 
 
 def set_line_image_data(image, line_id, image_file_name):
@@ -370,29 +358,11 @@ def get_line_images_from_page_image(image_file_name, madcat_file_path):
     im = imread(image_file_name)
     # imshow(im)
     # show()
-    doc = minidom.parse(madcat_file_path)
-    zone = doc.getElementsByTagName('zone')
-    for node in zone:
-        id = node.getAttribute('id')
+    for id, minimum_bounding_box_input in iter_cached_zones(madcat_file_path, madcat_cache_dir):
         if id == 'z14':
-            token_image = node.getElementsByTagName('token-image')
-            minimum_bounding_box_input = []
-            for token_node in token_image:
-                word_point = token_node.getElementsByTagName('point')
-                col_word, row_word = [], []
-                for word_node in word_point:
-                    col_word.append(int(word_node.getAttribute('x')))
-                    row_word.append(int(word_node.getAttribute('y')))
-                    word_coordinate = (int(word_node.getAttribute('x')), int(word_node.getAttribute('y')))
-                    minimum_bounding_box_input.append(word_coordinate)
             bounding_box = minimum_bounding_box(minimum_bounding_box_input)
             rotation_angle_in_rad = get_smaller_angle(bounding_box)
 
-            # img2 = im.rotate(degrees(rotation_angle_in_rad), resample=Image.BICUBIC)
-            img2 = rotate(im, degrees(rotation_angle_in_rad), order=3)
-            # imshow(img2)
-            # show()
-
             x_dash_1, y_dash_1, x_dash_2, y_dash_2, x_dash_3, y_dash_3, x_dash_4, y_dash_4 = rotated_points(
                 bounding_box, get_center(im))
 
@@ -401,9 +371,15 @@ def get_line_images_from_page_image(image_file_name, madcat_file_path):
 
             max_x = int(max(x_dash_1, x_dash_2, x_dash_3, x_dash_4))
             max_y = int(max(y_dash_1, y_dash_2, y_dash_3, y_dash_4))
-            # box = (min_x, min_y, max_x, max_y)
-            # region = img2.crop(box)
-            region = img2[min_y:max_y, min_x:max_x]
+            if roi_warp:
+                # same as slicing the rotated page, only the line pixels are interpolated
+                region = get_rotated_crop(im, rotation_angle_in_rad, (min_x, min_y, max_x, max_y))
+                region = clip_to_image_range(region, im)
+                if np.issubdtype(im.dtype, np.integer):
+                    region = region / np.iinfo(im.dtype).max
+            else:
+                img2 = rotate(im, degrees(rotation_angle_in_rad), order=3)
+                region = img2[min_y:max_y, min_x:max_x]
             imshow(region)
             show()
         # set_line_image_data(region, id, image_file_name)
@@ -505,7 +481,12 @@ def check_writing_condition(wc_dict):
 #             if madcat_file_path != None:
 #                 get_line_images_from_page_image(image_file_path, madcat_file_path)
 
+# if True, each line is interpolated from the page directly instead of
+# rotating the whole page for every zone
+roi_warp = True
 line_images_path = '/Users/ashisharora/madcat_ar'
+# parsed madcat xml sidecars, kept out of the corpus directories
+madcat_cache_dir = os.path.join(line_images_path, 'madcat_cache')
 data_path = '/Users/ashisharora/madcat_ar'
 for file in os.listdir(os.path.join(data_path, 'images')):
     if file.endswith(".tif"):
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+
+# Copyright   2018 Ashish Arora
+# Apache 2.0
+
+""" This module returns the width and height of a TIFF or PNG image by reading
+ only its header (the PNG IHDR chunk, or the first TIFF image file directory),
+ without decoding pixel data. Other formats fall back to PIL, which also reads
+ only the header on Image.open. ImageSizeCache keeps the sizes in a tab
+ separated file keyed by path, mtime and file size, so that later runs do not
+ open the images at all:
+   <path> <mtime_ns> <file size> <width> <height>
+"""
+
+import os
+import struct
+from PIL import Image
+
+_png_signature = b'\x89PNG\r\n\x1a\n'
+# TIFF field type to (struct format, size in bytes) of the values used for
+# ImageWidth and ImageLength
+_tiff_types = {3: ('H', 2), 4: ('I', 4), 16: ('Q', 8)}
+_tiff_image_width = 256
+_tiff_image_length = 257
+
+
+def _get_png_size(f):
+    """ Given a png file positioned after the signature, returns its size
+        from the IHDR chunk.
+    """
+    chunk = f.read(16)
+    if len(chunk) < 16 or chunk[4:8] != b'IHDR':
+        raise ValueError('missing png IHDR chunk')
+    return struct.unpack('>II', chunk[8:16])
+
+
+def _get_tiff_size(f, byte_order):
+    """ Given a tiff file positioned after the byte order mark, returns the
+        size of its first image from the first image file directory. Both
+        classic TIFF and BigTIFF are supported.
+    """
+    version, = struct.unpack(byte_order + 'H', f.read(2))
+    if version == 42:
+        ifd_offset, = struct.unpack(byte_order + 'I', f.read(4))
+        count_format, entry_size, value_size = 'H', 12, 4
+    elif version == 43:
+        _, _, ifd_offset = struct.unpack(byte_order + 'HHQ', f.read(12))
+        count_format, entry_size, value_size = 'Q', 20, 8
+    else:
+        raise ValueError('not a tiff file')
+
+    f.seek(ifd_offset)
+    count_size = struct.calcsize(count_format)
+    num_entries, = struct.unpack(byte_order + count_format, f.read(count_size))
+    entries = f.read(num_entries * entry_size)
+    size = dict()
+    for index in range(num_entries):
+        entry = entries[index * entry_size:(index + 1) * entry_size]
+        tag, field_type = struct.unpack(byte_order + 'HH', entry[:4])
+        if tag in (_tiff_image_width, _tiff_image_length) and field_type in _tiff_types:
+            # values that fit in the entry are stored left justified in its last field
+            value_format, _ = _tiff_types[field_type]
+            size[tag] = struct.unpack_from(byte_order + value_format, entry, entry_size - value_size)[0]
+    if _tiff_image_width not in size or _tiff_image_length not in size:
+        raise ValueError('tiff file without ImageWidth or ImageLength')
+    return size[_tiff_image_width], size[_tiff_image_length]
+
+
+def get_image_size(image_file_path):
+    """ Given an image file, returns its size read from the file header.
+    Returns
+    -------
+    (int, int): width and height of the image.
+    """
+    with open(image_file_path, 'rb') as f:
+        header = f.read(8)
+        try:
+            if header == _png_signature:
+                return tuple(int(value) for value in _get_png_size(f))
+            if header[:2] in (b'II', b'MM'):
+                f.seek(2)
+                return tuple(int(value) for value in
+                             _get_tiff_size(f, '<' if header[:2] == b'II' else '>'))
+        except (ValueError, struct.error):
+            pass
+    with Image.open(image_file_path) as im:
+        return im.size
+
+
+class ImageSizeCache(object):
+    """
+    On disk cache of image sizes. A size is read again from the image
+    header if the mtime or file size of the image changed. The cache file
+    is only written by save, if a size was added.
+    """
+    def __init__(self, cache_file=None):
+        self.cache_file = cache_file
+        self._sizes = dict()
+        self._modified = False
+        if cache_file is not None and os.path.exists(cache_file):
+            with open(cache_file, encoding='utf-8') as f:
+                for line in f:
+                    line_list = line.rstrip('\n').split('\t')
+                    if len(line_list) == 5:
+                        self._sizes[line_list[0]] = tuple(int(value) for value in line_list[1:])
+
+    def __len__(self):
+        return len(self._sizes)
+
+    def get(self, image_file_path):
+        """ Given an image file, returns its width and height.
+        """
+        stat = os.stat(image_file_path)
+        cached = self._sizes.get(image_file_path)
+        if cached is not None and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+            return cached[2:]
+        width, height = get_image_size(image_file_path)
+        self._sizes[image_file_path] = (stat.st_mtime_ns, stat.st_size, width, height)
+        self._modified = True
+        return width, height
+
+    def save(self):
+        """ Writes the cache to a temporary file and moves it to cache_file.
+        """
+        if self.cache_file is None or not self._modified:
+            return
+        cache_dir = os.path.dirname(self.cache_file)
+        if cache_dir and not os.path.exists(cache_dir):
+            os.makedirs(cache_dir, exist_ok=True)
+        temp_path = '{}.{}.tmp'.format(self.cache_file, os.getpid())
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            for image_file_path in sorted(self._sizes):
+                f.write('\t'.join([image_file_path] + [str(value) for value in self._sizes[image_file_path]])
+                        + '\n')
+        os.replace(temp_path, self.cache_file)
+        self._modified = False
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+
+# Copyright   2018 Ashish Arora
+# Apache 2.0
+
+""" This script splits a data_splits file (e.g. madcat.train.raw.lineid, one
+ line per line id) into num_jobs shards of pages with balanced cost, so that
+ parallel jobs finish together. Pages are de-duplicated over the whole file,
+ not only against the previous line. The cost of a page is estimated from its
+ number of zones and the size of its page image (read from the image header):
+   cost = zone_weight * num_zones + megapixel_weight * width * height / 1e6
+ and pages are assigned, most expensive first, to the shard with the lowest
+ total cost. It writes:
+   <out_dir>/pages.txt : manifest, one line per page with base name, madcat
+                         xml path, image path, zones, width, height and cost
+   <out_dir>/<split file name>.<n> : lines of the split file for the pages of
+                                     shard n (1 to num_jobs), in the same
+                                     format, to be used as --data_splits of job n
+
+  Eg. ./job_planner.py data/madcat.train.raw.lineid data/local/split 30
+                       data/LDC2012T15 data/LDC2013T09 data/LDC2013T15
+"""
+
+import argparse
+import heapq
+import os
+from corpus_index import get_corpus_index, filter_corpus_index, parse_writing_condition_filter
+from image_size import get_image_size
+from madcat_cache import get_cache_dir, load_madcat_annotation
+
+parser = argparse.ArgumentParser(description="Splits a data_splits file in shards of pages with balanced cost",
+                                 formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+parser.add_argument('data_splits', type=str,
+                    help='Path to file that contains the train/test/dev split information')
+parser.add_argument('out_dir', type=str,
+                    help='directory location to write the manifest and shards')
+parser.add_argument('num_jobs', type=int,
+                    help='number of shards')
+parser.add_argument('database_paths', type=str, nargs='+',
+                    help='Paths to the downloaded madcat data directories, in priority order')
+parser.add_argument('--corpus_index', type=str, default=None,
+                    help='page location index file, see corpus_index.py')
+parser.add_argument('--cache_dir', type=str, default=None,
+                    help='directory for the parsed madcat xml sidecars, '
+                         'by default madcat_cache under out_dir')
+parser.add_argument('--writing_condition', type=str, default=None,
+                    help='comma separated writing conditions of the pages to use, '
+                         'e.g. IUC,IUL. By default all pages are used')
+parser.add_argument('--zone_weight', type=float, default=1.0,
+                    help='cost of a zone (line)')
+parser.add_argument('--megapixel_weight', type=float, default=2.0,
+                    help='cost of a megapixel of the page image')
+
+
+def get_split_base_name(line):
+    """ Given a line of the split file, returns the base name of its page.
+    """
+    return os.path.splitext(os.path.splitext(line.split(' ')[0])[0])[0]
+
+
+def read_split_file(data_splits):
+    """ Given the split file, returns the lines of each page. Pages are in
+        order of their first line and appear once, even if the file is not
+        sorted.
+    Returns
+    -------
+    (dict): dictionary with key as page base name and value as list of lines.
+    """
+    page_lines = dict()
+    with open(data_splits, encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                page_lines.setdefault(get_split_base_name(line), []).append(line)
+    return page_lines
+
+
+def get_page_cost(madcat_file_path, image_file_path, zone_weight, megapixel_weight, cache_dir=None):
+    """ Given the madcat xml file and image of a page, returns its number of
+        zones, image width and height, and estimated cost.
+    Returns
+    -------
+    (int, int, int, float): zones, width, height and cost of the page.
+    """
+    num_zones = len(load_madcat_annotation(madcat_file_path, cache_dir).zone_ids)
+    try:
+        width, height = get_image_size(image_file_path)
+    except OSError:
+        width, height = 0, 0
+    cost = zone_weight * num_zones + megapixel_weight * width * height / 1e6
+    return num_zones, width, height, cost
+
+
+def get_balanced_shards(costs, num_shards):
+    """ Given the cost of each page, assigns pages to shards, most expensive
+        first, each to the shard with the lowest total cost so far.
+    Returns
+    -------
+    ([[int]], [float]): page indices and total cost of each shard.
+    """
+    shards = [[] for _ in range(num_shards)]
+    shard_costs = [0.0] * num_shards
+    heap = [(0.0, shard) for shard in range(num_shards)]
+    for index in sorted(range(len(costs)), key=lambda i: costs[i], reverse=True):
+        shard_cost, shard = heapq.heappop(heap)
+        shards[shard].append(index)
+        shard_costs[shard] = shard_cost + costs[index]
+        heapq.heappush(heap, (shard_costs[shard], shard))
+    for shard in shards:
+        shard.sort()
+    return shards, shard_costs
+
+
+def main():
+    args = parser.parse_args()
+    corpus_index = get_corpus_index(args.database_paths, args.corpus_index)
+    corpus_index = filter_corpus_index(corpus_index,
+                                       parse_writing_condition_filter(args.writing_condition))
+    page_lines = read_split_file(args.data_splits)
+    base_names = [base_name for base_name in page_lines if base_name in corpus_index]
+
+    cache_dir = get_cache_dir(args.cache_dir, args.out_dir)
+    manifest = []
+    for base_name in base_names:
+        location = corpus_index[base_name]
+        num_zones, width, height, cost = get_page_cost(location.madcat_file_path,
+                                                       location.image_file_path,
+                                                       args.zone_weight, args.megapixel_weight,
+                                                       cache_dir)
+        manifest.append((base_name, location.madcat_file_path, location.image_file_path,
+                         num_zones, width, height, cost))
+
+    if not os.path.exists(args.out_dir):
+        os.makedirs(args.out_dir)
+    with open(os.path.join(args.out_dir, 'pages.txt'), 'w', encoding='utf-8') as f:
+        for page in manifest:
+            f.write(' '.join(str(value) for value in page[:-1]) + ' {:.3f}\n'.format(page[-1]))
+
+    shards, shard_costs = get_balanced_shards([page[-1] for page in manifest], args.num_jobs)
+    split_name = os.path.basename(args.data_splits)
+    for shard, page_indices in enumerate(shards, 1):
+        with open(os.path.join(args.out_dir, '{}.{}'.format(split_name, shard)), 'w',
+                  encoding='utf-8') as f:
+            for index in page_indices:
+                for line in page_lines[manifest[index][0]]:
+                    f.write(line + '\n')
+
+    print('{} pages ({} skipped) in {} shards, cost per shard min {:.1f} max {:.1f}'.format(
+        len(manifest), len(page_lines) - len(manifest), args.num_jobs,
+        min(shard_costs), max(shard_costs)))
+
+
+if __name__ == '__main__':
+      main()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+
+# Copyright   2018 Ashish Arora
+# Apache 2.0
+
+""" This module contains LineGeometry, which keeps the word corner points of
+ one line (zone) and maintains their convex hull and minimum area bounding box
+ while words are added, removed or moved, e.g. in an annotation correction tool.
+ Adding a word only merges its corners with the current hull vertices. Removing
+ a word recomputes the hull only if one of its corners was a hull vertex and
+ no other word has a corner at the same location. The bounding box is computed
+ from the hull on first access after a change.
+"""
+
+from collections import Counter
+import numpy as np
+from bounding_box_utils import minimum_bounding_box_from_hull, monotone_chain_vertices
+
+
+class LineGeometry(object):
+    """
+    Word corner points, convex hull and minimum area bounding box of a line.
+    The hull is computed with monotone_chain_vertices on integer points and
+    bounding_box is the same rectangle as minimum_bounding_box on all the
+    corner points of the line.
+    """
+    def __init__(self, word_points=None):
+        """ word_points (dict): optional dictionary with key as word id and
+                                value as list of (x, y) corner points.
+        """
+        self._word_points = dict()
+        self._point_counts = Counter()
+        # _hull is None when it has to be recomputed from all points,
+        # _pending_points are added points not merged into _hull yet
+        self._hull = None
+        self._pending_points = []
+        self._bounding_box = None
+        if word_points is not None:
+            for word_id, points in word_points.items():
+                self.add_word(word_id, points)
+
+    def __len__(self):
+        return len(self._word_points)
+
+    def __contains__(self, word_id):
+        return word_id in self._word_points
+
+    def add_word(self, word_id, points):
+        """ Adds the corner points of a word to the line. If the word is
+            already in the line, it is moved to the new points.
+        """
+        if word_id in self._word_points:
+            self.remove_word(word_id)
+        points = [(int(x), int(y)) for x, y in points]
+        self._word_points[word_id] = points
+        self._point_counts.update(points)
+        if self._hull is not None:
+            self._pending_points.extend(points)
+        self._bounding_box = None
+
+    def remove_word(self, word_id):
+        """ Removes a word and its corner points from the line.
+        """
+        points = self._word_points.pop(word_id)
+        self._point_counts.subtract(points)
+        removed_points = set()
+        for point in points:
+            if self._point_counts[point] <= 0:
+                del self._point_counts[point]
+                removed_points.add(point)
+        if self._hull is not None and not removed_points.isdisjoint(self._hull):
+            self.invalidate()
+        elif self._hull is not None and not removed_points.isdisjoint(self._pending_points):
+            self._pending_points = [point for point in self._pending_points
+                                    if point not in removed_points]
+        self._bounding_box = None
+
+    def move_word(self, word_id, points):
+        """ Replaces the corner points of a word, e.g. after a reviewer
+            moved the word box.
+        """
+        self.add_word(word_id, points)
+
+    def invalidate(self):
+        """ Drops the hull and the bounding box, they are recomputed from
+            all the corner points on next access.
+        """
+        self._hull = None
+        self._pending_points = []
+        self._bounding_box = None
+
+    @property
+    def points(self):
+        """ (n, 2) integer array of the distinct corner points of the line.
+        """
+        return np.array(list(self._point_counts), dtype=np.int64).reshape(-1, 2)
+
+    @property
+    def hull(self):
+        """ (h, 2) integer array of the hull vertices in counter clockwise order.
+        """
+        if self._hull is None:
+            points = self.points
+            if len(points) <= 2: raise ValueError('More than two points required.')
+            self._hull = [tuple(point) for point in points[monotone_chain_vertices(points)].tolist()]
+            self._pending_points = []
+        elif self._pending_points:
+            points = np.array(self._hull + self._pending_points, dtype=np.int64)
+            self._hull = [tuple(point) for point in points[monotone_chain_vertices(points)].tolist()]
+            self._pending_points = []
+        return np.array(self._hull, dtype=np.int64)
+
+    @property
+    def bounding_box(self):
+        """ Minimum area bounding box of the line as a bounding_box_tuple.
+        """
+        if self._bounding_box is None:
+            self._bounding_box = minimum_bounding_box_from_hull(self.hull)
+        return self._bounding_box
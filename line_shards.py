@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+
+# Copyright   2018 Ashish Arora
+# Apache 2.0
+
+""" This script reads the transcription, word ids and word corner points of
+ every line of the MADCAT pages in one pass over each page (the parsed
+ annotation of madcat_cache.py) and writes them as shards, so that the image
+ and feature stages do not parse the xml files again. Pages are split in
+ num_shards shards, and a pool of num_jobs workers writes one shard at a time:
+   <out_dir>/text.<shard>   : "<line name> <transcription>" per line, lines
+                              without transcription are left out
+   <out_dir>/lines.<shard>.npz : line names, page and zone of each line, text,
+                                 word ids and corner points of all lines
+ The line name is the page base name followed by '_' and the zone id padded
+ to 4 digits, same as the line image names without extension. The image stage
+ reads the geometry from the shards, see extract_masks.py --line_shards.
+
+  Eg. ./line_shards.py data/LDC2012T15 data/LDC2013T09 data/LDC2013T15 data/local/shards
+                       --data_splits data/madcat.train.raw.lineid --num_shards 16 --num_jobs 8
+"""
+
+import argparse
+import os
+from collections import namedtuple
+from multiprocessing import Pool
+import numpy as np
+from corpus_index import get_corpus_index, filter_corpus_index, parse_writing_condition_filter
+from job_planner import read_split_file
+from madcat_cache import get_cache_dir, load_madcat_annotation
+from madcat_xml import get_line_text, iter_annotation_zones, madcat_annotation
+
+parser = argparse.ArgumentParser(description="Writes line text and geometry shards of the madcat pages",
+                                 formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+parser.add_argument('database_paths', type=str, nargs='+',
+                    help='Paths to the downloaded madcat data directories, in priority order')
+parser.add_argument('out_dir', type=str,
+                    help='directory location to write the shards')
+parser.add_argument('--data_splits', type=str, default=None,
+                    help='file with the train/test/dev split, by default all pages are used')
+parser.add_argument('--corpus_index', type=str, default=None,
+                    help='page location index file, see corpus_index.py')
+parser.add_argument('--cache_dir', type=str, default=None,
+                    help='directory for the parsed madcat xml sidecars, '
+                         'by default madcat_cache under out_dir')
+parser.add_argument('--writing_condition', type=str, default=None,
+                    help='comma separated writing conditions of the pages to use, '
+                         'e.g. IUC,IUL. By default all pages are used')
+parser.add_argument('--num_shards', type=int, default=8,
+                    help='number of shards to write')
+parser.add_argument('--num_jobs', type=int, default=4,
+                    help='number of worker processes')
+
+"""
+line_shard is a named tuple which contains the lines of a shard:
+             line_names (np.ndarray): name of each line
+             base_names (np.ndarray): base name of the page of each line
+             zone_ids (np.ndarray): zone id of each line
+             line_text (np.ndarray): transcription of each line
+             line_word_offsets (np.ndarray): words of line i are
+                                             word_ids[line_word_offsets[i]:line_word_offsets[i+1]]
+             word_ids (np.ndarray): id of each word
+             word_point_offsets (np.ndarray): points of word j are
+                                              points[word_point_offsets[j]:word_point_offsets[j+1]]
+             points (np.ndarray): (n, 2) int32 array of x, y corner points of all words
+"""
+line_shard = namedtuple('line_shard', 'line_names '
+                                      'base_names '
+                                      'zone_ids '
+                                      'line_text '
+                                      'line_word_offsets '
+                                      'word_ids '
+                                      'word_point_offsets '
+                                      'points')
+
+
+def get_page_lines(base_name, annotation):
+    """ Given the base name and parsed annotation of a page, returns the
+        name, zone id, transcription, word ids, word point offsets and corner
+        points of each line.
+    Returns
+    -------
+    [(string, string, string, [string], np.ndarray, np.ndarray)]: lines of the page,
+                                                                  point offsets start at 0.
+    """
+    line_text = get_line_text(annotation)
+    word_ids = annotation.word_ids.tolist()
+    page_lines = []
+    for index, (zone_id, points) in enumerate(iter_annotation_zones(annotation)):
+        first_word = annotation.zone_word_offsets[index]
+        last_word = annotation.zone_word_offsets[index + 1]
+        page_lines.append((base_name + '_' + zone_id.zfill(4),
+                           zone_id,
+                           line_text.get(zone_id, ''),
+                           word_ids[first_word:last_word],
+                           annotation.word_point_offsets[first_word:last_word + 1]
+                           - annotation.word_point_offsets[first_word],
+                           points))
+    return page_lines
+
+
+def write_shard(shard_task):
+    """ Given (text file, npz file, list of (base name, madcat xml file),
+        cache_dir), reads every page once and writes the text and geometry
+        of its lines.
+    Returns
+    -------
+    int: number of lines written.
+    """
+    text_file, geometry_file, pages, cache_dir = shard_task
+    line_names, base_names, zone_ids, line_text, line_word_offsets = [], [], [], [], [0]
+    word_ids, word_point_offsets, points = [], [0], []
+    num_points = 0
+    for base_name, madcat_file_path in pages:
+        annotation = load_madcat_annotation(madcat_file_path, cache_dir)
+        for name, zone_id, text, line_word_ids, point_offsets, line_points in \
+                get_page_lines(base_name, annotation):
+            line_names.append(name)
+            base_names.append(base_name)
+            zone_ids.append(zone_id)
+            line_text.append(text)
+            word_ids.extend(line_word_ids)
+            line_word_offsets.append(len(word_ids))
+            word_point_offsets.extend((point_offsets[1:] + num_points).tolist())
+            points.append(line_points)
+            num_points += len(line_points)
+
+    shard = line_shard(line_names=np.array(line_names, dtype=np.str_),
+                       base_names=np.array(base_names, dtype=np.str_),
+                       zone_ids=np.array(zone_ids, dtype=np.str_),
+                       line_text=np.array(line_text, dtype=np.str_),
+                       line_word_offsets=np.array(line_word_offsets, dtype=np.int64),
+                       word_ids=np.array(word_ids, dtype=np.str_),
+                       word_point_offsets=np.array(word_point_offsets, dtype=np.int64),
+                       points=(np.concatenate(points) if points
+                               else np.zeros((0, 2), dtype=np.int32)))
+    temp_path = '{}.{}.tmp'.format(geometry_file, os.getpid())
+    with open(temp_path, 'wb') as f:
+        np.savez(f, **shard._asdict())
+    os.replace(temp_path, geometry_file)
+    with open(text_file, 'w', encoding='utf-8') as f:
+        for name, text in zip(line_names, line_text):
+            # lines without transcription only have geometry
+            if text:
+                f.write(name + ' ' + text + '\n')
+    return len(line_names)
+
+
+def load_line_shard(geometry_file):
+    """ Given a geometry shard written by write_shard, returns its lines.
+    Returns
+    -------
+    line_shard: lines of the shard.
+    """
+    with np.load(geometry_file, allow_pickle=False) as shard:
+        return line_shard(**{field: shard[field] for field in line_shard._fields})
+
+
+def get_shard_annotations(shard):
+    """ Given a line_shard, returns the zones, words and corner points of each
+        page in it as a madcat_annotation, so that Page (page_model.py) can
+        use the shard instead of the xml file or its sidecar. The segment
+        tokens are not kept in the shard, token_ref_ids and token_text are
+        empty, the transcription of the lines is in line_text.
+    Returns
+    -------
+    (dict): dictionary with key as page base name and value as madcat_annotation.
+    """
+    annotations = dict()
+    base_names = shard.base_names.tolist()
+    first_line = 0
+    while first_line < len(base_names):
+        base_name = base_names[first_line]
+        last_line = first_line
+        while last_line < len(base_names) and base_names[last_line] == base_name:
+            last_line += 1
+        first_word = shard.line_word_offsets[first_line]
+        last_word = shard.line_word_offsets[last_line]
+        first_point = shard.word_point_offsets[first_word]
+        last_point = shard.word_point_offsets[last_word]
+        annotations[base_name] = madcat_annotation(
+            zone_ids=shard.zone_ids[first_line:last_line],
+            zone_word_offsets=shard.line_word_offsets[first_line:last_line + 1] - first_word,
+            word_ids=shard.word_ids[first_word:last_word],
+            word_point_offsets=shard.word_point_offsets[first_word:last_word + 1] - first_point,
+            points=shard.points[first_point:last_point],
+            token_ref_ids=np.zeros(0, dtype=np.str_),
+            token_text=np.zeros(0, dtype=np.str_))
+        first_line = last_line
+    return annotations
+
+
+def load_shard_annotations(shard_dir):
+    """ Given the output directory of line_shards.py, returns the
+        madcat_annotation of every page of all its lines.<n>.npz shards.
+    Returns
+    -------
+    (dict): dictionary with key as page base name and value as madcat_annotation.
+    """
+    annotations = dict()
+    for file_name in sorted(os.listdir(shard_dir)):
+        if file_name.startswith('lines.') and file_name.endswith('.npz'):
+            annotations.update(get_shard_annotations(
+                load_line_shard(os.path.join(shard_dir, file_name))))
+    return annotations
+
+
+def main():
+    args = parser.parse_args()
+    corpus_index = get_corpus_index(args.database_paths, args.corpus_index)
+    corpus_index = filter_corpus_index(corpus_index,
+                                       parse_writing_condition_filter(args.writing_condition))
+    if args.data_splits is None:
+        base_names = sorted(corpus_index)
+    else:
+        base_names = [base_name for base_name in read_split_file(args.data_splits)
+                      if base_name in corpus_index]
+    pages = [(base_name, corpus_index[base_name].madcat_file_path) for base_name in base_names]
+
+    if not os.path.exists(args.out_dir):
+        os.makedirs(args.out_dir)
+    shard_tasks = []
+    for shard in range(args.num_shards):
+        shard_tasks.append((os.path.join(args.out_dir, 'text.{}'.format(shard)),
+                            os.path.join(args.out_dir, 'lines.{}.npz'.format(shard)),
+                            pages[shard::args.num_shards],
+                            get_cache_dir(args.cache_dir, args.out_dir)))
+    with Pool(args.num_jobs) as pool:
+        num_lines = pool.map(write_shard, shard_tasks, chunksize=1)
+    print('{} lines of {} pages written in {} shards'.format(sum(num_lines), len(pages),
+                                                            args.num_shards))
+
+
+if __name__ == '__main__':
+      main()
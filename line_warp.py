@@ -0,0 +1,332 @@
+#!/usr/bin/env python3
+
+# Copyright   2018 Ashish Arora
+# Apache 2.0
+
+""" This module extracts line images from a page image without resampling the
+ whole page. The line extraction scripts rotate the page around its center by
+ the smaller angle of the line bounding box (skimage rotate or PIL rotate) and
+ slice the envelope of the rotated bounding box out of the rotated page. Here
+ the pixels of that slice are mapped back to the page with the inverse
+ rotation and only they are interpolated, so each line costs one resample of
+ the size of the line image. Interpolation is the same as skimage order 0, 1
+ and 3 (cubic convolution with a = -0.5) and PIL NEAREST, BILINEAR and
+ BICUBIC (a = -1), pixels that fall outside of the page get cval, so the
+ page does not need to be padded for lines at its border (get_white_value
+ gives the cval of white paper). The two libraries treat the page border
+ differently: skimage reads every neighbour outside the page as cval and
+ clips its output to the range of the page (clip_to_image_range), PIL
+ repeats the edge pixels, gives cval only to locations outside the page and
+ computes NEAREST in 16.16 fixed point from its own rounding of the rotation
+ matrix (pil=True). With these, pixels match skimage to float precision and
+ 8 bit PIL exactly, border and crop boxes past the page included.
+ get_line_rectangle goes one step further for the speedup scripts, which
+ crop the envelope of the line, rotate the crop and crop the rotated box
+ again: it maps the pixels of the deskewed line rectangle, of size
+ length_parallel x length_orthogonal, straight to the page and interpolates
+ them once.
+ get_deskewed_lines is the page level mode: most pages are skewed uniformly,
+ so the page is rotated once, with the compiled rotate of skimage or PIL, by
+ the median deskew angle of its lines and the lines whose own angle is within
+ a tolerance of it are sliced out of the rotated page. Only the remaining
+ lines are warped one by one.
+"""
+
+from math import cos, degrees, floor, radians, sin
+
+import numpy as np
+from bounding_box_utils import get_envelope, get_rotation_matrix, transform_points
+
+
+def _get_kernel_weights(t, order, a):
+    """ Given fractional offsets t in [0, 1) of the sample points, returns
+        the weights of the neighbouring pixels, from the left (or top) one.
+        a is the parameter of the cubic convolution kernel.
+    Returns
+    -------
+    [np.ndarray]: one weight array per neighbouring pixel.
+    """
+    if order == 1:
+        return [1 - t, t]
+    t2 = t * t
+    t3 = t2 * t
+    return [a * (t3 - 2 * t2 + t),
+            (a + 2) * t3 - (a + 3) * t2 + 1,
+            -(a + 2) * t3 + (2 * a + 3) * t2 - a * t,
+            -a * (t3 - t2)]
+
+
+def _pil_interpolate(values, d):
+    """ Given the 2 or 4 neighbouring pixel values, from the left (or top)
+        one, and fractional offsets d, returns the interpolated values with
+        the arithmetic of the BILINEAR and BICUBIC macros of PIL.
+    """
+    if len(values) == 2:
+        return values[0] + (values[1] - values[0]) * d
+    v1, v2, v3, v4 = values
+    p2 = -v1 + v3
+    p3 = 2 * (v1 - v2) + v3 - v4
+    p4 = -v1 + v2 - v3 + v4
+    return v2 + d * (p2 + d * (p3 + d * p4))
+
+
+def sample_image(image, x, y, order=3, cval=0.0, cubic_a=-0.5, pil=False):
+    """ Given an (h, w) or (h, w, c) image and arrays of x and y locations,
+        returns the interpolated image values at these locations. Pixel
+        (i, j) of the image is at x = j, y = i. For order 3, cubic_a is the
+        parameter of the cubic convolution, -0.5 for skimage. By default
+        every neighbouring pixel outside the image is cval, same as skimage
+        mode 'constant'. If pil is set, values are computed as the PIL
+        filters do: locations outside the image area (x < -0.5 or
+        x >= w - 0.5, same for y) are cval, the neighbours of the other
+        locations repeat the edge pixels of the image, and the interpolation
+        uses the arithmetic of PIL, whose bicubic has a = -1.
+    Returns
+    -------
+    np.ndarray: float64 array of shape x.shape or x.shape + (c,).
+    """
+    image = np.asarray(image)
+    height, width = image.shape[:2]
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    extra_shape = image.shape[2:]
+
+    def set_outside(values, inside):
+        inside = inside.reshape(inside.shape + (1,) * len(extra_shape))
+        return np.where(inside, values, cval)
+
+    def get_pixels(rows, cols):
+        values = image[np.clip(rows, 0, height - 1), np.clip(cols, 0, width - 1)].astype(np.float64)
+        if pil:
+            return values
+        return set_outside(values, (rows >= 0) & (rows < height) & (cols >= 0) & (cols < width))
+
+    if order == 0:
+        # both edge rules agree for nearest neighbour
+        rows = np.floor(y + 0.5).astype(np.int64)
+        cols = np.floor(x + 0.5).astype(np.int64)
+        return set_outside(get_pixels(rows, cols),
+                           (rows >= 0) & (rows < height) & (cols >= 0) & (cols < width))
+    if order not in (1, 3):
+        raise ValueError('order must be 0, 1 or 3.')
+
+    x0 = np.floor(x)
+    y0 = np.floor(y)
+    first = 0 if order == 1 else -1
+    num_taps = 2 if order == 1 else 4
+    expand = (Ellipsis,) + (None,) * len(extra_shape)
+    dx = (x - x0)[expand]
+    dy = (y - y0)[expand]
+    x0 = x0.astype(np.int64) + first
+    y0 = y0.astype(np.int64) + first
+    if pil:
+        rows = [_pil_interpolate([get_pixels(y0 + i, x0 + j) for j in range(num_taps)], dx)
+                for i in range(num_taps)]
+        return set_outside(_pil_interpolate(rows, dy), (x >= -0.5) & (x < width - 0.5) &
+                           (y >= -0.5) & (y < height - 0.5))
+
+    x_weights = _get_kernel_weights(dx, order, cubic_a)
+    y_weights = _get_kernel_weights(dy, order, cubic_a)
+    output = np.zeros(x.shape + extra_shape, dtype=np.float64)
+    for i, y_weight in enumerate(y_weights):
+        row = np.zeros(x.shape + extra_shape, dtype=np.float64)
+        for j, x_weight in enumerate(x_weights):
+            row += x_weight * get_pixels(y0 + i, x0 + j)
+        output += y_weight * row
+    return output
+
+
+def clip_to_image_range(region, image, cval=0.0):
+    """ Given a region sampled from an image with cval for pixels outside of
+        it, returns the region clipped to the range of the image values and
+        cval, same as skimage rotate and warp with clip=True: cubic
+        interpolation overshoots next to sharp edges, e.g. at the page border.
+    Returns
+    -------
+    np.ndarray: the clipped region.
+    """
+    image = np.asarray(image)
+    return np.clip(region, min(image.min(), cval), max(image.max(), cval))
+
+
+def get_pil_rotation_coefficients(angle, width, height):
+    """ Given a rotation angle in radians and the size of a page, returns the
+        affine coefficients (a, b, c, d, e, f) that Image.rotate of PIL uses
+        to map a point (x, y) of the rotated page to (a x + b y + c,
+        d x + e y + f) of the page, with its rounding of the angle.
+    Returns
+    -------
+    [float]: the six coefficients.
+    """
+    angle = -radians(degrees(angle) % 360.0)
+    coefficients = [round(cos(angle), 15), round(sin(angle), 15), 0.0,
+                    round(-sin(angle), 15), round(cos(angle), 15), 0.0]
+    center_x, center_y = width / 2.0, height / 2.0
+    coefficients[2] = coefficients[0] * -center_x + coefficients[1] * -center_y + center_x
+    coefficients[5] = coefficients[3] * -center_x + coefficients[4] * -center_y + center_y
+    return coefficients
+
+
+def _get_pil_nearest_indices(coefficients, cols, rows):
+    """ Given the coefficients of get_pil_rotation_coefficients and the pixel
+        coordinates in the rotated page, returns the indices of the page
+        pixels that PIL NEAREST reads, with its 16.16 fixed point arithmetic.
+    Returns
+    -------
+    (np.ndarray, np.ndarray): the x and y indices.
+    """
+    def fix(value):
+        return int(floor(value * 65536.0 + 0.5))
+    a, b, c, d, e, f = coefficients
+    cols = cols.astype(np.int64)
+    rows = rows.astype(np.int64)
+    x = (fix(c + a * 0.5 + b * 0.5) + rows * fix(b) + cols * fix(a)) >> 16
+    y = (fix(f + d * 0.5 + e * 0.5) + rows * fix(e) + cols * fix(d)) >> 16
+    return x, y
+
+
+def get_rotated_crop(image, angle, box, order=3, cval=0.0, cubic_a=-0.5, clip_box=True,
+                     pil=False):
+    """ Given a page image, a rotation angle in radians and a box in the
+        rotated page, returns the box of the page rotated around its center
+        by angle, same as rotate(image, degrees(angle), order=order)[min_y:max_y,
+        min_x:max_x] with skimage, or, if pil is set,
+        image.rotate(degrees(angle), resample).crop(box) with PIL, but only
+        the pixels of the box are interpolated. If clip_box is set the box is
+        clipped to the page, same as numpy slicing, otherwise pixels of the
+        box outside the page get cval, same as PIL crop for cval 0. skimage
+        also clips its output, see clip_to_image_range.
+    Returns
+    -------
+    np.ndarray: float64 array of shape (max_y - min_y, max_x - min_x) or
+                (max_y - min_y, max_x - min_x, c).
+    """
+    image = np.asarray(image)
+    height, width = image.shape[:2]
+    min_x, min_y, max_x, max_y = box
+    if clip_box:
+        min_x, max_x = np.clip([min_x, max_x], 0, width)
+        min_y, max_y = np.clip([min_y, max_y], 0, height)
+    cols, rows = np.meshgrid(np.arange(min_x, max_x), np.arange(min_y, max_y))
+    if pil:
+        coefficients = get_pil_rotation_coefficients(angle, width, height)
+        if order == 0:
+            x, y = _get_pil_nearest_indices(coefficients, cols, rows)
+        else:
+            # PIL samples at pixel centers and its filters subtract 0.5 again
+            a, b, c, d, e, f = coefficients
+            x = a * (cols + 0.5) + b * (rows + 0.5) + c - 0.5
+            y = d * (cols + 0.5) + e * (rows + 0.5) + f - 0.5
+    else:
+        # skimage rotates around the center of the pixel grid
+        center = (width / 2 - 0.5, height / 2 - 0.5)
+        rotation_matrix = get_rotation_matrix(center, -angle)
+        source = transform_points(rotation_matrix, np.column_stack((cols.ravel(), rows.ravel())),
+                                  inverse=True)
+        x = source[:, 0].reshape(cols.shape)
+        y = source[:, 1].reshape(cols.shape)
+    region = sample_image(image, x, y, order, cval, cubic_a, pil)
+    outside = (cols < 0) | (cols >= width) | (rows < 0) | (rows >= height)
+    region[outside] = cval
+    return region
+
+
+def get_white_value(image):
+    """ Given an image array, returns the value of a white pixel, to be used
+        as cval so that the page looks surrounded by white paper: the maximum
+        of an integer dtype, or 1 for float and bool images.
+    """
+    image = np.asarray(image)
+    if np.issubdtype(image.dtype, np.integer):
+        return float(np.iinfo(image.dtype).max)
+    return 1.0
+
+
+def get_line_rectangle(image, bounding_box, angle, order=3, cval=0.0, cubic_a=-0.5, pil=False):
+    """ Given a page image, a minimum area bounding box of a line in page
+        coordinates and its deskew angle in radians (see get_smaller_angle),
+        returns the line rectangle rotated by angle so that the line is
+        horizontal, in one resample of the page. The side of the rectangle
+        closer to horizontal after rotation becomes the width, so the output
+        is length_parallel x length_orthogonal (or the other way around),
+        rounded to whole pixels. order, cval, cubic_a and pil are the
+        same as in sample_image.
+    Returns
+    -------
+    np.ndarray: float64 array of shape (height, width) or (height, width, c).
+    """
+    image = np.asarray(image)
+    corner_points = np.array(list(bounding_box.corner_points), dtype=np.float64)
+    center = tuple(corner_points.mean(axis=0))
+    rotation_matrix = get_rotation_matrix(center, -angle)
+    unit_x, unit_y = rotation_matrix[:, :2].dot(bounding_box.unit_vector)
+    if abs(unit_x) >= abs(unit_y):
+        width, height = bounding_box.length_parallel, bounding_box.length_orthogonal
+    else:
+        width, height = bounding_box.length_orthogonal, bounding_box.length_parallel
+    width = max(int(round(width)), 1)
+    height = max(int(round(height)), 1)
+    # pixel centers of the output, centered on the rectangle in the rotated page
+    cols, rows = np.meshgrid(np.arange(width) - (width - 1) / 2 + center[0],
+                             np.arange(height) - (height - 1) / 2 + center[1])
+    source = transform_points(rotation_matrix, np.column_stack((cols.ravel(), rows.ravel())),
+                              inverse=True)
+    region = sample_image(image, source[:, 0], source[:, 1], order, cval, cubic_a, pil)
+    return region.reshape(cols.shape + image.shape[2:])
+
+
+def get_page_skew(angles):
+    """ Given the deskew angles of the lines of a page in radians, returns
+        the skew of the page, the median of the angles, or 0 for a page
+        without lines.
+    """
+    if len(angles) == 0:
+        return 0.0
+    return float(np.median(angles))
+
+
+def get_deskewed_lines(image, bounding_boxes, angles, tolerance, rotate_page, order=3, cval=0.0,
+                       cubic_a=-0.5, pil=False, center=None):
+    """ Given a page image, the minimum area bounding boxes of its lines, their
+        deskew angles in radians and a function that rotates the page around
+        its center by an angle, returns the line images, same as
+        get_rotated_crop of the envelope of each line rotated by its angle.
+        The lines within tolerance of the page skew are sliced from one
+        rotate_page of the page by the skew instead, the others are warped by
+        their own angle. rotate_page must interpolate like order, cval,
+        cubic_a and pil and keep the range of the image, e.g.
+        rotate(image, degrees(angle), order=3, preserve_range=True, clip=False)
+        with skimage, so that both kinds of lines look the same. The corners
+        of the boxes are rotated around center to find their envelope, by
+        default the center of the pixel grid; pass the center the calling
+        script uses for its own boxes, e.g. get_center(im), so that every
+        mode of the script cuts the same boxes.
+    Returns
+    -------
+    ([np.ndarray], np.ndarray): line images and a bool array, True for the
+                                lines sliced from the page rotation.
+    """
+    image = np.asarray(image)
+    height, width = image.shape[:2]
+    angles = np.asarray(angles, dtype=np.float64)
+    skew = get_page_skew(angles)
+    is_fast = np.abs(angles - skew) <= tolerance
+    if center is None:
+        center = (width / 2 - 0.5, height / 2 - 0.5)
+    # a compiled rotation of the whole page is cheaper than warping the area
+    # covering the lines in numpy, which is most of the page
+    rotated_page = rotate_page(skew) if is_fast.any() else None
+
+    regions = []
+    for bounding_box, angle, fast in zip(bounding_boxes, angles, is_fast):
+        rotation_matrix = get_rotation_matrix(center, -(skew if fast else angle))
+        min_x, min_y, max_x, max_y = get_envelope(
+            transform_points(rotation_matrix, list(bounding_box.corner_points)))
+        min_x, max_x = min(max(min_x, 0), width), min(max(max_x, 0), width)
+        min_y, max_y = min(max(min_y, 0), height), min(max(max_y, 0), height)
+        if fast:
+            regions.append(rotated_page[min_y:max_y, min_x:max_x])
+        else:
+            regions.append(get_rotated_crop(image, angle, (min_x, min_y, max_x, max_y),
+                                            order, cval, cubic_a, pil=pil))
+    return regions, is_fast
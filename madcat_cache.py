@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+
+# Copyright   2018 Ashish Arora
+# Apache 2.0
+
+""" This module caches the parsed content of MADCAT xml files. The first time a
+ .madcat.xml file is loaded, it is parsed with madcat_xml.read_madcat_annotation
+ and the zone ids, word ids, point arrays and token text are saved in a binary
+ .npz sidecar, together with the mtime and size of the xml file. Later loads
+ read the sidecar instead of the xml file, unless the xml file was modified.
+ A sidecar that cannot be read, e.g. one truncated by a killed job, is
+ rebuilt. Sidecars are written in cache_dir, which the scripts put under
+ their output directory, so the corpus directories are never written to.
+ Without cache_dir the xml file is parsed on every load.
+"""
+
+import os
+import zipfile
+from tokenize import TokenError
+import numpy as np
+from madcat_xml import madcat_annotation, read_madcat_annotation, iter_annotation_zones
+
+
+def get_sidecar_path(madcat_file_path, cache_dir):
+    """ Given a madcat xml file and the cache directory, returns the path of
+        its sidecar.
+    Returns
+    -------
+    string: path of the .npz sidecar file.
+    """
+    return os.path.join(cache_dir, os.path.basename(madcat_file_path) + '.npz')
+
+
+def get_cache_dir(cache_dir, out_dir):
+    """ Given the cache directory option of a script and its output directory,
+        returns the directory for the sidecars, cache_dir if it is given,
+        otherwise madcat_cache under the output directory.
+    """
+    if cache_dir is not None:
+        return cache_dir
+    return os.path.join(out_dir, 'madcat_cache')
+
+
+def _get_source_stat(madcat_file_path):
+    stat = os.stat(madcat_file_path)
+    return np.array([stat.st_mtime_ns, stat.st_size], dtype=np.int64)
+
+
+def _read_sidecar(sidecar_path, source_stat):
+    """ Given a sidecar path and stat of the xml file, returns the cached
+        annotation, or None if the sidecar is missing, unreadable or stale.
+    """
+    try:
+        with np.load(sidecar_path, allow_pickle=False) as sidecar:
+            if not np.array_equal(sidecar['source_stat'], source_stat):
+                return None
+            return madcat_annotation(**{field: sidecar[field] for field in madcat_annotation._fields})
+    except (OSError, EOFError, KeyError, ValueError, SyntaxError, TokenError, zipfile.BadZipFile):
+        return None
+
+
+def _write_sidecar(sidecar_path, source_stat, annotation):
+    """ Writes the annotation to a temporary file and moves it to
+        sidecar_path, so parallel jobs never read a partial sidecar.
+    """
+    sidecar_dir = os.path.dirname(sidecar_path)
+    if sidecar_dir and not os.path.exists(sidecar_dir):
+        os.makedirs(sidecar_dir, exist_ok=True)
+    temp_path = '{}.{}.tmp'.format(sidecar_path, os.getpid())
+    with open(temp_path, 'wb') as f:
+        np.savez(f, source_stat=source_stat, **annotation._asdict())
+    os.replace(temp_path, sidecar_path)
+
+
+def load_madcat_annotation(madcat_file_path, cache_dir=None):
+    """ Given a madcat xml file, returns its parsed annotation. The sidecar
+        in cache_dir is used if it is up to date, otherwise the xml file is
+        parsed and the sidecar is (re)written. Without cache_dir the xml file
+        is always parsed.
+    Returns
+    -------
+    madcat_annotation: parsed annotation of the page.
+    """
+    if cache_dir is None:
+        return read_madcat_annotation(madcat_file_path)
+    source_stat = _get_source_stat(madcat_file_path)
+    sidecar_path = get_sidecar_path(madcat_file_path, cache_dir)
+    annotation = _read_sidecar(sidecar_path, source_stat)
+    if annotation is None:
+        annotation = read_madcat_annotation(madcat_file_path)
+        try:
+            _write_sidecar(sidecar_path, source_stat, annotation)
+        except OSError:
+            pass
+    return annotation
+
+
+def iter_cached_zones(madcat_file_path, cache_dir=None):
+    """ Given a madcat xml file, yields the zones of the page in document
+        order, read from the sidecar, see madcat_xml.iter_annotation_zones.
+    Returns
+    -------
+    (string, np.ndarray): zone id and (n, 2) int32 array of the x, y
+                          word corner points of the zone.
+    """
+    return iter_annotation_zones(load_madcat_annotation(madcat_file_path, cache_dir))
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+
+# Copyright   2018 Ashish Arora
+# Apache 2.0
+
+""" This module reads MADCAT xml files with xml.etree.ElementTree.iterparse
+ instead of building a minidom document. read_madcat_annotation reads zones,
+ words, their corner points and token text of a page in one pass. Elements
+ are cleared and removed from the tree as soon as they are read, so memory
+ does not grow with the size of the page. iter_annotation_zones yields the
+ zone id and the corner points of all the words of each zone, see
+ madcat_cache.py for the binary sidecar built from the annotation.
+"""
+
+import xml.etree.ElementTree as ElementTree
+from collections import namedtuple
+import numpy as np
+
+
+def _get_local_name(tag):
+    """ Given an element tag, returns it without the namespace, if any.
+    """
+    return tag.rsplit('}', 1)[-1]
+
+
+def _iterparse_detached(xml_file_path, events=('end',)):
+    """ Given an xml file, yields (event, element) pairs of events, same as
+        ElementTree.iterparse, but an element is cleared and removed from its
+        parent once its end event has been handled, so that neither the
+        element nor the tree above it grows with the size of the file.
+    """
+    parents = []
+    for event, elem in ElementTree.iterparse(xml_file_path, events=('start', 'end')):
+        if event == 'start':
+            parents.append(elem)
+            if 'start' in events:
+                yield event, elem
+            continue
+        parents.pop()
+        if 'end' in events:
+            yield event, elem
+        elem.clear()
+        if parents:
+            parents[-1].remove(elem)
+
+
+"""
+madcat_annotation is a named tuple which contains all the information of a madcat
+xml file used by the line extraction, mask creation and text scripts:
+             zone_ids (np.ndarray): id of each zone (line), in document order
+             zone_word_offsets (np.ndarray): words of zone i are
+                                             word_ids[zone_word_offsets[i]:zone_word_offsets[i+1]]
+             word_ids (np.ndarray): id of each token-image (word)
+             word_point_offsets (np.ndarray): points of word j are
+                                              points[word_point_offsets[j]:word_point_offsets[j+1]]
+             points (np.ndarray): (n, 2) int32 array of x, y corner points of all words
+             token_ref_ids (np.ndarray): word id referred by each segment token
+             token_text (np.ndarray): source text of each segment token
+"""
+madcat_annotation = namedtuple('madcat_annotation', 'zone_ids '
+                                                    'zone_word_offsets '
+                                                    'word_ids '
+                                                    'word_point_offsets '
+                                                    'points '
+                                                    'token_ref_ids '
+                                                    'token_text')
+
+
+def read_madcat_annotation(madcat_file_path):
+    """ Given a madcat xml file, reads zones, words, their corner points and
+        the segment token text in a single iterparse pass.
+    Returns
+    -------
+    madcat_annotation: parsed annotation of the page.
+    """
+    zone_ids, zone_word_offsets = [], [0]
+    word_ids, word_point_offsets = [], [0]
+    coordinates = []
+    token_ref_ids, token_text = [], []
+    zone_id = None
+    word_id = None
+    token_ref_id = None
+    source_text = None
+    for event, elem in _iterparse_detached(madcat_file_path, events=('start', 'end')):
+        name = _get_local_name(elem.tag)
+        if event == 'start':
+            if name == 'zone':
+                zone_id = elem.get('id')
+            elif name == 'token-image' and zone_id is not None:
+                word_id = elem.get('id')
+            elif name == 'point' and word_id is not None:
+                coordinates.append(elem.get('x'))
+                coordinates.append(elem.get('y'))
+            elif name == 'token':
+                token_ref_id = elem.get('ref_id')
+                source_text = None
+            continue
+
+        if name == 'token-image' and word_id is not None:
+            word_ids.append(word_id)
+            word_point_offsets.append(len(coordinates) // 2)
+            word_id = None
+        elif name == 'zone':
+            zone_ids.append(zone_id)
+            zone_word_offsets.append(len(word_ids))
+            zone_id = None
+        elif name == 'source' and token_ref_id is not None and source_text is None:
+            source_text = elem.text or ''
+        elif name == 'token' and token_ref_id is not None:
+            token_ref_ids.append(token_ref_id)
+            token_text.append(source_text if source_text is not None else '')
+            token_ref_id = None
+
+    return madcat_annotation(
+        zone_ids=np.array(zone_ids, dtype=np.str_),
+        zone_word_offsets=np.array(zone_word_offsets, dtype=np.int64),
+        word_ids=np.array(word_ids, dtype=np.str_),
+        word_point_offsets=np.array(word_point_offsets, dtype=np.int64),
+        points=np.array(coordinates, dtype=np.str_).astype(np.int32).reshape(-1, 2),
+        token_ref_ids=np.array(token_ref_ids, dtype=np.str_),
+        token_text=np.array(token_text, dtype=np.str_))
+
+
+def iter_annotation_zones(annotation):
+    """ Given a madcat_annotation, yields the zones of the page in document
+        order with the corner points of every token-image of the zone.
+    Returns
+    -------
+    (string, np.ndarray): zone id and (n, 2) int32 array of the x, y
+                          word corner points of the zone.
+    """
+    for index, zone_id in enumerate(annotation.zone_ids.tolist()):
+        first_word = annotation.zone_word_offsets[index]
+        last_word = annotation.zone_word_offsets[index + 1]
+        first_point = annotation.word_point_offsets[first_word]
+        last_point = annotation.word_point_offsets[last_word]
+        yield zone_id, annotation.points[first_point:last_point]
+
+
+def get_word_line_mapping(annotation):
+    """ Given a madcat_annotation, returns the words of each line and the
+        line of each word.
+    Returns
+    -------
+    (dict, dict): line id to list of word ids and word id to line id.
+    """
+    line_word_dict = dict()
+    word_line_dict = dict()
+    word_ids = annotation.word_ids.tolist()
+    for index, line_id in enumerate(annotation.zone_ids.tolist()):
+        line_words = word_ids[annotation.zone_word_offsets[index]:annotation.zone_word_offsets[index + 1]]
+        line_word_dict[line_id] = line_words
+        for word_id in line_words:
+            word_line_dict[word_id] = line_id
+    return line_word_dict, word_line_dict
+
+
+def get_line_text(annotation):
+    """ Given a madcat_annotation, returns the transcription of each line,
+        i.e. the source text of the tokens that refer to its words, joined
+        by space in document order.
+    Returns
+    -------
+    (dict): line id to text of the line.
+    """
+    _, word_line_dict = get_word_line_mapping(annotation)
+    text_line_word_dict = dict()
+    for ref_word_id, word in zip(annotation.token_ref_ids.tolist(), annotation.token_text.tolist()):
+        ref_line_id = word_line_dict[ref_word_id]
+        if ref_line_id not in text_line_word_dict:
+            text_line_word_dict[ref_line_id] = list()
+        text_line_word_dict[ref_line_id].append(word)
+    return {line_id: ' '.join(words) for line_id, words in text_line_word_dict.items()}
@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+
+# Copyright   2018 Ashish Arora
+# Apache 2.0
+
+""" This module contains Page, Zone and Line, an object model of a MADCAT page
+ whose derived data is computed on first access and kept until invalidate is
+ called. A Page reads the parsed annotation (madcat_cache.py) only when its
+ zones are used and reads the size of the page image from the image header,
+ without decoding pixels. A Zone is a zone of the xml file with its word ids
+ and corner points. A Line is the zone as used by the line extraction and
+ mask scripts: corner points shifted by half of the page padding, minimum
+ area bounding box, deskew angle, crop envelope and output file name.
+ Bounding boxes and angles are computed for all lines of a page at once.
+
+  Eg. page = Page(madcat_file_path, image_file_path, padding=400)
+      for line in page.lines:
+          print(line.line_image_file_name, line.envelope)
+"""
+
+import os
+import numpy as np
+from bounding_box_utils import get_bounding_box_records, get_ragged_points, get_smaller_angles, \
+    minimum_bounding_boxes
+from image_size import get_image_size
+from madcat_cache import load_madcat_annotation
+
+
+class Page(object):
+    """
+    A page image and its madcat xml file. padding is the total padding
+    added around the page image, lines are shifted by half of it.
+    size_cache is an optional ImageSizeCache for the page image size.
+    annotation is an optional madcat_annotation of the page, e.g. from the
+    line shards (line_shards.py), used instead of the xml file.
+    """
+    def __init__(self, madcat_file_path, image_file_path, padding=0, cache_dir=None,
+                 size_cache=None, annotation=None):
+        self.madcat_file_path = madcat_file_path
+        self.image_file_path = image_file_path
+        self.padding = padding
+        self.cache_dir = cache_dir
+        self.size_cache = size_cache
+        self.source_annotation = annotation
+        self.invalidate()
+
+    def invalidate(self):
+        """ Drops all derived data, e.g. after the xml or image file changed
+            or padding was modified. It is recomputed on next access.
+        """
+        self._annotation = None
+        self._image_size = None
+        self._zones = None
+        self._lines = None
+        self._bounding_boxes = None
+        self._smaller_angles = None
+
+    @property
+    def base_name(self):
+        """ Name of the page image without directory and extension.
+        """
+        return os.path.splitext(os.path.basename(self.image_file_path))[0]
+
+    @property
+    def offset(self):
+        """ Shift of the line points, half of the padding.
+        """
+        return int(self.padding // 2)
+
+    @property
+    def annotation(self):
+        """ Parsed madcat_annotation of the page.
+        """
+        if self._annotation is None:
+            if self.source_annotation is not None:
+                self._annotation = self.source_annotation
+            else:
+                self._annotation = load_madcat_annotation(self.madcat_file_path, self.cache_dir)
+        return self._annotation
+
+    @property
+    def image_size(self):
+        """ (width, height) of the page image, read from the image header.
+        """
+        if self._image_size is None:
+            if self.size_cache is not None:
+                self._image_size = self.size_cache.get(self.image_file_path)
+            else:
+                self._image_size = get_image_size(self.image_file_path)
+        return self._image_size
+
+    @property
+    def zones(self):
+        """ List of Zone in document order.
+        """
+        if self._zones is None:
+            annotation = self.annotation
+            self._zones = [Zone(self, index, zone_id)
+                           for index, zone_id in enumerate(annotation.zone_ids.tolist())]
+        return self._zones
+
+    @property
+    def lines(self):
+        """ List of Line, one for each zone.
+        """
+        if self._lines is None:
+            self._lines = [Line(zone) for zone in self.zones]
+        return self._lines
+
+    @property
+    def bounding_boxes(self):
+        """ List of minimum area BoundingBoxRecord of the lines, computed
+            in one batch for the page.
+        """
+        if self._bounding_boxes is None:
+            lines = self.lines
+            if not lines:
+                self._bounding_boxes = []
+            else:
+                points, offsets = get_ragged_points([line.points for line in lines])
+                self._bounding_boxes = get_bounding_box_records(
+                    minimum_bounding_boxes(points, offsets))
+        return self._bounding_boxes
+
+    @property
+    def smaller_angles(self):
+        """ np.ndarray of the deskew angle of each line, see get_smaller_angle.
+        """
+        if self._smaller_angles is None:
+            bounding_boxes = self.bounding_boxes
+            self._smaller_angles = get_smaller_angles(
+                [bounding_box.unit_vector for bounding_box in bounding_boxes],
+                [bounding_box.unit_vector_angle for bounding_box in bounding_boxes])
+        return self._smaller_angles
+
+
+class Zone(object):
+    """
+    A zone of the madcat xml file: its id, word ids and corner points
+    in page coordinates.
+    """
+    def __init__(self, page, index, zone_id):
+        self.page = page
+        self.index = index
+        self.zone_id = zone_id
+
+    @property
+    def word_ids(self):
+        """ List of the ids of the words (token-image) of the zone.
+        """
+        annotation = self.page.annotation
+        first_word = annotation.zone_word_offsets[self.index]
+        last_word = annotation.zone_word_offsets[self.index + 1]
+        return annotation.word_ids[first_word:last_word].tolist()
+
+    @property
+    def points(self):
+        """ (n, 2) int32 array of the word corner points.
+        """
+        annotation = self.page.annotation
+        first_word = annotation.zone_word_offsets[self.index]
+        last_word = annotation.zone_word_offsets[self.index + 1]
+        first_point = annotation.word_point_offsets[first_word]
+        last_point = annotation.word_point_offsets[last_word]
+        return annotation.points[first_point:last_point]
+
+
+class Line(object):
+    """
+    A line of the page: a zone in padded page coordinates with its bounding
+    box, deskew angle, crop envelope and output file name.
+    """
+    def __init__(self, zone):
+        self.zone = zone
+        self._points = None
+
+    @property
+    def page(self):
+        return self.zone.page
+
+    @property
+    def line_id(self):
+        """ Zone id padded to 4 digits, prefixed by '_'.
+        """
+        return '_' + self.zone.zone_id.zfill(4)
+
+    @property
+    def line_image_file_name(self):
+        """ Name of the line image, the page base name followed by the line id.
+        """
+        return self.page.base_name + self.line_id + '.tif'
+
+    @property
+    def points(self):
+        """ (n, 2) array of the word corner points shifted by the page
+            offset, same as update_minimum_bounding_box_input. No padded page
+            is made, but boxes and envelopes stay in these coordinates: the
+            original scripts truncate them there, and truncation is not
+            invariant to the shift for points left or above of the page.
+        """
+        if self._points is None:
+            self._points = self.zone.points.astype(np.int64) + self.page.offset
+        return self._points
+
+    @property
+    def bounding_box(self):
+        """ Minimum area BoundingBoxRecord of the line.
+        """
+        return self.page.bounding_boxes[self.zone.index]
+
+    @property
+    def smaller_angle(self):
+        """ Angle to rotate the line by to make it horizontal.
+        """
+        return float(self.page.smaller_angles[self.zone.index])
+
+    @property
+    def envelope(self):
+        """ (min_x, min_y, max_x, max_y) integer crop box of the line.
+        """
+        return self.bounding_box.envelope
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+
+# Copyright   2018 Ashish Arora
+# Apache 2.0
+
+""" This module contains RotatedPageCache, a least recently used cache of
+ rotated page images for the scripts that rotate the whole page for every
+ line (the roi_warp = False path of get_line_image_10/11). The lines of a page
+ mostly have nearly the same deskew angle, so the angle is quantized to
+ angle_step and lines that fall in the same bucket reuse the rotated page
+ instead of rotating it again. Rotated pages are evicted, least recently used
+ first, when the bytes held go over max_bytes.
+
+  Eg. page_cache = RotatedPageCache(max_bytes=512 * 2**20, angle_step=radians(0.05))
+      angle = page_cache.quantize_angle(rotation_angle_in_rad)
+      img2 = page_cache.get(image_file_name, angle,
+                            lambda angle: rotate(im, degrees(angle), order=3))
+"""
+
+from collections import OrderedDict
+
+
+def get_num_bytes(image):
+    """ Given a numpy array or PIL image, returns the bytes it holds. For PIL
+        images one byte per band and pixel is assumed.
+    """
+    if hasattr(image, 'nbytes'):
+        return int(image.nbytes)
+    width, height = image.size
+    return width * height * len(image.getbands())
+
+
+class RotatedPageCache(object):
+    """
+    LRU cache of rotated pages keyed by (page key, quantized angle).
+    angle_step is in radians, 0 keys by the exact angle. A rotated page
+    larger than max_bytes is returned but not kept.
+    """
+    def __init__(self, max_bytes=512 * 2**20, angle_step=0.0):
+        self.max_bytes = max_bytes
+        self.angle_step = angle_step
+        self.hits = 0
+        self.misses = 0
+        self.num_bytes = 0
+        self._pages = OrderedDict()
+
+    def __len__(self):
+        return len(self._pages)
+
+    def quantize_angle(self, angle):
+        """ Given an angle in radians, returns the center of its bucket, the
+            angle the page is rotated by.
+        """
+        if not self.angle_step:
+            return angle
+        return round(angle / self.angle_step) * self.angle_step
+
+    def get(self, page_key, angle, rotate_page):
+        """ Given a page key (e.g. the page image path), an angle in radians
+            and a function that rotates the page by an angle, returns the page
+            rotated by the quantized angle, from the cache if it is there.
+        """
+        angle = self.quantize_angle(angle)
+        key = (page_key, angle)
+        rotated_page = self._pages.get(key)
+        if rotated_page is not None:
+            self.hits += 1
+            self._pages.move_to_end(key)
+            return rotated_page
+
+        self.misses += 1
+        rotated_page = rotate_page(angle)
+        num_bytes = get_num_bytes(rotated_page)
+        if num_bytes > self.max_bytes:
+            return rotated_page
+        self._pages[key] = rotated_page
+        self.num_bytes += num_bytes
+        while self.num_bytes > self.max_bytes:
+            _, evicted_page = self._pages.popitem(last=False)
+            self.num_bytes -= get_num_bytes(evicted_page)
+        return rotated_page
+
+    def clear(self):
+        """ Drops all rotated pages, counters are kept.
+        """
+        self._pages.clear()
+        self.num_bytes = 0
+
+    def __str__(self):
+        return '{} rotated pages, {:.1f} MB, {} hits, {} misses'.format(
+            len(self._pages), self.num_bytes / 2**20, self.hits, self.misses)
@@ -1,6 +1,5 @@
 import argparse
 import os
-import xml.dom.minidom as minidom
 from PIL import Image
 import numpy as np
 from scipy.misc import toimage
@@ -9,6 +8,9 @@ from scipy.spatial import ConvexHull
 from math import sqrt
 from math import atan2, cos, sin, pi, degrees
 from collections import namedtuple
+from madcat_cache import iter_cached_zones
+from bounding_box_utils import get_rotation_matrix, transform_points
+from line_warp import get_line_rectangle
 
 bounding_box_tuple = namedtuple('bounding_box_tuple', 'area '
                                         'length_parallel '
@@ -139,23 +141,9 @@ def get_smaller_angle(bounding_box):
 
 
 def rotated_points(bounding_box, center):
-    p1, p2, p3, p4 = bounding_box.corner_points
-    x1, y1 = p1
-    x2, y2 = p2
-    x3, y3 = p3
-    x4, y4 = p4
-    center_x, center_y = center
     rotation_angle_in_rad = -get_smaller_angle(bounding_box)
-    x_dash_1 = (x1 - center_x) * cos(rotation_angle_in_rad) - (y1 - center_y) * sin(rotation_angle_in_rad) + center_x
-    x_dash_2 = (x2 - center_x) * cos(rotation_angle_in_rad) - (y2 - center_y) * sin(rotation_angle_in_rad) + center_x
-    x_dash_3 = (x3 - center_x) * cos(rotation_angle_in_rad) - (y3 - center_y) * sin(rotation_angle_in_rad) + center_x
-    x_dash_4 = (x4 - center_x) * cos(rotation_angle_in_rad) - (y4 - center_y) * sin(rotation_angle_in_rad) + center_x
-
-    y_dash_1 = (y1 - center_y) * cos(rotation_angle_in_rad) + (x1 - center_x) * sin(rotation_angle_in_rad) + center_y
-    y_dash_2 = (y2 - center_y) * cos(rotation_angle_in_rad) + (x2 - center_x) * sin(rotation_angle_in_rad) + center_y
-    y_dash_3 = (y3 - center_y) * cos(rotation_angle_in_rad) + (x3 - center_x) * sin(rotation_angle_in_rad) + center_y
-    y_dash_4 = (y4 - center_y) * cos(rotation_angle_in_rad) + (x4 - center_x) * sin(rotation_angle_in_rad) + center_y
-    return x_dash_1, y_dash_1, x_dash_2, y_dash_2, x_dash_3, y_dash_3, x_dash_4, y_dash_4
+    rotation_matrix = get_rotation_matrix(center, rotation_angle_in_rad)
+    return tuple(transform_points(rotation_matrix, list(bounding_box.corner_points)).ravel().tolist())
 
 
 def set_line_image_data(image, line_id, image_file_name):
@@ -169,70 +157,19 @@ def set_line_image_data(image, line_id, image_file_name):
 
 def get_line_images_from_page_image(image_file_name, madcat_file_path):
     im = Image.open(image_file_name)
-    doc = minidom.parse(madcat_file_path)
-    zone = doc.getElementsByTagName('zone')
-    for node in zone:
-        id = node.getAttribute('id')
+    for id, minimum_bounding_box_input in iter_cached_zones(madcat_file_path):
         if id == 'z14':
-            token_image = node.getElementsByTagName('token-image')
-            minimum_bounding_box_input = []
-            for token_node in token_image:
-                word_point = token_node.getElementsByTagName('point')
-                col_word, row_word = [], []
-                for word_node in word_point:
-                    col_word.append(int(word_node.getAttribute('x')))
-                    row_word.append(int(word_node.getAttribute('y')))
-                    word_coordinate = (int(word_node.getAttribute('x')), int(word_node.getAttribute('y')))
-                    minimum_bounding_box_input.append(word_coordinate)
 
             bounding_box = minimum_bounding_box(minimum_bounding_box_input)
 
-            p1, p2, p3, p4 = bounding_box.corner_points
-            x1, y1 = p1
-            x2, y2 = p2
-            x3, y3 = p3
-            x4, y4 = p4
-            min_x = min(x1, x2, x3, x4)
-            min_y = min(y1, y2, y3, y4)
-            max_x = max(x1, x2, x3, x4)
-            max_y = max(y1, y2, y3, y4)
-            box = (min_x, min_y, max_x, max_y)
-            region_initial = im.crop(box)
-            region_initial.show()
-
-            # #calculate new crop points
-            rot_points = []
-            p1_new = (x1 - min_x, y1 - min_y)
-            p2_new = (x2 - min_x, y2 - min_y)
-            p3_new = (x3 - min_x, y3 - min_y)
-            p4_new = (x4 - min_x, y4 - min_y)
-            rot_points.append(p1_new)
-            rot_points.append(p2_new)
-            rot_points.append(p3_new)
-            rot_points.append(p4_new)
-
-            cropped_bounding_box = bounding_box_tuple(bounding_box.area,
-                bounding_box.length_parallel,
-                bounding_box.length_orthogonal,
-                bounding_box.length_orthogonal,
-                bounding_box.unit_vector,
-                bounding_box.unit_vector_angle,
-                set(rot_points)
-            )
-
-            rotation_angle_in_rad = get_smaller_angle(cropped_bounding_box)
-            img2 = region_initial.rotate(degrees(rotation_angle_in_rad), resample=Image.BICUBIC)
-            img2.show()
-
-            x_dash_1, y_dash_1, x_dash_2, y_dash_2, x_dash_3, y_dash_3, x_dash_4, y_dash_4 = rotated_points(
-                cropped_bounding_box, get_center(region_initial))
-
-            min_x = min(x_dash_1, x_dash_2, x_dash_3, x_dash_4)
-            min_y = min(y_dash_1, y_dash_2, y_dash_3, y_dash_4)
-            max_x = max(x_dash_1, x_dash_2, x_dash_3, x_dash_4)
-            max_y = max(y_dash_1, y_dash_2, y_dash_3, y_dash_4)
-            box = (min_x, min_y, max_x, max_y)
-            region_final = img2.crop(box)
+            # one resample from the page to the line rectangle, PIL rotates
+            # bilevel images with nearest neighbour
+            rotation_angle_in_rad = get_smaller_angle(bounding_box)
+            order = 0 if im.mode == '1' else 3
+            region_final = get_line_rectangle(np.asarray(im.convert('L') if im.mode == '1' else im),
+                                              bounding_box, rotation_angle_in_rad, order=order,
+                                              pil=True)
+            region_final = Image.fromarray(np.clip(region_final, 0, 255).astype(np.uint8))
             region_final.show()
             input("Press the <ENTER> key to continue...")
             # set_line_image_data(region_final, id, image_file_name)
@@ -1,6 +1,5 @@
 import argparse
 import os
-import xml.dom.minidom as minidom
 import numpy as np
 
 import matplotlib
@@ -13,6 +12,9 @@ from matplotlib.patches import Arrow, Circle
 from scipy.spatial import ConvexHull
 from math import atan2, cos, sin, pi, degrees, sqrt
 from collections import namedtuple
+from madcat_cache import iter_cached_zones
+from bounding_box_utils import get_rotation_matrix, transform_points
+from line_warp import clip_to_image_range, get_line_rectangle
 from skimage.io import imshow, show, imread, imsave
 from skimage.transform import rotate
 from skimage import img_as_uint
@@ -148,23 +150,9 @@ def get_smaller_angle(bounding_box):
 
 
 def rotated_points(bounding_box, center):
-    p1, p2, p3, p4 = bounding_box.corner_points
-    x1, y1 = p1
-    x2, y2 = p2
-    x3, y3 = p3
-    x4, y4 = p4
-    center_x, center_y = center
     rotation_angle_in_rad = -get_smaller_angle(bounding_box)
-    x_dash_1 = (x1 - center_x) * cos(rotation_angle_in_rad) - (y1 - center_y) * sin(rotation_angle_in_rad) + center_x
-    x_dash_2 = (x2 - center_x) * cos(rotation_angle_in_rad) - (y2 - center_y) * sin(rotation_angle_in_rad) + center_x
-    x_dash_3 = (x3 - center_x) * cos(rotation_angle_in_rad) - (y3 - center_y) * sin(rotation_angle_in_rad) + center_x
-    x_dash_4 = (x4 - center_x) * cos(rotation_angle_in_rad) - (y4 - center_y) * sin(rotation_angle_in_rad) + center_x
-
-    y_dash_1 = (y1 - center_y) * cos(rotation_angle_in_rad) + (x1 - center_x) * sin(rotation_angle_in_rad) + center_y
-    y_dash_2 = (y2 - center_y) * cos(rotation_angle_in_rad) + (x2 - center_x) * sin(rotation_angle_in_rad) + center_y
-    y_dash_3 = (y3 - center_y) * cos(rotation_angle_in_rad) + (x3 - center_x) * sin(rotation_angle_in_rad) + center_y
-    y_dash_4 = (y4 - center_y) * cos(rotation_angle_in_rad) + (x4 - center_x) * sin(rotation_angle_in_rad) + center_y
-    return x_dash_1, y_dash_1, x_dash_2, y_dash_2, x_dash_3, y_dash_3, x_dash_4, y_dash_4
+    rotation_matrix = get_rotation_matrix(center, rotation_angle_in_rad)
+    return tuple(transform_points(rotation_matrix, list(bounding_box.corner_points)).ravel().tolist())
 
 
 def set_line_image_data(image, line_id, image_file_name):
@@ -178,19 +166,11 @@ def set_line_image_data(image, line_id, image_file_name):
 
 
 def allowed_word_segmentation(madcat_file_path):
-    doc = minidom.parse(madcat_file_path)
-    zone = doc.getElementsByTagName('zone')
     points = []
-    for node in zone:
-        id = node.getAttribute('id')
+    for id, zone_points in iter_cached_zones(madcat_file_path, madcat_cache_dir):
         if id != 'z0' and id != 'z1' and id != 'z2' and id != 'z3' :
             continue
-        token_image = node.getElementsByTagName('token-image')
-        for token_node in token_image:
-            word_point = token_node.getElementsByTagName('point')
-            for word_node in word_point:
-                word_coordinate = (int(word_node.getAttribute('x')), int(word_node.getAttribute('y')))
-                points.append(word_coordinate)
+        points.extend(zone_points.tolist())
 
     y_val = []
     for point in points:
@@ -207,33 +187,13 @@ def get_line_images_from_page_image(image_file_name, madcat_file_path):
     im = imread(image_file_name)
     # imshow(im)
     # show()
-    doc = minidom.parse(madcat_file_path)
-    zone = doc.getElementsByTagName('zone')
-    for node in zone:
-        id = node.getAttribute('id')
+    for id, minimum_bounding_box_input in iter_cached_zones(madcat_file_path, madcat_cache_dir):
         print(id)
         if id != 'z16':
             continue
-        token_image = node.getElementsByTagName('token-image')
-        minimum_bounding_box_input = []
-        for token_node in token_image:
-            word_point = token_node.getElementsByTagName('point')
-            for word_node in word_point:
-                word_coordinate = (int(word_node.getAttribute('x')), int(word_node.getAttribute('y')))
-                minimum_bounding_box_input.append(word_coordinate)
 
         bounding_box = minimum_bounding_box(minimum_bounding_box_input)
         # print(bounding_box)
-        p1, p2, p3, p4 = bounding_box.corner_points
-        x1, y1 = p1
-        x2, y2 = p2
-        x3, y3 = p3
-        x4, y4 = p4
-        min_x = int(min(x1, x2, x3, x4))
-        min_y = int(min(y1, y2, y3, y4))
-        max_x = int(max(x1, x2, x3, x4))
-        max_y = int(max(y1, y2, y3, y4))
-        region_initial = im[min_y:max_y, min_x:max_x]
         # imshow(region_initial)
         # show()
 
@@ -249,40 +209,12 @@ def get_line_images_from_page_image(image_file_name, madcat_file_path):
         # if min_y <= 0:
         #     continue
 
-        # #calculate new crop points
-        rot_points = []
-        p1_new = (x1 - min_x, y1 - min_y)
-        p2_new = (x2 - min_x, y2 - min_y)
-        p3_new = (x3 - min_x, y3 - min_y)
-        p4_new = (x4 - min_x, y4 - min_y)
-        rot_points.append(p1_new)
-        rot_points.append(p2_new)
-        rot_points.append(p3_new)
-        rot_points.append(p4_new)
-        # print(rot_points)
-        cropped_bounding_box = bounding_box_tuple(bounding_box.area,
-            bounding_box.length_parallel,
-            bounding_box.length_orthogonal,
-            bounding_box.length_orthogonal,
-            bounding_box.unit_vector,
-            bounding_box.unit_vector_angle,
-            set(rot_points)
-        )
-
-        rotation_angle_in_rad = get_smaller_angle(cropped_bounding_box)
-        img2 = rotate(region_initial, degrees(rotation_angle_in_rad), order=3)
-        # imshow(img2)
-        # show()
-        # print(rotation_angle_in_rad)
-        x_dash_1, y_dash_1, x_dash_2, y_dash_2, x_dash_3, y_dash_3, x_dash_4, y_dash_4 = rotated_points(
-            cropped_bounding_box, get_center(region_initial))
-
-
-        min_x = int(min(x_dash_1, x_dash_2, x_dash_3, x_dash_4))
-        min_y = int(min(y_dash_1, y_dash_2, y_dash_3, y_dash_4))
-        max_x = int(max(x_dash_1, x_dash_2, x_dash_3, x_dash_4))
-        max_y = int(max(y_dash_1, y_dash_2, y_dash_3, y_dash_4))
-        region_final = img2[min_y:max_y, min_x:max_x]
+        # one resample from the page to the line rectangle
+        rotation_angle_in_rad = get_smaller_angle(bounding_box)
+        region_final = get_line_rectangle(im, bounding_box, rotation_angle_in_rad)
+        region_final = clip_to_image_range(region_final, im)
+        if np.issubdtype(im.dtype, np.integer):
+            region_final = region_final / np.iinfo(im.dtype).max
         #set_line_image_data(region_final, id, image_file_name)
         # imshow(region_final)
         # show()
@@ -300,6 +232,8 @@ def check_writing_condition(wc_dict):
 
 fig,ax = plt.subplots(1)
 line_images_path = '/Users/ashisharora/madcat_ar'
+# parsed madcat xml sidecars, kept out of the corpus directories
+madcat_cache_dir = os.path.join(line_images_path, 'madcat_cache')
 data_path = '/Users/ashisharora/madcat_ar'
 for file in os.listdir(os.path.join(data_path, 'images')):
     if file.endswith(".tif"):
@@ -1,6 +1,5 @@
 import argparse
 import os
-import xml.dom.minidom as minidom
 import numpy as np
 
 import matplotlib
@@ -13,6 +12,9 @@ from matplotlib.patches import Arrow, Circle
 from scipy.spatial import ConvexHull
 from math import atan2, cos, sin, pi, degrees, sqrt
 from collections import namedtuple
+from madcat_cache import iter_cached_zones
+from bounding_box_utils import get_rotation_matrix, transform_points
+from line_warp import clip_to_image_range, get_line_rectangle, get_white_value
 from skimage.io import imshow, show, imread, imsave
 from skimage.transform import rotate
 from skimage import img_as_uint, img_as_float
@@ -148,58 +150,9 @@ def get_smaller_angle(bounding_box):
 
 
 def rotated_points(bounding_box, center):
-    p1, p2, p3, p4 = bounding_box.corner_points
-    x1, y1 = p1
-    x2, y2 = p2
-    x3, y3 = p3
-    x4, y4 = p4
-    center_x, center_y = center
     rotation_angle_in_rad = -get_smaller_angle(bounding_box)
-    x_dash_1 = (x1 - center_x) * cos(rotation_angle_in_rad) - (y1 - center_y) * sin(rotation_angle_in_rad) + center_x
-    x_dash_2 = (x2 - center_x) * cos(rotation_angle_in_rad) - (y2 - center_y) * sin(rotation_angle_in_rad) + center_x
-    x_dash_3 = (x3 - center_x) * cos(rotation_angle_in_rad) - (y3 - center_y) * sin(rotation_angle_in_rad) + center_x
-    x_dash_4 = (x4 - center_x) * cos(rotation_angle_in_rad) - (y4 - center_y) * sin(rotation_angle_in_rad) + center_x
-
-    y_dash_1 = (y1 - center_y) * cos(rotation_angle_in_rad) + (x1 - center_x) * sin(rotation_angle_in_rad) + center_y
-    y_dash_2 = (y2 - center_y) * cos(rotation_angle_in_rad) + (x2 - center_x) * sin(rotation_angle_in_rad) + center_y
-    y_dash_3 = (y3 - center_y) * cos(rotation_angle_in_rad) + (x3 - center_x) * sin(rotation_angle_in_rad) + center_y
-    y_dash_4 = (y4 - center_y) * cos(rotation_angle_in_rad) + (x4 - center_x) * sin(rotation_angle_in_rad) + center_y
-    return x_dash_1, y_dash_1, x_dash_2, y_dash_2, x_dash_3, y_dash_3, x_dash_4, y_dash_4
-
-
-def pad_image(image):
-
-    width_padding = 200
-    height_padding = 200
-    height = image.shape[0]
-    im_pad = np.concatenate((.1 * np.ones((height, width_padding),
-                                         dtype=int), image), axis=1)
-    im_pad1 = np.concatenate((im_pad, .1 * np.ones((height, width_padding),
-                                                  dtype=int)), axis=1)
-
-    width = im_pad1.shape[1]
-
-    im_pad2 = np.concatenate((.1 * np.ones((height_padding, width),
-                                          dtype=int), im_pad1), axis=0)
-    im_pad3 = np.concatenate((im_pad2, .1 * np.ones((height_padding, width),
-                                                   dtype=int)), axis=0)
-
-
-    return im_pad3
-
-
-def update_minimum_bounding_box_input(bounding_box_input):
-    width_padding = 200
-    height_padding = 200
-    updated_minimum_bounding_box_input = []
-    for point in bounding_box_input:
-        x, y = point
-        new_x = x + width_padding
-        new_y = y + height_padding
-        word_coordinate = (new_x, new_y)
-        updated_minimum_bounding_box_input.append(word_coordinate)
-
-    return updated_minimum_bounding_box_input
+    rotation_matrix = get_rotation_matrix(center, rotation_angle_in_rad)
+    return tuple(transform_points(rotation_matrix, list(bounding_box.corner_points)).ravel().tolist())
 
 
 def set_line_image_data(image, line_id, image_file_name):
@@ -211,26 +164,16 @@ def set_line_image_data(image, line_id, image_file_name):
 
 
 def get_line_images_from_page_image(image_file_name, madcat_file_path):
-    im_wo_pad = imread(image_file_name)
-    im = pad_image(im_wo_pad)
+    im = imread(image_file_name)
+    # pixels outside of the page are read as white instead of padding the page
+    white = get_white_value(im)
 
-    doc = minidom.parse(madcat_file_path)
-    zone = doc.getElementsByTagName('zone')
-    for node in zone:
-        id = node.getAttribute('id')
+    for id, minimum_bounding_box_input in iter_cached_zones(madcat_file_path, madcat_cache_dir):
         print(id)
         # if id != 'z1':
         #     continue
-        token_image = node.getElementsByTagName('token-image')
-        minimum_bounding_box_input = []
-        for token_node in token_image:
-            word_point = token_node.getElementsByTagName('point')
-            for word_node in word_point:
-                word_coordinate = (int(word_node.getAttribute('x')), int(word_node.getAttribute('y')))
-                minimum_bounding_box_input.append(word_coordinate)
 
-        updated_mbb_input = update_minimum_bounding_box_input(minimum_bounding_box_input)
-        bounding_box = minimum_bounding_box(updated_mbb_input)
+        bounding_box = minimum_bounding_box(minimum_bounding_box_input)
 
         # patches = [Circle((list(bounding_box.corner_points)[0]), radius=50, color='red'),
         #            Circle((list(bounding_box.corner_points)[1]), radius=50, color='blue'),
@@ -244,48 +187,12 @@ def get_line_images_from_page_image(image_file_name, madcat_file_path):
         # plt.show(fig)
         # input("Press the <ENTER> key to continue...")
 
-        p1, p2, p3, p4 = bounding_box.corner_points
-        x1, y1 = p1
-        x2, y2 = p2
-        x3, y3 = p3
-        x4, y4 = p4
-        min_x = int(min(x1, x2, x3, x4))
-        min_y = int(min(y1, y2, y3, y4))
-        max_x = int(max(x1, x2, x3, x4))
-        max_y = int(max(y1, y2, y3, y4))
-        region_initial = im[min_y:max_y, min_x:max_x]
-
-
-        # #calculate new crop points
-        rot_points = []
-        p1_new = (x1 - min_x, y1 - min_y)
-        p2_new = (x2 - min_x, y2 - min_y)
-        p3_new = (x3 - min_x, y3 - min_y)
-        p4_new = (x4 - min_x, y4 - min_y)
-        rot_points.append(p1_new)
-        rot_points.append(p2_new)
-        rot_points.append(p3_new)
-        rot_points.append(p4_new)
-        cropped_bounding_box = bounding_box_tuple(bounding_box.area,
-            bounding_box.length_parallel,
-            bounding_box.length_orthogonal,
-            bounding_box.length_orthogonal,
-            bounding_box.unit_vector,
-            bounding_box.unit_vector_angle,
-            set(rot_points)
-        )
-
-        rotation_angle_in_rad = get_smaller_angle(cropped_bounding_box)
-        img2 = rotate(region_initial, degrees(rotation_angle_in_rad), order=3)
-        x_dash_1, y_dash_1, x_dash_2, y_dash_2, x_dash_3, y_dash_3, x_dash_4, y_dash_4 = rotated_points(
-            cropped_bounding_box, get_center(region_initial))
-
-
-        min_x = int(min(x_dash_1, x_dash_2, x_dash_3, x_dash_4))
-        min_y = int(min(y_dash_1, y_dash_2, y_dash_3, y_dash_4))
-        max_x = int(max(x_dash_1, x_dash_2, x_dash_3, x_dash_4))
-        max_y = int(max(y_dash_1, y_dash_2, y_dash_3, y_dash_4))
-        region_final = img2[min_y:max_y, min_x:max_x]
+        # one resample from the page to the line rectangle
+        rotation_angle_in_rad = get_smaller_angle(bounding_box)
+        region_final = get_line_rectangle(im, bounding_box, rotation_angle_in_rad, cval=white)
+        region_final = clip_to_image_range(region_final, im, white)
+        if np.issubdtype(im.dtype, np.integer):
+            region_final = region_final / np.iinfo(im.dtype).max
         set_line_image_data(region_final, id, image_file_name)
         # imshow(region_final)
         # show()
@@ -295,6 +202,8 @@ def get_line_images_from_page_image(image_file_name, madcat_file_path):
 ### main ###
 fig,ax = plt.subplots(1)
 line_images_path = '/Users/ashisharora/madcat_ar'
+# parsed madcat xml sidecars, kept out of the corpus directories
+madcat_cache_dir = os.path.join(line_images_path, 'madcat_cache')
 data_path = '/Users/ashisharora/madcat_ar'
 for file in os.listdir(os.path.join(data_path, 'images')):
     if file.endswith(".tif"):
@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+
+# Copyright   2018 Ashish Arora
+# Apache 2.0
+
+""" Equivalence tests of the minimum bounding box routines of
+ bounding_box_utils against the reference, point by point minimum_bounding_box.
+ The area must always agree. Side lengths, corners and envelope are compared
+ only when the minimum area is reached on one hull edge, since a tie between
+ edges legitimately gives another rectangle of the same area.
+
+  Eg. python3 -m pytest -q test_bounding_box_utils.py
+"""
+
+import numpy as np
+import pytest
+import copy
+import pickle
+from collections import namedtuple
+from math import atan2, cos, pi, sin
+from scipy.spatial import ConvexHull
+from bounding_box_utils import BoundingBoxRecord, bounding_area, get_bounding_box_array, \
+    get_bounding_box_records, get_ragged_points, get_smaller_angle, get_smaller_angles, \
+    minimum_bounding_area, minimum_bounding_box, minimum_bounding_box_calipers, \
+    minimum_bounding_box_vectorized, minimum_bounding_boxes, to_bounding_box_tuple
+
+
+def get_skewed_line_points(rng):
+    """ Given a random generator, returns the integer corner points of the
+        word boxes of a line written with a random skew.
+    """
+    num_words = rng.integers(1, 12)
+    angle = rng.uniform(-0.3, 0.3)
+    direction = np.array([np.cos(angle), np.sin(angle)])
+    normal = np.array([-direction[1], direction[0]])
+    origin = rng.uniform(0, 3000, size=2)
+    points = []
+    position = 0.0
+    for _ in range(num_words):
+        width = rng.uniform(20, 200)
+        height = rng.uniform(30, 80)
+        shift = rng.uniform(-10, 10)
+        for along, across in ((0, 0), (width, 0), (width, height), (0, height)):
+            points.append(origin + (position + along) * direction + (shift + across) * normal)
+        position += width + rng.uniform(5, 40)
+    return np.rint(points).astype(np.int64)
+
+
+def has_unique_minimum(points):
+    """ Given a point set, returns True if the smallest bounding_area of the
+        reference is reached on one hull edge only.
+    """
+    hull = [tuple(points[index]) for index in ConvexHull(points).vertices]
+    hull.append(hull[0])
+    areas = np.array([bounding_area(index, hull)['area'] for index in range(len(hull) - 1)])
+    return np.sum(np.isclose(areas, areas.min(), rtol=1e-9, atol=1e-9)) == 1
+
+
+def sorted_corners(corner_points):
+    corner_points = np.asarray(corner_points, dtype=np.float64)
+    return corner_points[np.lexsort((corner_points[:, 1], corner_points[:, 0]))]
+
+
+def assert_same_rectangle(bounding_box, reference, unique):
+    assert np.isclose(bounding_box.area, reference.area, rtol=1e-9)
+    if unique:
+        assert np.isclose(sorted((bounding_box.length_parallel, bounding_box.length_orthogonal)),
+                          sorted((reference.length_parallel, reference.length_orthogonal)),
+                          rtol=1e-9).all()
+        assert np.allclose(sorted_corners(bounding_box.corner_points),
+                           sorted_corners(reference.corner_points), atol=1e-6)
+        assert bounding_box.envelope == reference.envelope
+
+
+def get_point_sets():
+    rng = np.random.default_rng(2018)
+    point_sets = [get_skewed_line_points(rng) for _ in range(300)]
+    point_sets += [rng.integers(0, 50, size=(5, 2)) for _ in range(300)]
+    # skip degenerate sets, the reference needs a 2D hull
+    return [points for points in point_sets if np.linalg.matrix_rank(points - points[0]) == 2]
+
+
+@pytest.mark.parametrize('minimum_bounding_box_function', [minimum_bounding_box_vectorized,
+                                                           minimum_bounding_box_calipers])
+def test_minimum_bounding_box_matches_reference(minimum_bounding_box_function):
+    for points in get_point_sets():
+        reference = minimum_bounding_box([tuple(point) for point in points.tolist()])
+        bounding_box = minimum_bounding_box_function(points)
+        assert_same_rectangle(bounding_box, reference, has_unique_minimum(points))
+
+
+def test_minimum_bounding_area_matches_reference():
+    for points in get_point_sets():
+        hull = [tuple(points[index]) for index in ConvexHull(points).vertices]
+        hull.append(hull[0])
+        reference = min((bounding_area(index, hull) for index in range(len(hull) - 1)),
+                        key=lambda rectangle: rectangle['area'])
+        rectangle = minimum_bounding_area(np.array(hull))
+        assert np.isclose(rectangle['area'], reference['area'], rtol=1e-9)
+        if has_unique_minimum(points):
+            assert np.isclose(rectangle['length_parallel'], reference['length_parallel'], rtol=1e-9)
+            assert np.isclose(rectangle['length_orthogonal'], reference['length_orthogonal'],
+                              rtol=1e-9)
+
+
+def test_minimum_bounding_box_needs_three_points():
+    with pytest.raises(ValueError):
+        minimum_bounding_box_vectorized([(0, 0), (1, 1)])
+
+
+"""
+Envelopes given by the original scripts, int(min(...)) and int(max(...)) of the
+corners of their minimum_bounding_box, for point sets whose corners fall next
+to an integer, e.g. 838.9999999999 for the axis aligned line below.
+"""
+golden_envelopes = [
+    ([[39, 35], [14, 28], [11, 46], [28, 1], [15, 42], [31, 22]], (0, 0, 39, 46)),
+    ([[43, 44], [0, 56], [2, 50], [49, 44], [8, 48], [57, 49]], (0, 42, 57, 55)),
+    ([[49, 40], [3, 53], [55, 59], [3, 8], [37, 32], [5, 52]], (-2, 7, 60, 59)),
+    ([[27, 39], [50, 52], [48, 41], [27, 32], [10, 33], [30, 39]], (10, 24, 53, 51)),
+    ([[2120, 262], [2170, 259], [2174, 315], [2124, 318], [2199, 268], [2279, 263], [2281, 302],
+      [2202, 308], [2292, 250], [2338, 247], [2341, 291], [2294, 294], [2350, 242], [2467, 234],
+      [2472, 311], [2356, 318]], (2119, 233, 2472, 333)),
+    ([[839, 4460], [895, 4460], [895, 4528], [839, 4528], [913, 4466], [1061, 4466], [1061, 4526],
+      [913, 4526], [1071, 4464], [1172, 4464], [1172, 4502], [1071, 4502], [1185, 4459], [1325, 4459],
+      [1325, 4547], [1185, 4547], [1349, 4463], [1486, 4463], [1486, 4537], [1349, 4537], [1496, 4462],
+      [1641, 4462], [1641, 4513], [1496, 4513], [1658, 4460], [1738, 4460], [1738, 4518], [1658, 4518]],
+     (838, 4459, 1737, 4547)),
+    ([[3246, 434], [3308, 434], [3308, 474], [3246, 474], [3334, 419], [3458, 419], [3458, 451],
+      [3334, 451]], (3239, 400, 3462, 483)),
+    ([[58, 3], [32, 22], [3, 5], [16, 11], [43, 12], [37, 51]], (-8, -16, 58, 51)),
+    ([[1981, 632], [2054, 632], [2054, 686], [1981, 686]], (1981, 632, 2054, 686)),
+]
+
+
+@pytest.mark.parametrize('minimum_bounding_box_function', [
+    lambda points: minimum_bounding_box([tuple(point) for point in points.tolist()]),
+    minimum_bounding_box_vectorized, minimum_bounding_box_calipers])
+def test_envelope_matches_original_scripts(minimum_bounding_box_function):
+    for points, envelope in golden_envelopes:
+        assert minimum_bounding_box_function(np.array(points)).envelope == envelope
+
+
+def test_minimum_bounding_boxes_envelope_matches_original_scripts():
+    points, offsets = get_ragged_points([points for points, _ in golden_envelopes])
+    bounding_boxes = minimum_bounding_boxes(points, offsets)
+    assert [tuple(bounding_box['envelope'].tolist()) for bounding_box in bounding_boxes] == \
+        [envelope for _, envelope in golden_envelopes]
+
+
+def get_unit_vectors():
+    """ Returns unit vectors at random angles, at the folding boundaries
+        0, +-pi/4, +-pi/2, +-3pi/4 and +-pi of get_smaller_angle and one
+        bit either side of them, and the exact axis vectors.
+    """
+    rng = np.random.default_rng(2018)
+    angles = rng.uniform(-pi, pi, 5000).tolist()
+    for boundary in (0, pi / 4, pi / 2, 3 * pi / 4, pi):
+        for angle in (boundary, -boundary):
+            angles += [np.nextafter(angle, -4), angle, np.nextafter(angle, 4)]
+    unit_vectors = [(cos(angle), sin(angle)) for angle in angles]
+    return unit_vectors + [(1.0, 0.0), (1.0, -0.0), (0.0, 1.0), (0.0, -1.0), (-1.0, 0.0),
+                           (-1.0, -0.0), (-0.0, 1.0), (-0.0, -1.0)]
+
+
+def test_smaller_angles_match_reference():
+    rectangle = namedtuple('rectangle', ('unit_vector', 'unit_vector_angle'))
+    unit_vectors = get_unit_vectors()
+    unit_vector_angles = [atan2(y, x) for x, y in unit_vectors]
+    reference = [get_smaller_angle(rectangle(unit_vector, unit_vector_angle))
+                 for unit_vector, unit_vector_angle in zip(unit_vectors, unit_vector_angles)]
+    assert get_smaller_angles(unit_vectors, unit_vector_angles).tolist() == reference
+    assert get_smaller_angles(unit_vectors).tolist() == reference
+    assert get_smaller_angles(np.zeros((0, 2))).shape == (0,)
+
+
+def assert_same_bounding_box_tuple(bounding_box, reference):
+    assert bounding_box._fields == reference._fields
+    for name in reference._fields:
+        if name == 'corner_points':
+            assert np.array_equal(bounding_box.corner_points, reference.corner_points)
+        else:
+            assert getattr(bounding_box, name) == getattr(reference, name)
+
+
+def test_bounding_box_record_round_trip():
+    bounding_boxes = [minimum_bounding_box_vectorized(points) for points in get_point_sets()[:50]]
+    records = [BoundingBoxRecord.from_bounding_box_tuple(bounding_box)
+               for bounding_box in bounding_boxes]
+    for record, bounding_box in zip(records, bounding_boxes):
+        assert_same_bounding_box_tuple(record.to_bounding_box_tuple(), bounding_box)
+        for name in bounding_box._fields:
+            assert np.array_equal(getattr(record, name), getattr(bounding_box, name))
+        assert BoundingBoxRecord.from_record(record.to_record()) == record
+    for copied_records in (pickle.loads(pickle.dumps(records)), copy.deepcopy(records)):
+        assert copied_records == records
+        for copied_record, bounding_box in zip(copied_records, bounding_boxes):
+            assert_same_bounding_box_tuple(copied_record.to_bounding_box_tuple(), bounding_box)
+    bounding_box_array = get_bounding_box_array(bounding_boxes)
+    assert get_bounding_box_records(bounding_box_array) == records
+    assert get_bounding_box_array(records).tobytes() == bounding_box_array.tobytes()
+    assert not hasattr(records[0], '__dict__')
+
+
+def get_tied_point_sets():
+    """ Returns point sets whose minimum area is reached on several hull
+        edges: squares, axis aligned rectangles, a regular octagon, and
+        sets with duplicate and collinear points.
+    """
+    octagon = [(round(100 * cos(k * pi / 4)), round(100 * sin(k * pi / 4))) for k in range(8)]
+    return [np.array(points) for points in (
+        [(0, 0), (10, 0), (10, 10), (0, 10)],
+        [(5, 5), (5, 5), (25, 5), (25, 45), (5, 45), (15, 5)],
+        [(100, 200), (300, 200), (300, 260), (100, 260), (200, 230)],
+        octagon,
+        [(0, 0), (4, 0), (8, 0), (8, 3), (0, 3), (4, 3)],
+        [(0, 0), (2, 1), (1, 3), (-1, 2)])]
+
+
+def test_minimum_bounding_boxes_match_reference():
+    point_sets = get_point_sets()[:200] + get_tied_point_sets()
+    rng = np.random.default_rng(7)
+    point_sets = [point_sets[index] for index in rng.permutation(len(point_sets))]
+    points, offsets = get_ragged_points(point_sets)
+    assert np.array_equal(np.diff(offsets), [len(line_points) for line_points in point_sets])
+    for chunk_size in (4096, 7):
+        bounding_boxes = minimum_bounding_boxes(points, offsets, chunk_size=chunk_size)
+        assert len(bounding_boxes) == len(point_sets)
+        for bounding_box, line_points in zip(bounding_boxes, point_sets):
+            reference = minimum_bounding_box([tuple(point) for point in line_points.tolist()])
+            # the rectangle is computed with the arithmetic of the reference
+            assert_same_bounding_box_tuple(to_bounding_box_tuple(bounding_box), reference)
+
+
+def test_minimum_bounding_boxes_needs_three_points_per_line():
+    points, offsets = get_ragged_points([[(0, 0), (1, 0), (0, 1)], [(0, 0), (1, 1)]])
+    with pytest.raises(ValueError, match='line 1'):
+        minimum_bounding_boxes(points, offsets)
+    assert len(minimum_bounding_boxes(*get_ragged_points([]))) == 0
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+
+# Copyright   2018 Ashish Arora
+# Apache 2.0
+
+""" Tests of corpus_index: page lookup over several releases and rebuild of
+ the index file when the releases or their directories change.
+
+  Eg. python3 -m pytest -q test_corpus_index.py
+"""
+
+import os
+import corpus_index
+from corpus_index import filter_corpus_index, get_corpus_index, parse_writing_condition_filter
+
+
+def add_page(database_path, base_name, image_extension='.tif'):
+    for directory, file_name in (('madcat', base_name + '.madcat.xml'),
+                                 ('images', base_name + image_extension)):
+        os.makedirs(os.path.join(database_path, directory), exist_ok=True)
+        open(os.path.join(database_path, directory, file_name), 'w').close()
+
+
+def touch_later(path):
+    """ Given a path, moves its mtime one second later, so that the change is
+        seen on file systems with a coarse mtime.
+    """
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+
+def make_corpus(tmp_path):
+    """ Given a directory, creates two releases with a writing_conditions.tab
+        each and one page present in both, and returns their paths.
+    """
+    database_paths = [str(tmp_path / 'LDC2012T15'), str(tmp_path / 'LDC2013T09')]
+    for database_path, base_names in zip(database_paths, (('a', 'b', 'shared'), ('c', 'shared'))):
+        for base_name in base_names:
+            add_page(database_path, base_name)
+        os.makedirs(os.path.join(database_path, 'docs'))
+        with open(os.path.join(database_path, 'docs', 'writing_conditions.tab'), 'w') as f:
+            for base_name in base_names:
+                f.write('{}\tx\tx\t{}\n'.format(base_name, 'IUC' if base_name != 'c' else 'IUL'))
+    return database_paths
+
+
+def count_builds(monkeypatch):
+    builds = []
+    build_corpus_index = corpus_index.build_corpus_index
+
+    def build(database_paths):
+        builds.append(list(database_paths))
+        return build_corpus_index(database_paths)
+    monkeypatch.setattr(corpus_index, 'build_corpus_index', build)
+    return builds
+
+
+def test_corpus_index_locations(tmp_path):
+    database_paths = make_corpus(tmp_path)
+    index = get_corpus_index(database_paths)
+    assert sorted(index) == ['a', 'b', 'c', 'shared']
+    # the first release wins
+    assert index['shared'].database_path == database_paths[0]
+    assert index['c'].madcat_file_path == os.path.join(database_paths[1], 'madcat', 'c.madcat.xml')
+    assert index['c'].image_file_path == os.path.join(database_paths[1], 'images', 'c.tif')
+    assert index['c'].writing_condition == 'IUL'
+    assert sorted(filter_corpus_index(index, parse_writing_condition_filter('IUC'))) == \
+        ['a', 'b', 'shared']
+
+
+def test_corpus_index_file_is_rebuilt_on_change(tmp_path, monkeypatch):
+    database_paths = make_corpus(tmp_path)
+    index_path = str(tmp_path / 'out' / 'corpus_index.tsv')
+    builds = count_builds(monkeypatch)
+    index = get_corpus_index(database_paths, index_path)
+    assert get_corpus_index(database_paths, index_path) == index
+    assert len(builds) == 1
+
+    # a page added to a release
+    add_page(database_paths[1], 'd')
+    touch_later(os.path.join(database_paths[1], 'madcat'))
+    assert 'd' in get_corpus_index(database_paths, index_path)
+    assert len(builds) == 2
+    assert get_corpus_index(database_paths, index_path)['d'].database_path == database_paths[1]
+    assert len(builds) == 2
+
+    # an image converted to another format
+    os.remove(os.path.join(database_paths[0], 'images', 'a.tif'))
+    open(os.path.join(database_paths[0], 'images', 'a.png'), 'w').close()
+    touch_later(os.path.join(database_paths[0], 'images'))
+    assert get_corpus_index(database_paths, index_path)['a'].image_file_path.endswith('a.png')
+    assert len(builds) == 3
+
+    # a new writing_conditions.tab
+    writing_conditions = os.path.join(database_paths[1], 'docs', 'writing_conditions.tab')
+    with open(writing_conditions, 'w') as f:
+        f.write('c\tx\tx\tIUC\n')
+    touch_later(writing_conditions)
+    assert get_corpus_index(database_paths, index_path)['c'].writing_condition == 'IUC'
+    assert len(builds) == 4
+
+    # other releases
+    assert 'c' not in get_corpus_index(database_paths[:1], index_path)
+    assert len(builds) == 5
+
+    # an index file without stamps
+    with open(index_path, 'w') as f:
+        f.write('#database_paths\t{}\n'.format(database_paths[0]))
+    assert 'a' in get_corpus_index(database_paths[:1], index_path)
+    assert len(builds) == 6
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+
+# Copyright   2018 Ashish Arora
+# Apache 2.0
+
+""" Tests of gedi_zones: the columnar DL_ZONE reader and the line plan against
+ the minidom previous_line_id loop of the original scripts, on generated GEDI
+ pages, and the issues reported by the page validator.
+
+  Eg. python3 -m pytest -q test_gedi_zones.py
+"""
+
+import xml.dom.minidom as minidom
+import numpy as np
+from PIL import Image
+from gedi_zones import gedi_zones, get_line_plan, iter_line_images, read_gedi_zones, \
+    validate_gedi_file, validate_gedi_zones, write_validation_report
+
+
+def write_gedi_file(path, zones, page_size=None):
+    """ Given a file path and a list of (lineID, col, row, width, height),
+        writes a GEDI file with one DL_ZONE per entry and returns the path.
+    """
+    page_attributes = '' if page_size is None else ' width="{}" height="{}"'.format(*page_size)
+    nodes = ''.join('<DL_ZONE id="{}" lineID="{}" col="{}" row="{}" width="{}" height="{}"/>'
+                    .format(index, *zone) for index, zone in enumerate(zones))
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n<GEDI><DL_DOCUMENT><DL_PAGE{}>{}'
+                '</DL_PAGE></DL_DOCUMENT></GEDI>'.format(page_attributes, nodes))
+    return path
+
+
+def get_page_zones(rng, num_lines=6):
+    """ Given a random generator, returns the zones of a page whose lines
+        are contiguous in the document, with a few unlabeled zones.
+    """
+    zones = []
+    for line in range(1, num_lines + 1):
+        col = int(rng.integers(0, 50))
+        for _ in range(rng.integers(1, 9)):
+            if rng.random() < 0.1:
+                zones.append(('', int(rng.integers(0, 300)), int(rng.integers(0, 300)), 5, 5))
+            width, height = int(rng.integers(3, 30)), int(rng.integers(5, 40))
+            zones.append((str(line), col, 40 * line + int(rng.integers(-8, 8)), width, height))
+            col += width + int(rng.integers(0, 6))
+    return zones
+
+
+def merge_characters_into_line_image(region_list, offset_list, char_width_buffer,
+                                     char_height_buffer):
+    image_width = 0
+    image_height = -1
+    for x in region_list:
+        (width, height) = x.size
+        image_width += width + char_width_buffer
+        image_height = max(image_height, height)
+    image_height += char_height_buffer * 2
+
+    stitched_image = Image.new('RGB', (image_width, image_height), "white")
+    width_offset = 0
+    for i, x in enumerate(region_list):
+        height_offset = offset_list[i] + int(char_height_buffer)
+        stitched_image.paste(im=x, box=(width_offset, height_offset))
+        (width, height) = x.size
+        width_offset = width_offset + width + char_width_buffer
+    return stitched_image
+
+
+def get_reference_line_images(im, gedi_file_path, width_buffer, height_buffer,
+                              char_width_buffer, char_height_buffer):
+    """ Given a page image and its gedi file, returns the line images of the
+        previous_line_id loop of 11.py.
+    """
+    line_images = []
+    doc = minidom.parse(gedi_file_path)
+    height_offset_list, region_list = [], []
+    first_image_top_loc = -1
+    previous_line_id = None
+    for node in doc.getElementsByTagName('DL_ZONE'):
+        line_id = node.getAttribute('lineID')
+        if line_id == "":
+            continue
+        col = int(node.getAttribute('col'))
+        row = int(node.getAttribute('row'))
+        if previous_line_id != line_id:
+            if previous_line_id is not None:
+                line_images.append((previous_line_id, merge_characters_into_line_image(
+                    region_list, height_offset_list, char_width_buffer, char_height_buffer)))
+            first_image_top_loc = row
+            previous_line_id = line_id
+            region_list, height_offset_list = [], []
+        height_offset_list.append(row - first_image_top_loc)
+        col -= height_buffer
+        row -= width_buffer
+        width = int(node.getAttribute('width'))
+        height = int(node.getAttribute('height'))
+        region_list.append(im.crop((col, row, col + width + height_buffer,
+                                    row + height + width_buffer)))
+    line_images.append((previous_line_id, merge_characters_into_line_image(
+        region_list, height_offset_list, char_width_buffer, char_height_buffer)))
+    return line_images
+
+
+def test_read_gedi_zones_skips_unlabeled_zones(tmp_path):
+    zones = get_page_zones(np.random.default_rng(0))
+    columns = read_gedi_zones(write_gedi_file(str(tmp_path / 'page.gedi.xml'), zones))
+    labeled = [zone for zone in zones if zone[0] != '']
+    assert columns.line_ids.tolist() == [zone[0] for zone in labeled]
+    for index, column in enumerate((columns.col, columns.row, columns.width, columns.height)):
+        assert column.tolist() == [zone[index + 1] for zone in labeled]
+
+
+def test_line_images_match_original_loop(tmp_path):
+    rng = np.random.default_rng(2018)
+    im = Image.fromarray((rng.random((400, 300, 3)) * 255).astype(np.uint8))
+    for page_index, buffers in enumerate(((0, 0, 10, 20), (3, 2, 4, 6))):
+        zones = get_page_zones(rng)
+        gedi_file_path = write_gedi_file(str(tmp_path / '{}.gedi.xml'.format(page_index)), zones)
+        plan = get_line_plan(read_gedi_zones(gedi_file_path), *buffers)
+        reference = get_reference_line_images(im, gedi_file_path, *buffers)
+        line_images = list(iter_line_images(im, plan))
+        assert [line_id for line_id, _ in line_images] == [line_id for line_id, _ in reference]
+        for (_, line_image), (_, reference_image) in zip(line_images, reference):
+            assert line_image.size == reference_image.size
+            assert np.array_equal(np.asarray(line_image), np.asarray(reference_image))
+
+
+def test_line_plan_groups_interleaved_lines():
+    zones = gedi_zones(
+        line_ids=np.array(['2', '1', '2', '1', '3']), col=np.array([0, 10, 20, 30, 40]),
+        row=np.array([5, 6, 7, 8, 9]), width=np.array([1, 2, 3, 4, 5]),
+        height=np.array([1, 1, 1, 1, 1]))
+    plan = get_line_plan(zones, char_width_buffer=0, char_height_buffer=0)
+    assert plan.line_ids.tolist() == ['2', '1', '3']
+    assert plan.line_offsets.tolist() == [0, 2, 4, 5]
+    assert plan.zone_index.tolist() == [0, 2, 1, 3, 4]
+    assert plan.paste_points.tolist() == [[0, 0], [1, 2], [0, 0], [2, 2], [0, 0]]
+    assert plan.image_sizes.tolist() == [[4, 1], [6, 1], [5, 1]]
+
+
+def validate(zones, page_size=None):
+    return validate_gedi_zones(gedi_zones(
+        line_ids=np.array([zone[0] for zone in zones], dtype=np.str_),
+        col=np.array([zone[1] for zone in zones], dtype=np.int64),
+        row=np.array([zone[2] for zone in zones], dtype=np.int64),
+        width=np.array([zone[3] for zone in zones], dtype=np.int64),
+        height=np.array([zone[4] for zone in zones], dtype=np.int64)), page_size)
+
+
+def test_validate_gedi_zones_reports_issues():
+    good = [('1', 0, 0, 5, 5), ('1', 5, 0, 5, 5), ('2', 0, 10, 5, 5), ('3', 0, 20, 5, 5)]
+    result = validate(good, (100, 100))
+    assert result.is_valid and result.issues == []
+    assert (result.num_zones, result.num_lines) == (4, 3)
+
+    result = validate(good + [('', 0, 0, 5, 5)])
+    assert result.is_valid and result.issues == ['warning: 1 zones without lineID']
+
+    result = validate([('1', 0, 0, 5, 5), ('3', 0, 0, 5, 5), ('4', 0, 0, 5, 5)])
+    assert not result.is_valid
+    assert result.issues == ['lineID not contiguous, 3 ids in range 1-4']
+
+    result = validate([('1', 0, 0, 5, 5), ('2', 0, 0, 5, 5), ('1', 0, 0, 5, 5)])
+    assert result.issues == ['characters of a line are not contiguous, 3 runs for 2 lines']
+
+    result = validate([('1', 0, 0, 0, 5), ('1', 0, 0, 5, -1), ('2', 0, 0, 5, 5)])
+    assert result.issues == ['2 zones with zero size']
+
+    result = validate([('1', -1, 0, 5, 5), ('1', 96, 0, 5, 5), ('2', 0, 95, 5, 5)], (100, 100))
+    assert result.issues == ['2 zones outside the 100x100 page']
+
+    result = validate([('a', 0, 0, 5, 5)])
+    assert not result.is_valid and result.issues == ['non integer lineID']
+
+    result = validate([('', 0, 0, 5, 5)])
+    assert not result.is_valid
+    assert result.issues == ['warning: 1 zones without lineID', 'no zone with lineID']
+
+
+def test_validate_gedi_file_and_report(tmp_path):
+    image_file_path = str(tmp_path / 'page.png')
+    Image.new('L', (50, 40), 'white').save(image_file_path)
+    zones = [('1', 0, 0, 5, 5), ('2', 45, 30, 10, 5)]
+    gedi_file_paths = [write_gedi_file(str(tmp_path / 'a.gedi.xml'), zones, (100, 100)),
+                       write_gedi_file(str(tmp_path / 'b.gedi.xml'), zones)]
+    broken_file_path = str(tmp_path / 'c.gedi.xml')
+    with open(broken_file_path, 'w') as f:
+        f.write('<GEDI><DL_PAGE>')
+    results = [(path, validate_gedi_file(path, image_file_path))
+               for path in gedi_file_paths + [broken_file_path]]
+    # the page size of DL_PAGE comes first, then the image header
+    assert results[0][1].is_valid
+    assert results[1][1].issues == ['1 zones outside the 50x40 page']
+    assert not results[2][1].is_valid and results[2][1].issues[0].startswith('unreadable: ')
+
+    report_file = str(tmp_path / 'report.txt')
+    write_validation_report(results, report_file)
+    with open(report_file, encoding='utf-8') as f:
+        lines = [line.rstrip('\n').split('\t') for line in f]
+    assert [line[:4] for line in lines] == [[gedi_file_paths[0], 'ok', '2', '2'],
+                                            [gedi_file_paths[1], 'corrupt', '2', '2'],
+                                            [broken_file_path, 'corrupt', '0', '0']]
+    assert lines[1][4] == '1 zones outside the 50x40 page'
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+
+# Copyright   2018 Ashish Arora
+# Apache 2.0
+
+""" Tests of image_size: the size read from the TIFF and PNG headers against
+ PIL on images of several sizes, modes and compressions, the PIL fallback of
+ other formats, and the reuse of ImageSizeCache entries.
+
+  Eg. python3 -m pytest -q test_image_size.py
+"""
+
+import os
+import struct
+import pytest
+from PIL import Image
+import image_size
+from image_size import ImageSizeCache, get_image_size
+
+_sizes = [(1, 1), (7, 3), (300, 2000), (65535, 2), (70000, 1)]
+
+
+def get_header_size(image_file_path, monkeypatch):
+    """ Given an image file, returns its size from get_image_size with
+        Image.open disabled, so that the size comes from the header reader.
+    """
+    def open_image(*args, **kwargs):
+        raise AssertionError('the image was opened by PIL')
+    with monkeypatch.context() as patch:
+        patch.setattr(image_size.Image, 'open', open_image)
+        return get_image_size(image_file_path)
+
+
+@pytest.mark.parametrize('mode', ['1', 'L', 'RGB', 'I;16'])
+@pytest.mark.parametrize('size', _sizes)
+def test_png_size(tmp_path, monkeypatch, mode, size):
+    image_file_path = str(tmp_path / 'image.png')
+    Image.new(mode, size).save(image_file_path)
+    assert get_header_size(image_file_path, monkeypatch) == size
+
+
+@pytest.mark.parametrize('save_args', [dict(), dict(compression='group4'),
+                                       dict(compression='tiff_lzw'), dict(big_tiff=True)])
+@pytest.mark.parametrize('mode', ['1', 'L', 'RGB'])
+@pytest.mark.parametrize('size', _sizes)
+def test_tiff_size(tmp_path, monkeypatch, mode, size, save_args):
+    if save_args.get('compression') == 'group4' and mode != '1':
+        pytest.skip('group4 compression is only for bilevel images')
+    image_file_path = str(tmp_path / 'image.tif')
+    Image.new(mode, size).save(image_file_path, **save_args)
+    assert get_header_size(image_file_path, monkeypatch) == size
+    with Image.open(image_file_path) as im:
+        assert im.size == size
+
+
+def write_big_endian_tiff(path, width, height, width_type):
+    """ Given a file path, the image size and the TIFF field type of
+        ImageWidth, writes the header and first image file directory of a
+        big endian TIFF, with the size entries after another tag.
+    """
+    value_formats = {3: '>HH', 4: '>I'}
+    entries = [struct.pack('>HHI', 254, 4, 1) + struct.pack('>I', 0),
+               struct.pack('>HHI', 256, width_type, 1) +
+               struct.pack(value_formats[width_type], *((width, 0) if width_type == 3 else (width,))),
+               struct.pack('>HHI', 257, 3, 1) + struct.pack('>HH', height, 0)]
+    with open(path, 'wb') as f:
+        f.write(b'MM' + struct.pack('>HI', 42, 8) + struct.pack('>H', len(entries)) +
+                b''.join(entries) + struct.pack('>I', 0))
+    return path
+
+
+@pytest.mark.parametrize('width_type', [3, 4])
+def test_big_endian_tiff_size(tmp_path, monkeypatch, width_type):
+    image_file_path = write_big_endian_tiff(str(tmp_path / 'image.tif'), 1234, 567, width_type)
+    assert get_header_size(image_file_path, monkeypatch) == (1234, 567)
+
+
+@pytest.mark.parametrize('extension', ['.jpg', '.bmp', '.gif'])
+def test_other_formats_fall_back_to_pil(tmp_path, extension):
+    image_file_path = str(tmp_path / ('image' + extension))
+    Image.new('RGB', (33, 44)).save(image_file_path)
+    assert get_image_size(image_file_path) == (33, 44)
+
+
+def count_reads(monkeypatch):
+    reads = []
+
+    def read(image_file_path):
+        reads.append(image_file_path)
+        with Image.open(image_file_path) as im:
+            return im.size
+    monkeypatch.setattr(image_size, 'get_image_size', read)
+    return reads
+
+
+def test_image_size_cache(tmp_path, monkeypatch):
+    image_file_paths = [str(tmp_path / '{}.png'.format(index)) for index in range(3)]
+    for index, image_file_path in enumerate(image_file_paths):
+        Image.new('L', (10 + index, 20)).save(image_file_path)
+    cache_file = str(tmp_path / 'cache' / 'image_sizes.tsv')
+    reads = count_reads(monkeypatch)
+    cache = ImageSizeCache(cache_file)
+    assert [cache.get(path) for path in image_file_paths] == [(10, 20), (11, 20), (12, 20)]
+    assert [cache.get(path) for path in image_file_paths] == [(10, 20), (11, 20), (12, 20)]
+    assert len(reads) == 3
+    cache.save()
+
+    cache = ImageSizeCache(cache_file)
+    assert len(cache) == 3
+    assert cache.get(image_file_paths[1]) == (11, 20)
+    assert len(reads) == 3
+    # nothing new to write
+    os.remove(cache_file)
+    cache.save()
+    assert not os.path.exists(cache_file)
+
+    # a new image at the same path
+    stat = os.stat(image_file_paths[1])
+    Image.new('L', (40, 50)).save(image_file_paths[1])
+    os.utime(image_file_paths[1], ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    assert cache.get(image_file_paths[1]) == (40, 50)
+    assert len(reads) == 4
+    cache.save()
+    assert ImageSizeCache(cache_file).get(image_file_paths[1]) == (40, 50)
+    assert len(reads) == 4
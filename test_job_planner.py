@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+
+# Copyright   2018 Ashish Arora
+# Apache 2.0
+
+""" Tests of job_planner: pages of an unsorted split file are read once, the
+ shards are balanced as the greedy reference assigns them, and every line of
+ the split file is written to exactly one shard.
+
+  Eg. python3 -m pytest -q test_job_planner.py
+"""
+
+import os
+import sys
+import numpy as np
+from PIL import Image
+import job_planner
+from job_planner import get_balanced_shards, get_page_cost, get_split_base_name, read_split_file
+from test_madcat_xml import write_madcat_file
+
+
+def write_split_file(path, lines):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(''.join(line + '\n' for line in lines))
+    return path
+
+
+def test_read_split_file_keeps_pages_once(tmp_path):
+    lines = ['a.madcat.xml 0', 'b.madcat.xml 0', 'a.madcat.xml 1', '', 'c.madcat.xml 0',
+             'b.madcat.xml 1']
+    page_lines = read_split_file(write_split_file(str(tmp_path / 'split'), lines))
+    assert list(page_lines) == ['a', 'b', 'c']
+    assert page_lines['a'] == ['a.madcat.xml 0', 'a.madcat.xml 1']
+    assert page_lines['b'] == ['b.madcat.xml 0', 'b.madcat.xml 1']
+
+
+def get_reference_shards(costs, num_shards):
+    """ Given the cost of each page, returns the shards of the greedy
+        assignment with a linear search for the cheapest shard, ties to the
+        lower shard.
+    """
+    shards = [[] for _ in range(num_shards)]
+    shard_costs = [0.0] * num_shards
+    for index in sorted(range(len(costs)), key=lambda i: costs[i], reverse=True):
+        shard = min(range(num_shards), key=lambda s: (shard_costs[s], s))
+        shards[shard].append(index)
+        shard_costs[shard] += costs[index]
+    return [sorted(shard) for shard in shards], shard_costs
+
+
+def test_balanced_shards_match_reference():
+    rng = np.random.default_rng(2018)
+    for num_pages, num_shards in ((0, 3), (2, 5), (17, 1), (100, 7), (1000, 30)):
+        costs = rng.integers(1, 50, size=num_pages).astype(float).tolist()
+        shards, shard_costs = get_balanced_shards(costs, num_shards)
+        assert (shards, shard_costs) == get_reference_shards(costs, num_shards)
+        assert sorted(index for shard in shards for index in shard) == list(range(num_pages))
+        if num_pages >= num_shards:
+            # greedy assignment is within the largest page cost of the mean
+            assert max(shard_costs) - sum(costs) / num_shards <= max(costs)
+
+
+def make_corpus(tmp_path, rng, base_names):
+    database_path = str(tmp_path / 'LDC2012T15')
+    os.makedirs(os.path.join(database_path, 'madcat'))
+    os.makedirs(os.path.join(database_path, 'images'))
+    for base_name in base_names:
+        write_madcat_file(os.path.join(database_path, 'madcat', base_name + '.madcat.xml'), rng,
+                          num_zones=int(rng.integers(1, 20)))
+        Image.new('L', (int(rng.integers(100, 2000)), int(rng.integers(100, 2000)))).save(
+            os.path.join(database_path, 'images', base_name + '.png'))
+    return database_path
+
+
+def test_page_cost(tmp_path):
+    database_path = make_corpus(tmp_path, np.random.default_rng(0), ['a'])
+    madcat_file_path = os.path.join(database_path, 'madcat', 'a.madcat.xml')
+    image_file_path = os.path.join(database_path, 'images', 'a.png')
+    num_zones, width, height, cost = get_page_cost(madcat_file_path, image_file_path, 1.0, 2.0)
+    with Image.open(image_file_path) as im:
+        assert (width, height) == im.size
+    assert cost == num_zones + 2.0 * width * height / 1e6
+    assert get_page_cost(madcat_file_path, image_file_path + '.missing', 3.0, 2.0) == \
+        (num_zones, 0, 0, 3.0 * num_zones)
+
+
+def test_every_line_in_one_shard(tmp_path, monkeypatch):
+    rng = np.random.default_rng(2018)
+    base_names = ['page{}'.format(index) for index in range(12)]
+    database_path = make_corpus(tmp_path, rng, base_names)
+    lines = ['{}.madcat.xml {:04d}'.format(base_names[rng.integers(0, 12)], index)
+             for index in range(60)]
+    lines += ['missing.madcat.xml 0001']
+    data_splits = write_split_file(str(tmp_path / 'madcat.train.raw.lineid'), lines)
+    out_dir = str(tmp_path / 'split')
+    monkeypatch.setattr(sys, 'argv', ['job_planner.py', data_splits, out_dir, '4', database_path])
+    job_planner.main()
+
+    with open(os.path.join(out_dir, 'pages.txt'), encoding='utf-8') as f:
+        manifest = [line.split(' ') for line in f]
+    page_lines = read_split_file(data_splits)
+    assert [page[0] for page in manifest] == [base_name for base_name in page_lines
+                                              if base_name != 'missing']
+    shard_lines = []
+    for shard in range(1, 5):
+        with open(os.path.join(out_dir, 'madcat.train.raw.lineid.{}'.format(shard)),
+                  encoding='utf-8') as f:
+            shard_lines.append([line.rstrip('\n') for line in f])
+    assert sorted(line for split_lines in shard_lines for line in split_lines) == \
+        sorted(line for line in lines if not line.startswith('missing'))
+    # the lines of a page are in one shard
+    shard_pages = [{get_split_base_name(line) for line in split_lines} for split_lines in shard_lines]
+    assert sum(len(pages) for pages in shard_pages) == len(manifest)
+    assert os.path.isdir(os.path.join(out_dir, 'madcat_cache'))
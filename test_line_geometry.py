@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+
+# Copyright   2018 Ashish Arora
+# Apache 2.0
+
+""" Tests of the incremental hull and bounding box of LineGeometry against a
+ full recompute after every edit of a line.
+
+  Eg. python3 -m pytest -q test_line_geometry.py
+"""
+
+import numpy as np
+import pytest
+from bounding_box_utils import minimum_bounding_box
+from line_geometry import LineGeometry
+from test_bounding_box_utils import assert_same_bounding_box_tuple, assert_same_rectangle, \
+    has_unique_minimum
+
+
+def get_word_points(rng, position):
+    """ Given a random generator and a position along the line, returns the
+        4 integer corners of a word box near it.
+    """
+    x = position + rng.integers(-20, 20)
+    y = 100 + rng.integers(-15, 15)
+    width, height = rng.integers(1, 80), rng.integers(1, 40)
+    return [(x, y), (x + width, y), (x + width, y + height), (x, y + height)]
+
+
+def assert_same_as_full_recompute(line):
+    full = LineGeometry(dict(line._word_points))
+    assert np.array_equal(line.hull, full.hull)
+    bounding_box = line.bounding_box
+    assert_same_bounding_box_tuple(bounding_box, full.bounding_box)
+    points = line.points
+    reference = minimum_bounding_box([tuple(point) for point in points.tolist()])
+    assert_same_rectangle(bounding_box, reference, has_unique_minimum(points))
+
+
+def test_line_geometry_matches_full_recompute():
+    rng = np.random.default_rng(2018)
+    for _ in range(20):
+        line = LineGeometry()
+        next_word = 0
+        for _ in range(60):
+            word_ids = sorted(line._word_points)
+            action = rng.integers(0, 3) if len(word_ids) > 2 else 0
+            if action == 0:
+                line.add_word('w{}'.format(next_word), get_word_points(rng, 30 * next_word))
+                next_word += 1
+            elif action == 1:
+                line.remove_word(word_ids[rng.integers(0, len(word_ids))])
+            else:
+                word_id = word_ids[rng.integers(0, len(word_ids))]
+                line.move_word(word_id, get_word_points(rng, rng.integers(0, 30 * next_word + 1)))
+            if len(line.points) > 2 and np.linalg.matrix_rank(line.points - line.points[0]) == 2:
+                assert_same_as_full_recompute(line)
+
+
+def test_line_geometry_shared_corners():
+    line = LineGeometry({'a': [(0, 0), (10, 0), (10, 5), (0, 5)],
+                         'b': [(10, 0), (20, 0), (20, 5), (10, 5)],
+                         'c': [(20, 0), (30, 0), (30, 5), (20, 5)]})
+    assert line.bounding_box.area == 150
+    # the corners of b are shared with a and c, the hull does not change
+    line.remove_word('b')
+    assert line._hull is not None
+    assert sorted(map(tuple, line.hull.tolist())) == [(0, 0), (0, 5), (30, 0), (30, 5)]
+    line.remove_word('c')
+    assert line._hull is None
+    assert line.bounding_box.area == 50
+    assert 'c' not in line and len(line) == 1
+    line.remove_word('a')
+    with pytest.raises(ValueError):
+        line.hull
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+
+# Copyright   2018 Ashish Arora
+# Apache 2.0
+
+""" Tests of line_shards: the shards written for a set of pages are read back
+ by load_shard_annotations as the annotation of each page, and the text file
+ has the transcription of each line.
+
+  Eg. python3 -m pytest -q test_line_shards.py
+"""
+
+import os
+import numpy as np
+from line_shards import get_page_lines, load_line_shard, load_shard_annotations, write_shard
+from madcat_xml import get_line_text, read_madcat_annotation
+from test_madcat_xml import write_madcat_file
+
+
+def write_shards(shard_dir, pages, num_shards, cache_dir=None):
+    """ Given a directory, a list of (base name, madcat xml file) and a
+        number of shards, writes the shards as line_shards.py does and
+        returns the number of lines of each.
+    """
+    num_lines = []
+    for shard in range(num_shards):
+        num_lines.append(write_shard((os.path.join(shard_dir, 'text.{}'.format(shard)),
+                                      os.path.join(shard_dir, 'lines.{}.npz'.format(shard)),
+                                      pages[shard::num_shards], cache_dir)))
+    return num_lines
+
+
+def test_shard_annotations_round_trip(tmp_path):
+    rng = np.random.default_rng(2018)
+    pages = []
+    for page_index in range(7):
+        base_name = 'page{}'.format(page_index)
+        pages.append((base_name, write_madcat_file(
+            str(tmp_path / (base_name + '.madcat.xml')), rng, num_zones=int(rng.integers(1, 9)))))
+    shard_dir = str(tmp_path / 'shards')
+    os.makedirs(shard_dir)
+    # more shards than pages, the last shard is empty
+    num_lines = write_shards(shard_dir, pages, 8, str(tmp_path / 'cache'))
+    assert num_lines[-1] == 0
+    assert len(load_line_shard(os.path.join(shard_dir, 'lines.7.npz')).points) == 0
+
+    annotations = load_shard_annotations(shard_dir)
+    assert sorted(annotations) == [base_name for base_name, _ in pages]
+    for base_name, madcat_file_path in pages:
+        reference = read_madcat_annotation(madcat_file_path)
+        annotation = annotations[base_name]
+        for name in ('zone_ids', 'zone_word_offsets', 'word_ids', 'word_point_offsets',
+                     'points'):
+            assert np.array_equal(getattr(annotation, name), getattr(reference, name))
+        assert annotation.points.dtype == np.int32
+        assert len(annotation.token_ref_ids) == 0 and len(annotation.token_text) == 0
+
+    text = dict()
+    for shard in range(8):
+        with open(os.path.join(shard_dir, 'text.{}'.format(shard)), encoding='utf-8') as f:
+            for line in f:
+                name, line_text = line.rstrip('\n').split(' ', 1)
+                text[name] = line_text
+    reference_text = dict()
+    for base_name, madcat_file_path in pages:
+        annotation = read_madcat_annotation(madcat_file_path)
+        for name, zone_id, _, _, _, _ in get_page_lines(base_name, annotation):
+            reference_text[name] = get_line_text(annotation)[zone_id]
+    assert text == reference_text
+    assert sum(num_lines) == len(reference_text)
+
+
+def test_lines_without_transcription_keep_their_geometry(tmp_path):
+    madcat_file_path = str(tmp_path / 'page.madcat.xml')
+    with open(madcat_file_path, 'w', encoding='utf-8') as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n<madcat><document id="page">'
+                '<page id="p1"><zone id="1"><token-image id="w1"><point x="1" y="2"/>'
+                '<point x="3" y="4"/><point x="5" y="2"/></token-image></zone>'
+                '<zone id="2"><token-image id="w2"><point x="6" y="7"/><point x="8" y="9"/>'
+                '<point x="9" y="7"/></token-image></zone></page>'
+                '<segment id="s1"><token id="t1" ref_id="w2"><source>word</source></token>'
+                '</segment></document></madcat>')
+    shard_dir = str(tmp_path)
+    assert write_shards(shard_dir, [('page', madcat_file_path)], 1) == [2]
+    with open(os.path.join(shard_dir, 'text.0'), encoding='utf-8') as f:
+        assert f.read() == 'page_0002 word\n'
+    shard = load_line_shard(os.path.join(shard_dir, 'lines.0.npz'))
+    assert shard.line_names.tolist() == ['page_0001', 'page_0002']
+    assert shard.line_text.tolist() == ['', 'word']
+    annotation = load_shard_annotations(shard_dir)['page']
+    assert annotation.zone_ids.tolist() == ['1', '2']
+    assert annotation.points.tolist() == [[1, 2], [3, 4], [5, 2], [6, 7], [8, 9], [9, 7]]
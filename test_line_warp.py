@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+
+# Copyright   2018 Ashish Arora
+# Apache 2.0
+
+""" Equivalence tests of line_warp against the page rotation it replaces:
+ rotate of skimage followed by numpy slicing, and Image.rotate of PIL
+ followed by crop, on random pages, with boxes inside the page and boxes
+ that extend past it.
+
+  Eg. python3 -m pytest -q test_line_warp.py
+"""
+
+from math import degrees
+
+import numpy as np
+import pytest
+from PIL import Image
+from skimage.transform import rotate
+from bounding_box_utils import minimum_bounding_box_vectorized
+from line_warp import clip_to_image_range, get_deskewed_lines, get_rotated_crop, get_white_value
+
+angles = [0.013, -0.3, 1.2]
+pil_filters = [(0, Image.NEAREST), (1, Image.BILINEAR), (3, Image.BICUBIC)]
+
+
+def get_pages():
+    """ Returns a grey level page of noise and a bilevel page of 8 bit
+        pixels, of odd and even sizes.
+    """
+    rng = np.random.default_rng(2018)
+    noise = (rng.random((203, 301)) * 255).astype(np.uint8)
+    bilevel = np.where(rng.random((240, 170)) < 0.3, 0, 255).astype(np.uint8)
+    return [noise, bilevel]
+
+
+def get_boxes(page):
+    height, width = page.shape
+    return [(0, 0, width, height), (40, 30, width - 50, height - 20),
+            (-20, -15, width + 19, height + 37)]
+
+
+def get_line_boxes(angle):
+    """ Given a skew angle, returns the minimum bounding boxes of a few lines
+        written with that skew, two of them running off the page.
+    """
+    direction = np.array([np.cos(angle), np.sin(angle)])
+    normal = np.array([-direction[1], direction[0]])
+    bounding_boxes = []
+    for origin in ((-10, 20), (30, 80), (60, 150), (200, 190)):
+        corners = [np.array(origin) + along * direction + across * normal
+                   for along, across in ((0, 0), (180, 0), (180, 25), (0, 25))]
+        bounding_boxes.append(minimum_bounding_box_vectorized(np.rint(corners)))
+    return bounding_boxes
+
+
+@pytest.mark.parametrize('order', [0, 1, 3])
+def test_rotated_crop_matches_skimage(order):
+    for page in get_pages():
+        image = page / 255.0
+        for angle in angles:
+            rotated_page = rotate(image, degrees(angle), order=order)
+            for min_x, min_y, max_x, max_y in get_boxes(page):
+                reference = rotated_page[max(min_y, 0):max_y, max(min_x, 0):max_x]
+                region = get_rotated_crop(image, angle, (min_x, min_y, max_x, max_y), order)
+                region = clip_to_image_range(region, image)
+                assert region.shape == reference.shape
+                assert np.allclose(region, reference, rtol=0, atol=1e-12)
+
+
+@pytest.mark.parametrize('order, pil_filter', pil_filters)
+def test_rotated_crop_matches_pil(order, pil_filter):
+    for page in get_pages():
+        for angle in angles:
+            rotated_page = Image.fromarray(page).rotate(degrees(angle), resample=pil_filter)
+            for box in get_boxes(page):
+                reference = np.asarray(rotated_page.crop(box))
+                region = get_rotated_crop(page, angle, box, order, clip_box=False, pil=True)
+                region = np.clip(region, 0, 255).astype(np.uint8)
+                assert np.array_equal(region, reference)
+
+
+def test_rotated_crop_past_the_page_gets_cval():
+    page = get_pages()[0]
+    height, width = page.shape
+    region = get_rotated_crop(page, 0.0, (-3, -2, width + 4, height + 5), 1, cval=7.0,
+                              clip_box=False)
+    assert region.shape == (height + 7, width + 7)
+    assert (region[:2] == 7).all() and (region[-5:] == 7).all()
+    assert (region[:, :3] == 7).all() and (region[:, -4:] == 7).all()
+    assert np.allclose(region[2:-5, 3:-4], page)
+
+
+@pytest.mark.parametrize('center', [None, (150, 101)])
+def test_deskewed_lines_page_rotation_matches_line_warp(center):
+    image = get_pages()[0] / 255.0
+    bounding_boxes = get_line_boxes(-0.05)
+    # the smaller angle of each box, which is the same for all the lines
+    angles = [-0.05] * len(bounding_boxes)
+
+    def rotate_page(angle):
+        return rotate(image, degrees(angle), order=3, preserve_range=True, clip=False)
+    fast_regions, is_fast = get_deskewed_lines(image, bounding_boxes, angles, 0.01, rotate_page,
+                                               center=center)
+    slow_regions, is_slow = get_deskewed_lines(image, bounding_boxes, angles, -1, rotate_page,
+                                               center=center)
+    assert is_fast.all() and not is_slow.any()
+    for fast_region, slow_region in zip(fast_regions, slow_regions):
+        assert fast_region.shape == slow_region.shape
+        assert np.allclose(fast_region, slow_region, rtol=0, atol=1e-12)
+
+
+def test_white_value():
+    assert get_white_value(np.zeros((2, 2), dtype=np.uint8)) == 255
+    assert get_white_value(np.zeros((2, 2), dtype=np.float64)) == 1.0
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+
+# Copyright   2018 Ashish Arora
+# Apache 2.0
+
+""" Tests of the madcat_cache sidecars: they are reused while the xml file is
+ unchanged, rebuilt when its mtime or size changes or when they cannot be
+ read, and never written next to the xml file.
+
+  Eg. python3 -m pytest -q test_madcat_cache.py
+"""
+
+import os
+import numpy as np
+import madcat_cache
+from madcat_cache import get_cache_dir, get_sidecar_path, load_madcat_annotation
+from madcat_xml import read_madcat_annotation
+from test_madcat_xml import write_madcat_file
+
+
+def assert_same_annotation(annotation, reference):
+    for name in reference._fields:
+        assert np.array_equal(getattr(annotation, name), getattr(reference, name))
+
+
+def count_parses(monkeypatch):
+    """ Given the pytest monkeypatch fixture, counts the xml parses of
+        madcat_cache in the returned list.
+    """
+    parses = []
+
+    def read(madcat_file_path):
+        parses.append(madcat_file_path)
+        return read_madcat_annotation(madcat_file_path)
+    monkeypatch.setattr(madcat_cache, 'read_madcat_annotation', read)
+    return parses
+
+
+def test_sidecar_is_reused_until_the_xml_file_changes(tmp_path, monkeypatch):
+    madcat_file_path = write_madcat_file(str(tmp_path / 'page.madcat.xml'),
+                                         np.random.default_rng(0))
+    cache_dir = str(tmp_path / 'cache')
+    parses = count_parses(monkeypatch)
+    reference = read_madcat_annotation(madcat_file_path)
+    for _ in range(3):
+        assert_same_annotation(load_madcat_annotation(madcat_file_path, cache_dir), reference)
+    assert len(parses) == 1
+    assert os.path.exists(get_sidecar_path(madcat_file_path, cache_dir))
+
+    # same size, new mtime
+    stat = os.stat(madcat_file_path)
+    os.utime(madcat_file_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    load_madcat_annotation(madcat_file_path, cache_dir)
+    assert len(parses) == 2
+    load_madcat_annotation(madcat_file_path, cache_dir)
+    assert len(parses) == 2
+
+    # new size, same mtime
+    stat = os.stat(madcat_file_path)
+    write_madcat_file(madcat_file_path, np.random.default_rng(1))
+    os.utime(madcat_file_path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    assert os.stat(madcat_file_path).st_size != stat.st_size
+    assert_same_annotation(load_madcat_annotation(madcat_file_path, cache_dir),
+                           read_madcat_annotation(madcat_file_path))
+    assert len(parses) == 3
+
+
+def test_unreadable_sidecar_is_rebuilt(tmp_path, monkeypatch):
+    madcat_file_path = write_madcat_file(str(tmp_path / 'page.madcat.xml'),
+                                         np.random.default_rng(0))
+    cache_dir = str(tmp_path / 'cache')
+    reference = load_madcat_annotation(madcat_file_path, cache_dir)
+    sidecar_path = get_sidecar_path(madcat_file_path, cache_dir)
+    with open(sidecar_path, 'rb') as f:
+        sidecar = f.read()
+    parses = count_parses(monkeypatch)
+    for broken_sidecar in (b'', b'not a zip file', sidecar[:len(sidecar) // 2], sidecar[:-10],
+                           sidecar[:100] + b'\x00' * 50 + sidecar[150:]):
+        with open(sidecar_path, 'wb') as f:
+            f.write(broken_sidecar)
+        assert_same_annotation(load_madcat_annotation(madcat_file_path, cache_dir), reference)
+        with open(sidecar_path, 'rb') as f:
+            assert f.read() == sidecar
+    assert len(parses) == 5
+
+
+def test_no_sidecar_next_to_the_xml_file(tmp_path):
+    madcat_file_path = write_madcat_file(str(tmp_path / 'page.madcat.xml'),
+                                         np.random.default_rng(0))
+    load_madcat_annotation(madcat_file_path)
+    assert os.listdir(str(tmp_path)) == ['page.madcat.xml']
+    assert get_cache_dir(None, 'out') == os.path.join('out', 'madcat_cache')
+    assert get_cache_dir('cache', 'out') == 'cache'
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+
+# Copyright   2018 Ashish Arora
+# Apache 2.0
+
+""" Equivalence tests of the iterparse reader of madcat_xml against the
+ minidom parse of the original scripts, on generated MADCAT pages.
+
+  Eg. python3 -m pytest -q test_madcat_xml.py
+"""
+
+import xml.dom.minidom as minidom
+import numpy as np
+from madcat_xml import _iterparse_detached, get_line_text, get_word_line_mapping, \
+    iter_annotation_zones, read_madcat_annotation
+
+
+def write_madcat_file(path, rng, num_zones=12):
+    """ Given a file path and a random generator, writes a MADCAT page with
+        num_zones zones of random words and a segment of tokens that refer
+        to the words, and returns the path.
+    """
+    zones, tokens = [], []
+    for zone_index in range(num_zones):
+        words = []
+        for word_index in range(rng.integers(1, 8)):
+            word_id = 'w{}_{}'.format(zone_index, word_index)
+            points = ''.join('<point x="{}" y="{}"/>'.format(x, y)
+                             for x, y in rng.integers(0, 5000, size=(rng.integers(3, 6), 2)))
+            words.append('<token-image id="{}">{}</token-image>'.format(word_id, points))
+            tokens.append('<token id="t{}" ref_id="{}"><source>{}</source></token>'.format(
+                len(tokens), word_id, 'word{}'.format(rng.integers(0, 100))))
+        zones.append('<zone id="z{}">{}</zone>'.format(zone_index, ''.join(words)))
+    with open(path, 'w', encoding='utf-8') as fh:
+        fh.write('<?xml version="1.0" encoding="UTF-8"?>\n'
+                 '<madcat><document id="page"><page id="p1">{}</page>'
+                 '<segment id="s1">{}</segment></document></madcat>'.format(''.join(zones),
+                                                                           ''.join(tokens)))
+    return path
+
+
+def read_with_minidom(madcat_file_path):
+    """ Given a madcat xml file, returns the zones, with the word ids and word
+        corner points of each, and the tokens as read by the original scripts.
+    """
+    doc = minidom.parse(madcat_file_path)
+    zones = []
+    for node in doc.getElementsByTagName('zone'):
+        word_ids, points = [], []
+        for token_node in node.getElementsByTagName('token-image'):
+            word_ids.append(token_node.getAttribute('id'))
+            for word_node in token_node.getElementsByTagName('point'):
+                points.append((int(word_node.getAttribute('x')), int(word_node.getAttribute('y'))))
+        zones.append((node.getAttribute('id'), word_ids, points))
+    tokens = [(tnode.getAttribute('ref_id'),
+               tnode.getElementsByTagName('source')[0].firstChild.nodeValue)
+              for tnode in doc.getElementsByTagName('token')]
+    return zones, tokens
+
+
+def test_read_madcat_annotation_matches_minidom(tmp_path):
+    rng = np.random.default_rng(2018)
+    for page_index in range(5):
+        madcat_file_path = write_madcat_file(str(tmp_path / '{}.madcat.xml'.format(page_index)), rng)
+        zones, tokens = read_with_minidom(madcat_file_path)
+        annotation = read_madcat_annotation(madcat_file_path)
+        read_zones = list(iter_annotation_zones(annotation))
+        assert [zone_id for zone_id, _ in read_zones] == [zone_id for zone_id, _, _ in zones]
+        for (_, points), (_, _, reference_points) in zip(read_zones, zones):
+            assert points.dtype == np.int32
+            assert points.tolist() == [list(point) for point in reference_points]
+        line_word_dict, _ = get_word_line_mapping(annotation)
+        assert line_word_dict == {zone_id: word_ids for zone_id, word_ids, _ in zones}
+        assert list(zip(annotation.token_ref_ids.tolist(), annotation.token_text.tolist())) == tokens
+        word_line_dict = {word_id: zone_id for zone_id, word_ids, _ in zones for word_id in word_ids}
+        reference_text = dict()
+        for ref_word_id, word in tokens:
+            reference_text.setdefault(word_line_dict[ref_word_id], []).append(word)
+        assert get_line_text(annotation) == {line_id: ' '.join(words)
+                                             for line_id, words in reference_text.items()}
+
+
+def test_read_elements_are_removed_from_the_tree(tmp_path):
+    madcat_file_path = write_madcat_file(str(tmp_path / 'page.madcat.xml'),
+                                         np.random.default_rng(0), num_zones=30)
+    page = None
+    read_zones = []
+    for event, elem in _iterparse_detached(madcat_file_path, events=('start', 'end')):
+        if event == 'start' and elem.tag == 'page':
+            page = elem
+        elif event == 'end' and elem.tag == 'zone':
+            # the page keeps the zone being read and the zones the parser has
+            # read ahead, not the zones already read, and the words of the
+            # zone were removed at their own end events
+            assert page[0] is elem
+            assert not any(zone is child for zone in read_zones for child in page)
+            assert len(elem) == 0
+            read_zones.append(elem)
+    assert len(read_zones) == 30 and len(page) == 0
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+
+# Copyright   2018 Ashish Arora
+# Apache 2.0
+
+""" Tests of page_model: the xml file and image header are read only on first
+ access and once until invalidate, and the lines, bounding boxes and angles
+ computed for the whole page match the per line functions.
+
+  Eg. python3 -m pytest -q test_page_model.py
+"""
+
+import numpy as np
+from PIL import Image
+import page_model
+from bounding_box_utils import get_smaller_angle, minimum_bounding_box
+from madcat_xml import iter_annotation_zones, read_madcat_annotation
+from page_model import Page
+from test_bounding_box_utils import assert_same_rectangle, has_unique_minimum
+from test_madcat_xml import write_madcat_file
+
+
+def count_reads(monkeypatch):
+    """ Given the pytest monkeypatch fixture, counts the annotation and image
+        size reads of page_model in the returned dictionary.
+    """
+    reads = {'annotation': 0, 'image_size': 0}
+    load_madcat_annotation = page_model.load_madcat_annotation
+    get_image_size = page_model.get_image_size
+
+    def load(madcat_file_path, cache_dir=None):
+        reads['annotation'] += 1
+        return load_madcat_annotation(madcat_file_path, cache_dir)
+
+    def get_size(image_file_path):
+        reads['image_size'] += 1
+        return get_image_size(image_file_path)
+    monkeypatch.setattr(page_model, 'load_madcat_annotation', load)
+    monkeypatch.setattr(page_model, 'get_image_size', get_size)
+    return reads
+
+
+def make_page(tmp_path, rng, padding=0):
+    madcat_file_path = write_madcat_file(str(tmp_path / 'page.madcat.xml'), rng)
+    image_file_path = str(tmp_path / 'page.png')
+    Image.new('L', (123, 45)).save(image_file_path)
+    return Page(madcat_file_path, image_file_path, padding=padding)
+
+
+def test_page_is_read_lazily_and_once(tmp_path, monkeypatch):
+    reads = count_reads(monkeypatch)
+    page = make_page(tmp_path, np.random.default_rng(0))
+    assert page.base_name == 'page'
+    assert reads == {'annotation': 0, 'image_size': 0}
+    lines = page.lines
+    assert page.lines is lines and page.zones is page.zones
+    bounding_boxes = page.bounding_boxes
+    angles = page.smaller_angles
+    assert page.bounding_boxes is bounding_boxes and page.smaller_angles is angles
+    assert reads == {'annotation': 1, 'image_size': 0}
+    assert page.image_size == (123, 45) and page.image_size == (123, 45)
+    assert reads == {'annotation': 1, 'image_size': 1}
+
+    write_madcat_file(page.madcat_file_path, np.random.default_rng(1), num_zones=3)
+    assert len(page.lines) == 12
+    page.invalidate()
+    assert len(page.lines) == 3 and len(page.bounding_boxes) == 3
+    assert page.lines is not lines
+    assert page.image_size == (123, 45)
+    assert reads == {'annotation': 2, 'image_size': 2}
+
+
+def test_source_annotation_is_used_instead_of_the_xml_file(tmp_path, monkeypatch):
+    rng = np.random.default_rng(0)
+    annotation = read_madcat_annotation(write_madcat_file(str(tmp_path / 'other.madcat.xml'), rng))
+    reads = count_reads(monkeypatch)
+    page = Page(str(tmp_path / 'missing.madcat.xml'), str(tmp_path / 'missing.png'),
+                annotation=annotation)
+    assert [zone.zone_id for zone in page.zones] == annotation.zone_ids.tolist()
+    assert reads['annotation'] == 0
+
+
+def test_lines_match_per_line_functions(tmp_path):
+    rng = np.random.default_rng(2018)
+    for padding in (0, 7, 400):
+        page = make_page(tmp_path, rng, padding)
+        zones = list(iter_annotation_zones(read_madcat_annotation(page.madcat_file_path)))
+        assert len(page.lines) == len(zones)
+        for line, (zone_id, points) in zip(page.lines, zones):
+            assert line.line_image_file_name == 'page_' + zone_id.zfill(4) + '.tif'
+            assert line.zone.word_ids == page.zones[line.zone.index].word_ids
+            assert np.array_equal(line.points, points + padding // 2)
+            reference = minimum_bounding_box([tuple(point) for point in line.points.tolist()])
+            assert_same_rectangle(line.bounding_box, reference, has_unique_minimum(line.points))
+            assert line.smaller_angle == get_smaller_angle(line.bounding_box)
+            assert line.envelope == line.bounding_box.envelope
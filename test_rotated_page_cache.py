@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+
+# Copyright   2018 Ashish Arora
+# Apache 2.0
+
+""" Tests of RotatedPageCache: eviction in least recently used order under the
+ byte budget against a list based reference, the hit and miss counters, pages
+ larger than the budget, and the angle buckets.
+
+  Eg. python3 -m pytest -q test_rotated_page_cache.py
+"""
+
+from math import radians
+import numpy as np
+from PIL import Image
+from rotated_page_cache import RotatedPageCache, get_num_bytes
+
+
+def test_eviction_matches_reference():
+    rng = np.random.default_rng(2018)
+    page_sizes = {page_key: int(rng.integers(1, 40)) for page_key in range(6)}
+    for max_bytes in (1, 40, 100, 300):
+        cache = RotatedPageCache(max_bytes=max_bytes)
+        # reference: list of (key, bytes), least recently used first
+        reference, hits, misses = [], 0, 0
+        for _ in range(500):
+            page_key, angle = int(rng.integers(0, 6)), float(rng.integers(0, 4))
+            key = (page_key, angle)
+            rotations = []
+
+            def rotate_page(rotation_angle):
+                rotations.append(rotation_angle)
+                return np.zeros(page_sizes[page_key] + int(rotation_angle), dtype=np.uint8)
+            rotated_page = cache.get(page_key, angle, rotate_page)
+            num_bytes = page_sizes[page_key] + int(angle)
+            assert rotated_page.nbytes == num_bytes
+            cached = [entry for entry in reference if entry[0] == key]
+            if cached:
+                hits += 1
+                reference.remove(cached[0])
+                reference.append(cached[0])
+                assert rotations == []
+            else:
+                misses += 1
+                assert rotations == [angle]
+                if num_bytes <= max_bytes:
+                    reference.append((key, num_bytes))
+                    while sum(entry[1] for entry in reference) > max_bytes:
+                        reference.pop(0)
+            assert list(cache._pages) == [entry[0] for entry in reference]
+            assert cache.num_bytes == sum(entry[1] for entry in reference) <= max_bytes
+            assert (cache.hits, cache.misses) == (hits, misses)
+        cache.clear()
+        assert len(cache) == 0 and cache.num_bytes == 0
+        assert (cache.hits, cache.misses) == (hits, misses)
+
+
+def test_pages_larger_than_the_budget_are_not_kept():
+    cache = RotatedPageCache(max_bytes=100)
+    small = cache.get('a', 0.0, lambda angle: np.zeros(60, dtype=np.uint8))
+    assert cache.get('b', 0.0, lambda angle: np.zeros(101, dtype=np.uint8)).nbytes == 101
+    assert list(cache._pages) == [('a', 0.0)] and cache.num_bytes == 60
+    assert cache.get('a', 0.0, lambda angle: None) is small
+    assert (cache.hits, cache.misses) == (1, 2)
+    assert str(cache) == '1 rotated pages, 0.0 MB, 1 hits, 2 misses'
+
+
+def test_pil_page_bytes():
+    cache = RotatedPageCache(max_bytes=3 * 10 * 20)
+    for mode, num_bytes in (('L', 200), ('RGB', 600), ('1', 200)):
+        assert get_num_bytes(Image.new(mode, (10, 20))) == num_bytes
+    cache.get('a', 0.0, lambda angle: Image.new('L', (10, 20)))
+    cache.get('b', 0.0, lambda angle: Image.new('L', (10, 20)))
+    assert cache.num_bytes == 400
+    cache.get('c', 0.0, lambda angle: Image.new('RGB', (10, 20)))
+    assert list(cache._pages) == [('c', 0.0)] and cache.num_bytes == 600
+
+
+def test_angle_buckets():
+    angle_step = radians(0.05)
+    cache = RotatedPageCache(angle_step=angle_step)
+    rotations = []
+
+    def rotate_page(angle):
+        rotations.append(angle)
+        return np.zeros(1, dtype=np.uint8)
+    for angle in (radians(1.0), radians(1.02), radians(0.98), radians(1.03), radians(-1.0)):
+        cache.get('page', angle, rotate_page)
+    assert rotations == [cache.quantize_angle(radians(1.0)), cache.quantize_angle(radians(1.03)),
+                         cache.quantize_angle(radians(-1.0))]
+    assert np.allclose(rotations, [radians(1.0), radians(1.05), radians(-1.0)])
+    assert (cache.hits, cache.misses) == (2, 3)
+    # the center of a bucket is its own bucket
+    for angle in rotations:
+        assert cache.quantize_angle(angle) == angle
+    assert RotatedPageCache().quantize_angle(0.123) == 0.123